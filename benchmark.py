@@ -0,0 +1,322 @@
+"""
+End-to-end throughput benchmark. Starts mock_portal.py locally, prepares a
+scratch MySQL database, runs creaper.py and scraper.py against the mock with
+each requested engine, and reports tasks/min, rows/sec, peak RSS, DB write
+time and the requests and bytes the portal served per run. Results are appended to a JSONL file; a run whose rows/sec drops
+more than --max-regression below the previous result for the same setup makes
+the benchmark exit non-zero.
+
+    python benchmark.py --engines sync,async,http --rows 200 --latency-ms 100
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import mysql.connector
+
+from db_config import DB_CONFIG, STUDENTS_TABLE
+from mock_portal import MockPortal, add_dataset_args, dataset_from_args
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_PATH = os.path.join(HERE, "schema.sql")
+RESULTS_PATH = "benchmark_results.jsonl"
+
+# Credentials come from db_config.py's DB_CONFIG; only the database is replaced
+DEFAULT_BENCH_DB = "student_bench"
+PRODUCTION_DB = "student_db"
+
+# creaper.py walks this many years for every district
+CREAPER_YEARS = 2026 - 2016 + 1
+
+ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
+SCRAPER_TASKS_RE = re.compile(r"Tasks\s*:\s*(\d+)")
+SCRAPER_ROWS_RE = re.compile(r"Rows\s*:\s*extracted (\d+)")
+SCRAPER_DB_RE = re.compile(r"DB time\s*:\s*([\d.]+)s")
+CREAPER_DB_RE = re.compile(r"DB writes: (\d+) rows in ([\d.]+)s")
+
+
+# ---------- DATABASE ----------
+
+def db_config(db_name):
+    return dict(DB_CONFIG, database=db_name)
+
+
+def schema_tables():
+    """CREATE TABLE statements from schema.sql (database/user setup is skipped)."""
+    with open(SCHEMA_PATH, encoding="utf-8") as f:
+        text = re.sub(r"--[^\n]*", "", f.read())
+    return [stmt.strip() for stmt in text.split(";") if stmt.strip().upper().startswith("CREATE TABLE")]
+
+
+def prepare_database(db_name, dataset):
+    """Creates the scratch database and tables and seeds institutes with the mock colleges."""
+    config = db_config(db_name)
+    server = {k: v for k, v in config.items() if k != "database"}
+    with mysql.connector.connect(**server) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}`")
+            cur.execute(f"USE `{db_name}`")
+            for stmt in schema_tables():
+                cur.execute(stmt)
+            cur.execute("CREATE TABLE IF NOT EXISTS institutes_test LIKE institutes")
+            cur.execute("DELETE FROM institutes")
+            cur.executemany(
+                "INSERT INTO institutes (sams_code, chse_code, district_name, block_ulb, college_name) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                dataset.institute_rows(),
+            )
+        conn.commit()
+
+
+def reset_table(db_name, table):
+    with mysql.connector.connect(**db_config(db_name)) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"TRUNCATE TABLE {table}")
+        conn.commit()
+
+
+def count_rows(db_name, table):
+    with mysql.connector.connect(**db_config(db_name)) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT COUNT(*) FROM {table}")
+            return cur.fetchone()[0]
+
+
+# ---------- RUNS ----------
+
+def run_script(cmd, env, workdir):
+    """
+    Runs one scraper process in workdir. Returns (exit_code, seconds, peak_rss_mb,
+    output). Peak RSS is the largest single process in the run's process tree
+    (the script or one of its browser/worker children), from wait4().
+    """
+    log_path = os.path.join(workdir, "output.log")
+    t0 = time.time()
+    with open(log_path, "w", encoding="utf-8") as log_file:
+        proc = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    seconds = time.time() - t0
+    with open(log_path, encoding="utf-8", errors="replace") as f:
+        output = ANSI_RE.sub("", f.read())
+    # ru_maxrss is in KiB on Linux
+    return proc.returncode, seconds, usage.ru_maxrss / 1024, output
+
+
+def parse_scraper(output):
+    tasks = SCRAPER_TASKS_RE.search(output)
+    rows = SCRAPER_ROWS_RE.search(output)
+    db = SCRAPER_DB_RE.search(output)
+    return (
+        int(tasks.group(1)) if tasks else 0,
+        int(rows.group(1)) if rows else 0,
+        float(db.group(1)) if db else None,
+    )
+
+
+def parse_creaper(output, dataset):
+    db = CREAPER_DB_RE.search(output)
+    tasks = CREAPER_YEARS * len(dataset.districts)
+    return tasks, (int(db.group(1)) if db else 0), (float(db.group(2)) if db else None)
+
+
+def bench_one(target, engine, args, portal, dataset, run_no):
+    script = os.path.join(HERE, f"{target}.py")
+    cmd = [sys.executable, script, "--engine", engine]
+    if target == "scraper":
+        cmd += ["--refresh-discovery"]
+        if engine != "async":
+            cmd += ["--workers", str(args.workers)]
+    if engine == "async":
+        cmd += ["--max-pages", str(args.max_pages)]
+    if engine == "http":
+        cmd += ["--no-browser-fallback"]
+    if args.block_resources is not None:
+        cmd += ["--block-resources", args.block_resources]
+
+    env = dict(
+        os.environ,
+        SAMS_STUDENTS_URL=portal.students_url,
+        SAMS_INSTITUTES_URL=portal.institutes_url,
+        SAMS_DB_NAME=args.db_name,
+        PYTHONUNBUFFERED="1",
+    )
+    table = STUDENTS_TABLE if target == "scraper" else "institutes_test"
+    reset_table(args.db_name, table)
+
+    requests_before = portal.stats["requests"]
+    bytes_before = portal.stats["bytes_sent"]
+    with tempfile.TemporaryDirectory(prefix=f"bench-{target}-{engine}-") as workdir:
+        code, seconds, rss_mb, output = run_script(cmd, env, workdir)
+        if code != 0:
+            print(output[-3000:])
+
+    if target == "scraper":
+        tasks, rows, db_seconds = parse_scraper(output)
+    else:
+        tasks, rows, db_seconds = parse_creaper(output, dataset)
+
+    return {
+        "target": target,
+        "engine": engine,
+        "run": run_no,
+        "exit_code": code,
+        "seconds": round(seconds, 2),
+        "tasks": tasks,
+        "rows": rows,
+        "stored": count_rows(args.db_name, table),
+        "tasks_per_min": round(tasks / seconds * 60, 1) if seconds else 0.0,
+        "rows_per_sec": round(rows / seconds, 1) if seconds else 0.0,
+        "peak_rss_mb": round(rss_mb, 1),
+        "db_seconds": db_seconds,
+        "portal_requests": portal.stats["requests"] - requests_before,
+        "portal_bytes": portal.stats["bytes_sent"] - bytes_before,
+    }
+
+
+# ---------- REPORT ----------
+
+def setup_key(result):
+    return json.dumps(
+        {
+            k: result.get(k)
+            for k in ("target", "engine", "dataset", "latency_ms", "workers", "max_pages", "block_resources")
+        },
+        sort_keys=True,
+    )
+
+
+def load_previous(path):
+    """Latest recorded rows/sec per setup, from earlier benchmark invocations."""
+    previous = {}
+    if not os.path.exists(path):
+        return previous
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+                previous[setup_key(result)] = result["rows_per_sec"]
+            except (ValueError, KeyError):
+                continue
+    return previous
+
+
+def print_table(results):
+    header = (
+        f"{'target':<8} {'engine':<6} {'run':>3} {'secs':>7} {'tasks/min':>9} {'rows/sec':>9} {'rss MB':>7} "
+        f"{'db secs':>8} {'requests':>8} {'portal KB':>9} {'stored':>7} {'exit':>4}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        db = f"{r['db_seconds']:.2f}" if r["db_seconds"] is not None else "-"
+        print(
+            f"{r['target']:<8} {r['engine']:<6} {r['run']:>3} {r['seconds']:>7.1f} {r['tasks_per_min']:>9.1f} "
+            f"{r['rows_per_sec']:>9.1f} {r['peak_rss_mb']:>7.1f} {db:>8} {r['portal_requests']:>8} "
+            f"{r['portal_bytes'] / 1024:>9.1f} {r['stored']:>7} {r['exit_code']:>4}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark creaper.py/scraper.py against the local mock portal")
+    add_dataset_args(parser)
+    parser.add_argument("--engines", default="sync,async,http", help="Comma-separated engines to run")
+    parser.add_argument("--targets", default="creaper,scraper", help="Comma-separated scripts to run")
+    parser.add_argument("--runs", type=int, default=1, help="Runs per target/engine")
+    parser.add_argument("--workers", type=int, default=1, help="--workers passed to scraper.py")
+    parser.add_argument("--max-pages", type=int, default=4, help="--max-pages passed with --engine async")
+    parser.add_argument(
+        "--block-resources",
+        default=None,
+        help="--block-resources passed to both scripts (default: theirs); run once with 'none' "
+             "to compare the portal requests and bytes blocking saves",
+    )
+    parser.add_argument("--db-name", default=DEFAULT_BENCH_DB, help="Scratch database (created if missing)")
+    parser.add_argument("--output", default=RESULTS_PATH, help="JSONL file results are appended to")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="Exit non-zero when rows/sec falls more than this fraction below the previous result",
+    )
+    args = parser.parse_args()
+
+    if args.db_name == PRODUCTION_DB:
+        parser.error(f"--db-name must not be the production database '{PRODUCTION_DB}'; its tables are truncated")
+
+    dataset = dataset_from_args(args)
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+
+    print(f"Dataset: {json.dumps(dataset.describe())}, latency {args.latency_ms} ms")
+    prepare_database(args.db_name, dataset)
+    portal = MockPortal(dataset, latency_ms=args.latency_ms).start()
+
+    results = []
+    try:
+        for target in targets:
+            for engine in engines:
+                for run_no in range(1, args.runs + 1):
+                    print(f"Running {target}.py --engine {engine} (run {run_no}/{args.runs})...")
+                    results.append(bench_one(target, engine, args, portal, dataset, run_no))
+    finally:
+        portal.stop()
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    stamp = datetime.now().isoformat(timespec="seconds")
+    for r in results:
+        r.update(
+            timestamp=stamp,
+            commit=commit,
+            dataset=dataset.describe(),
+            latency_ms=args.latency_ms,
+            workers=args.workers,
+            max_pages=args.max_pages,
+            block_resources=args.block_resources,
+        )
+
+    print()
+    print_table(results)
+
+    previous = load_previous(args.output)
+    regressions = []
+    by_setup = {}
+    for r in results:
+        if r["exit_code"] == 0:
+            by_setup.setdefault(setup_key(r), []).append(r)
+    for key, runs in by_setup.items():
+        median = statistics.median(r["rows_per_sec"] for r in runs)
+        before = previous.get(key)
+        if before:
+            change = (median - before) / before
+            print(f"{runs[0]['target']} --engine {runs[0]['engine']}: {median:.1f} rows/sec ({change:+.0%} vs previous {before:.1f})")
+            if change < -args.max_regression:
+                regressions.append(key)
+
+    with open(args.output, "a", encoding="utf-8") as f:
+        for r in results:
+            f.write(json.dumps(r) + "\n")
+    print(f"Results appended to {args.output}")
+
+    failed = [r for r in results if r["exit_code"] != 0]
+    if failed or regressions:
+        print(f"{len(failed)} failed runs, {len(regressions)} throughput regressions")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Playwright helpers shared by scraper.py and creaper.py.
+"""
+
+import os
+from collections import Counter
+from urllib.parse import urlparse
+
+from playwright.sync_api import Error as PlaywrightError
+
+# Resource types aborted by default. "third-party" is a pseudo-type covering
+# scripts, XHR and fetches to any host other than the portal's.
+DEFAULT_BLOCKED_RESOURCES = ("image", "stylesheet", "font", "media", "third-party")
+THIRD_PARTY_TYPES = ("script", "xhr", "fetch", "eventsource", "websocket", "other")
+
+# DevTools resource type names that are not simply the capitalized Playwright name
+CDP_RESOURCE_TYPES = {
+    "xhr": "XHR",
+    "eventsource": "EventSource",
+    "websocket": "WebSocket",
+    "texttrack": "TextTrack",
+    "signedexchange": "SignedExchange",
+    "cspviolationreport": "CSPViolationReport",
+}
+
+
+def parse_blocked_resources(value, headless=True):
+    """
+    Turns the --block-resources value into a tuple of types. None means the
+    default policy: everything in DEFAULT_BLOCKED_RESOURCES when headless,
+    nothing when the browser is visible.
+    """
+    if value is None:
+        return DEFAULT_BLOCKED_RESOURCES if headless else ()
+    types = tuple(t.strip().lower() for t in value.split(",") if t.strip())
+    return () if types in ((), ("none",)) else types
+
+
+class ResourceBlocker:
+    """
+    Aborts resource types the scraper never reads, and counts what it blocked.
+
+    Requests are paused through Chromium's DevTools Fetch domain, only for the
+    blocked resource types, instead of page.route("**/*"): Playwright turns
+    the HTTP cache off for routed pages, so the portal's scripts would be
+    downloaded again on every postback. Installed per page.
+    """
+
+    def __init__(self, base_url, blocked=DEFAULT_BLOCKED_RESOURCES):
+        self.host = urlparse(base_url).hostname
+        self.blocked = set(blocked)
+        self.block_third_party = "third-party" in self.blocked
+        self.blocked_types = Counter()
+        self.loaded = 0
+
+    def __bool__(self):
+        return bool(self.blocked)
+
+    def patterns(self):
+        """Fetch.enable patterns: every resource type that may be blocked."""
+        kinds = self.blocked - {"third-party"}
+        if self.block_third_party:
+            kinds |= set(THIRD_PARTY_TYPES)
+        return [{"resourceType": CDP_RESOURCE_TYPES.get(k, k.capitalize())} for k in sorted(kinds)]
+
+    def should_block(self, kind, url):
+        if kind in self.blocked:
+            return True
+        if self.block_third_party and kind in THIRD_PARTY_TYPES:
+            return urlparse(url).hostname != self.host
+        return False
+
+    def _verdict(self, event):
+        """The Fetch command answering a Fetch.requestPaused event."""
+        kind = event["resourceType"].lower()
+        if self.should_block(kind, event["request"]["url"]):
+            self.blocked_types[kind] += 1
+            return "Fetch.failRequest", {"requestId": event["requestId"], "errorReason": "BlockedByClient"}
+        return "Fetch.continueRequest", {"requestId": event["requestId"]}
+
+    def _count(self, request):
+        self.loaded += 1
+
+    def install(self, page):
+        """Applies the policy to a sync Page (Chromium only)."""
+        if not self:
+            return
+        cdp = page.context.new_cdp_session(page)
+
+        def paused(event):
+            try:
+                cdp.send(*self._verdict(event))
+            except PlaywrightError:
+                pass  # page closed while the request was paused
+
+        cdp.on("Fetch.requestPaused", paused)
+        cdp.send("Fetch.enable", {"patterns": self.patterns()})
+        page.on("requestfinished", self._count)
+
+    async def async_install(self, page):
+        if not self:
+            return
+        cdp = await page.context.new_cdp_session(page)
+
+        async def paused(event):
+            try:
+                await cdp.send(*self._verdict(event))
+            except PlaywrightError:
+                pass
+
+        cdp.on("Fetch.requestPaused", paused)
+        await cdp.send("Fetch.enable", {"patterns": self.patterns()})
+        page.on("requestfinished", self._count)
+
+    def summary(self):
+        """One-line report of the requests blocked, by type, or None if idle."""
+        n_blocked = sum(self.blocked_types.values())
+        if not self or not n_blocked:
+            return None
+        by_type = ", ".join(f"{k} {v}" for k, v in self.blocked_types.most_common())
+        return f"Blocked {n_blocked} requests ({by_type}); {self.loaded} loaded"
+
+
+def descendant_pss_mb(pid=None):
+    """
+    Proportional set size (MiB) of every descendant of pid (default: this
+    process), i.e. the Playwright driver and the browsers it launched. PSS
+    splits each shared page between the processes mapping it, so Chromium's
+    shared libraries and memory are counted once rather than once per
+    renderer, as summed RSS would. Uses psutil when installed,
+    /proc/<pid>/smaps_rollup otherwise; None when neither is available.
+    """
+    pid = pid or os.getpid()
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    if psutil is not None:
+        try:
+            children = psutil.Process(pid).children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for child in children:
+            try:
+                total += child.memory_full_info().pss
+            except psutil.Error:
+                continue  # exited or not ours to inspect
+        return total / 1048576
+
+    if not os.path.isdir("/proc"):
+        return None
+
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields resume after its ")"
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+
+    tree = set()
+    frontier = {pid}
+    while frontier:
+        frontier = {child for child, ppid in parents.items() if ppid in frontier} - tree
+        tree |= frontier
+
+    total_kb = 0
+    for child in tree:
+        try:
+            with open(f"/proc/{child}/smaps_rollup") as f:
+                total_kb += sum(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+        except (OSError, ValueError, IndexError):
+            continue
+    return total_kb / 1024
@@ -0,0 +1,130 @@
+"""
+Record/replay store for portal responses, shared by scraper.py and
+creaper.py (--capture DIR records, --replay DIR re-runs extraction and DB
+loading from the store without a browser).
+
+Layout of a store directory:
+
+    objects/ab/ab12...ef.gz   gzip-compressed response body, named by the
+                              SHA-256 of the body (identical responses are
+                              kept once)
+    index.sqlite3             (kind, year, district, college, stream, step)
+                              -> digest of the latest capture
+
+`kind` is "students" (scraper.py tasks) or "institutes" (creaper.py
+year/district pairs, with empty college and stream). `step` names the
+postback: "show" for the first grid page, "show_all" for the expanded grid.
+"""
+
+import gzip
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+
+INDEX_NAME = "index.sqlite3"
+OBJECTS_DIR = "objects"
+
+# The step whose response holds the complete grid, most complete first
+GRID_STEPS = ("show_all", "show")
+
+
+class CaptureStore:
+    """
+    Content-addressed response store with a SQLite index. Safe to share
+    between threads; several processes may write the same store (objects are
+    written atomically, the index waits for SQLite's lock).
+    """
+
+    def __init__(self, root, run_id=None):
+        self.root = root
+        self.run_id = run_id
+        os.makedirs(os.path.join(root, OBJECTS_DIR), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, INDEX_NAME), timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS captures (
+                    kind TEXT NOT NULL,
+                    year TEXT NOT NULL,
+                    district TEXT NOT NULL,
+                    college TEXT NOT NULL,
+                    stream TEXT NOT NULL,
+                    step TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    captured_at TEXT NOT NULL,
+                    run_id TEXT,
+                    PRIMARY KEY (kind, year, district, college, stream, step)
+                )
+                """
+            )
+
+    def close(self):
+        self.conn.close()
+
+    # ---------- objects ----------
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, OBJECTS_DIR, digest[:2], digest + ".gz")
+
+    def put(self, body):
+        """Stores a response body (str) once; returns its digest."""
+        data = body.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(data, compresslevel=6))
+            os.replace(tmp, path)
+        return digest
+
+    def get(self, digest):
+        with open(self._object_path(digest), "rb") as f:
+            return gzip.decompress(f.read()).decode("utf-8")
+
+    # ---------- index ----------
+
+    def record(self, kind, key, steps):
+        """
+        Saves one task's responses ({step: body}) under key (year, district,
+        college, stream), replacing every step captured for it before.
+        """
+        key = tuple(str(k or "") for k in key)
+        now = datetime.utcnow().isoformat()
+        rows = [(kind, *key, step, self.put(body), len(body), now, self.run_id) for step, body in steps.items()]
+        with self.lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM captures WHERE kind=? AND year=? AND district=? AND college=? AND stream=?",
+                (kind, *key),
+            )
+            self.conn.executemany("INSERT INTO captures VALUES (?,?,?,?,?,?,?,?,?,?)", rows)
+
+    def keys(self, kind):
+        """Captured (year, district, college, stream) keys of a kind, in capture order."""
+        with self.lock:
+            cur = self.conn.execute(
+                "SELECT year, district, college, stream FROM captures WHERE kind=? "
+                "GROUP BY year, district, college, stream ORDER BY MIN(rowid)",
+                (kind,),
+            )
+            return [tuple(r) for r in cur.fetchall()]
+
+    def grid(self, kind, key):
+        """Body of the most complete grid response captured for key, or None."""
+        key = tuple(str(k or "") for k in key)
+        with self.lock:
+            cur = self.conn.execute(
+                "SELECT step, digest FROM captures WHERE kind=? AND year=? AND district=? AND college=? AND stream=?",
+                (kind, *key),
+            )
+            digests = dict(cur.fetchall())
+        for step in GRID_STEPS:
+            if step in digests:
+                return self.get(digests[step])
+        return None
@@ -1,8 +1,20 @@
 import mysql.connector
+import argparse
+import asyncio
 import os
 import json
-from datetime import datetime, timezone
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from playwright.sync_api import sync_playwright, TimeoutError
+from playwright.async_api import async_playwright, TimeoutError as AsyncTimeoutError
+from sams_http import SamsHttpClient, parse_grid_html
+from browser_tools import ResourceBlocker, parse_blocked_resources
+from rate_control import DEFAULT_MAX_RATE, RateController, backoff_delay
+from capture_store import CaptureStore
 
 # ---------------- CONFIG ----------------
 
@@ -10,17 +22,41 @@ DB_CONFIG = {
     "host": "localhost",
     "user": "your_username",
     "password": "your_password",
-    "database": "student_db",
+    "database": os.environ.get("SAMS_DB_NAME", "student_db"),
 }
 
-BASE_URL = "https://hss.samsodisha.gov.in/newHSS/CollegeWiseApplicantReport_Approve.aspx?Ve2ybNQdDRr6P9jmGBzloH49u6Y1TUAy"
+# SAMS_INSTITUTES_URL / SAMS_DB_NAME point a run at another portal or database
+BASE_URL = os.environ.get(
+    "SAMS_INSTITUTES_URL",
+    "https://hss.samsodisha.gov.in/newHSS/CollegeWiseApplicantReport_Approve.aspx?Ve2ybNQdDRr6P9jmGBzloH49u6Y1TUAy",
+)
 
 START_YEAR = 2016
 END_YEAR = 2026
 
+# Pages (each in its own browser context) crawled at once with --engine async
+DEFAULT_MAX_PAGES = 6
+
+# Local SQLite file recording when each (year, district) pair was last crawled
+CRAWL_LEDGER_PATH = "institute_crawl.sqlite3"
+# --incremental re-crawls pairs whose last successful crawl is older than this
+DEFAULT_MAX_AGE_DAYS = 7
+
+# Table the crawled institutes are inserted into
+INSTITUTES_TABLE = "institutes_test"
+
 LOG_DIR = "logs"
 ERROR_LOG = os.path.join(LOG_DIR, "institute_errors.log")
 
+# Paces year/district crawls by the portal's observed latency and failures
+# (and caps pages/sessions in flight); limits are set from the CLI in main()
+RATE = RateController()
+# Once 'Show All' is on, Show returns a district's whole grid, so its latency
+# grows with the district and is not a sign of an overloaded portal. The
+# year/district postbacks keep the default kind and are judged by latency.
+SHOW_RATE_KIND = "show_all"
+HTTP_RATE_KINDS = {"btnShow": SHOW_RATE_KIND, "lbtnAll": SHOW_RATE_KIND}
+
 # ---------------- UI ----------------
 
 
@@ -60,14 +96,63 @@ def is_empty(val):
 # ---------------- DB ----------------
 
 
-def insert_institutes(cur, conn, rows):
-    insert_sql = """
-        INSERT INTO institutes_test
+# Time spent in insert_institutes(), reported at the end of a run
+DB_STATS = {"rows": 0, "seconds": 0.0, "conflicts": 0}
+
+
+def report_db_time():
+    log(f"DB writes: {DB_STATS['rows']} rows in {DB_STATS['seconds']:.2f}s")
+    if DB_STATS["conflicts"]:
+        log(f"chse_code conflicts: {DB_STATS['conflicts']} institutes skipped (see {ERROR_LOG})", UI.WARN)
+
+
+class KnownInstitutes:
+    """
+    sams_code -> chse_code of every stored institute, loaded once per run so
+    insert_institutes() needs no per-row lookups. chse_code is unique too
+    (uq_chse_code), so its owner is tracked as well.
+    """
+
+    def __init__(self, cur):
+        cur.execute(f"SELECT sams_code, chse_code FROM {INSTITUTES_TABLE}")
+        self.chse_by_sams = {}
+        self.sams_by_chse = {}
+        for sams, chse in cur.fetchall():
+            self.add(sams, chse)
+        log(f"Loaded {len(self.chse_by_sams)} known institutes")
+
+    def __contains__(self, sams):
+        return sams in self.chse_by_sams
+
+    def add(self, sams, chse):
+        if sams is not None:
+            self.chse_by_sams[sams] = chse
+        if chse is not None:
+            self.sams_by_chse.setdefault(chse, sams)
+
+    def forget(self, sams, chse):
+        """Undoes add() for a row whose insert was rolled back."""
+        self.chse_by_sams.pop(sams, None)
+        if self.sams_by_chse.get(chse) == sams:
+            del self.sams_by_chse[chse]
+
+
+def insert_institutes(cur, conn, rows, known):
+    """
+    Inserts the page's new institutes with one batched INSERT IGNORE and one
+    commit. Rows whose sams_code is known are skipped; rows whose chse_code
+    already belongs to another institute are skipped and logged together.
+    """
+    started = time.time()
+    insert_sql = f"""
+        INSERT IGNORE INTO {INSTITUTES_TABLE}
         (sams_code, chse_code, district_name, block_ulb, college_name)
         VALUES (%s, %s, %s, %s, %s)
     """
 
-    inserted = skipped = 0
+    new_rows = []
+    conflicts = []
+    skipped = 0
 
     for r in rows:
         _, sams, chse, district, block, college = r
@@ -76,24 +161,134 @@ def insert_institutes(cur, conn, rows):
             skipped += 1
             continue
 
-        try:
-            cur.execute("SELECT 1 FROM institutes_test WHERE sams_code=%s LIMIT 1", (sams,))
-            if cur.fetchone():
-                skipped += 1
-                continue
+        if sams in known:
+            skipped += 1
+            continue
 
-            cur.execute(insert_sql, (sams, chse, district, block, college))
-            conn.commit()
-            inserted += 1
+        owner = known.sams_by_chse.get(chse)
+        if owner is not None and owner != sams:
+            conflicts.append({"sams": sams, "chse": chse, "college": college, "chse_owner": owner})
+            skipped += 1
+            continue
 
+        new_rows.append((sams, chse, district, block, college))
+        # Also dedups repeats of the same institute within the page
+        known.add(sams, chse)
+
+    inserted = 0
+    if new_rows:
+        try:
+            cur.executemany(insert_sql, new_rows)
+            conn.commit()
+            inserted = cur.rowcount
         except mysql.connector.Error as e:
             conn.rollback()
-            skipped += 1
-            log_error({"action": "insert", "sams": sams}, e)
-
+            for sams, chse, *_ in new_rows:
+                known.forget(sams, chse)
+            log_error({"action": "insert", "sams": [row[0] for row in new_rows]}, e)
+        # Rows the server ignored collided with institutes stored since the run started
+        skipped += len(new_rows) - inserted
+
+    if conflicts:
+        DB_STATS["conflicts"] += len(conflicts)
+        log(f"{len(conflicts)} institutes skipped: chse_code already belongs to another sams_code", UI.WARN)
+        log_error({"action": "insert", "chse_code_conflicts": conflicts}, "duplicate chse_code")
+
+    DB_STATS["rows"] += len(rows)
+    DB_STATS["seconds"] += time.time() - started
     return inserted, skipped
 
 
+# ---------------- CRAWL LEDGER ----------------
+
+
+class CrawlLedger:
+    """
+    When each (year, district) pair was last crawled and with what outcome
+    (done, empty or failed), so --incremental runs can skip fresh pairs.
+    Shared by the HTTP engine's threads, hence the lock.
+    """
+
+    def __init__(self, path=CRAWL_LEDGER_PATH):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS crawls (
+                year INTEGER NOT NULL,
+                district TEXT NOT NULL,
+                status TEXT NOT NULL,
+                row_count INTEGER NOT NULL DEFAULT 0,
+                inserted INTEGER NOT NULL DEFAULT 0,
+                crawled_at TEXT NOT NULL,
+                PRIMARY KEY (year, district)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def last_crawled(self):
+        """{(year, district): crawled_at} for pairs whose last crawl did not fail."""
+        with self.lock:
+            cur = self.conn.execute("SELECT year, district, crawled_at FROM crawls WHERE status != 'failed'")
+            return {(r[0], r[1]): datetime.fromisoformat(r[2]) for r in cur.fetchall()}
+
+    def record(self, year, district, status, rows=0, inserted=0):
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO crawls (year, district, status, row_count, inserted, crawled_at)
+                VALUES (?,?,?,?,?,?)
+                ON CONFLICT (year, district) DO UPDATE SET
+                status=excluded.status, row_count=excluded.row_count,
+                inserted=excluded.inserted, crawled_at=excluded.crawled_at
+                """,
+                (year, district, status, rows, inserted, datetime.now(timezone.utc).isoformat()),
+            )
+
+
+def parse_years(value):
+    """'2024' or '2020..2024' -> years newest first; None means START_YEAR..END_YEAR."""
+    if not value:
+        first, last = START_YEAR, END_YEAR
+    elif ".." in value:
+        first, last = (int(v) for v in value.split("..", 1))
+    else:
+        first = last = int(value)
+    return list(range(max(first, last), min(first, last) - 1, -1))
+
+
+def crawl_pairs(districts, args, ledger):
+    """
+    (year, district) pairs this run crawls, newest year first. With
+    --incremental, pairs crawled successfully within --max-age-days are left out.
+    """
+    wanted = districts
+    if args.districts:
+        names = {d.strip().lower() for d in args.districts.split(",") if d.strip()}
+        wanted = [d for d in districts if d.lower() in names]
+        unknown = names - {d.lower() for d in wanted}
+        if unknown:
+            log(f"Unknown districts ignored: {', '.join(sorted(unknown))}", UI.WARN)
+
+    pairs = [(year, district) for year in parse_years(args.years) for district in wanted]
+    if not args.incremental:
+        return pairs
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=args.max_age_days)
+    crawled = ledger.last_crawled()
+    todo = [p for p in pairs if p not in crawled or crawled[p] < cutoff]
+    log(
+        f"Incremental: {len(pairs) - len(todo)} of {len(pairs)} year/district pairs crawled "
+        f"in the last {args.max_age_days} days; {len(todo)} to crawl",
+        UI.INFO,
+    )
+    return todo
+
+
 # ---------------- SCRAPER ----------------
 
 
@@ -125,18 +320,488 @@ def extract_table(page):
     return data
 
 
+# ---------------- ASYNC ENGINE ----------------
+
+# Same cells as extract_table(): textContent of every td, one call per page
+GRID_TEXTS_JS = """
+() => {
+    const table = document.querySelector("#grdView");
+    if (!table) return [];
+    return Array.from(table.querySelectorAll("tr")).slice(1).map(
+        (tr) => Array.from(tr.querySelectorAll("td")).map((td) => td.textContent)
+    );
+}
+"""
+
+
+def grid_institute_rows(raw_rows):
+    """extract_table()'s rows from the cell texts of #grdView's data rows."""
+    data = []
+
+    for raw in raw_rows:
+        cells = [c.strip() for c in raw]
+        if len(cells) < 6:
+            continue
+
+        data.append((cells[5], cells[1], cells[2], cells[3], cells[4], cells[5]))
+
+    return data
+
+
+async def async_extract_table(page):
+    return grid_institute_rows(await page.evaluate(GRID_TEXTS_JS))
+
+
+async def async_open_page(browser, district, year, blocker):
+    """
+    Opens a page in a fresh context (own ASP.NET session) and runs the
+    one-time 'Show All' initialization on it.
+    """
+    context = await browser.new_context()
+    page = await context.new_page()
+    await blocker.async_install(page)
+    await page.goto(BASE_URL, timeout=90000, wait_until="networkidle")
+    await page.wait_for_selector("#ddlDistrict", timeout=60000)
+
+    await page.select_option("#ddlDistrict", label=district)
+    async with page.expect_navigation(wait_until="networkidle"):
+        await page.select_option("#ddlYear", label=str(year))
+
+    async with page.expect_navigation(wait_until="networkidle"):
+        await page.click("#btnShow")
+
+    async with page.expect_navigation(wait_until="networkidle"):
+        await page.locator("#lbtnAll").click()
+
+    return page
+
+
+async def async_main(args, ledger):
+    """
+    Crawls the run's (year, district) pairs over up to args.max_pages pages of
+    one browser. DB inserts run in a worker thread, one at a time.
+    """
+    blocker = ResourceBlocker(BASE_URL, parse_blocked_resources(args.block_resources))
+    with mysql.connector.connect(**DB_CONFIG) as conn:
+        with conn.cursor() as cur:
+            known = KnownInstitutes(cur)
+            async with async_playwright() as p:
+                browser = await p.chromium.launch(headless=True)
+
+                log("Opening base URL")
+                context = await browser.new_context()
+                first = await context.new_page()
+                await blocker.async_install(first)
+                await first.goto(BASE_URL, timeout=90000, wait_until="networkidle")
+                await first.wait_for_selector("#ddlDistrict", timeout=60000)
+                districts = [
+                    d.strip()
+                    for d in await first.locator("#ddlDistrict option").all_text_contents()
+                    if d.strip() and "Select" not in d
+                ]
+                await context.close()
+
+                queue = asyncio.Queue()
+                for pair in crawl_pairs(districts, args, ledger):
+                    queue.put_nowait(pair)
+
+                db_lock = asyncio.Lock()
+
+                async def page_worker(slot):
+                    try:
+                        page = await async_open_page(browser, districts[0], END_YEAR, blocker)
+                    except Exception as e:
+                        log(f"[P{slot}] 'Show All' initialization failed", UI.ERR)
+                        log_error({"page": slot, "action": "init"}, e)
+                        return
+
+                    while True:
+                        try:
+                            year, district = queue.get_nowait()
+                        except asyncio.QueueEmpty:
+                            return
+
+                        for attempt in range(1, 4):
+                            try:
+                                async with RATE.async_slot():
+                                    await page.select_option("#ddlDistrict", label=district)
+                                    async with page.expect_navigation(wait_until="networkidle"):
+                                        await page.select_option("#ddlYear", label=str(year))
+
+                                async with RATE.async_slot(SHOW_RATE_KIND) as ticket:
+                                    try:
+                                        async with page.expect_navigation(wait_until="networkidle"):
+                                            await page.click("#btnShow")
+                                    except AsyncTimeoutError:
+                                        ticket.failed = True
+
+                                try:
+                                    await page.wait_for_selector("#grdView .tblItem", timeout=20000)
+                                except AsyncTimeoutError:
+                                    save_capture(year, district, await page.content())
+                                    log(f"[P{slot}] {year} {district}: No records", UI.WARN)
+                                    ledger.record(year, district, "empty")
+                                    break
+
+                                save_capture(year, district, await page.content())
+
+                                rows = await async_extract_table(page)
+
+                                async with db_lock:
+                                    ins, skip = await asyncio.to_thread(insert_institutes, cur, conn, rows, known)
+                                log(
+                                    f"[P{slot}] {year} {district}: Extracted {len(rows)}, "
+                                    f"Inserted: {ins}, Skipped: {skip}",
+                                    UI.OK,
+                                )
+                                ledger.record(year, district, "done", len(rows), ins)
+
+                                break
+
+                            except Exception as e:
+                                log(f"[P{slot}] {year} {district}: Retry {attempt}/3 failed", UI.WARN)
+                                log_error(
+                                    {
+                                        "district": district,
+                                        "year": year,
+                                        "attempt": attempt,
+                                    },
+                                    e,
+                                )
+                                if attempt < 3:
+                                    await asyncio.sleep(backoff_delay(attempt))
+                        else:
+                            ledger.record(year, district, "failed")
+
+                pages = min(args.max_pages, queue.qsize())
+                log(f"Crawling {queue.qsize()} year/district pairs on {pages} pages", UI.INFO)
+                await asyncio.gather(*(page_worker(slot) for slot in range(1, pages + 1)))
+                await browser.close()
+
+    report = blocker.summary()
+    if report:
+        log(report)
+
+    report_db_time()
+    log("Scraping completed successfully", UI.OK)
+
+
+# ---------------- HTTP ENGINE ----------------
+
+
+def http_extract_table(client):
+    if not client.has("#grdView"):
+        return []
+    return grid_institute_rows(client.grid_rows("#grdView"))
+
+
+def http_open_session(district, year):
+    """A fresh SamsHttpClient session with the one-time 'Show All' applied."""
+    client = SamsHttpClient(BASE_URL, timeout=90, rate=RATE, rate_kinds=HTTP_RATE_KINDS).load()
+    client.select_option("#ddlDistrict", label=district)
+    client.select_option("#ddlYear", label=str(year))
+    client.click("#btnShow")
+    client.click("#lbtnAll")
+    return client
+
+
+def http_main(args, ledger):
+    """
+    Browserless crawl: the same district/year/Show postbacks as main(),
+    replayed over HTTP with SamsHttpClient. With --max-pages N the pairs are
+    shared by N threads, each with its own portal session; DB inserts are
+    serialized on the one connection.
+    """
+    with mysql.connector.connect(**DB_CONFIG) as conn:
+        with conn.cursor() as cur:
+            known = KnownInstitutes(cur)
+            log("Opening base URL (HTTP)")
+            client = SamsHttpClient(BASE_URL, timeout=90, rate=RATE, rate_kinds=HTTP_RATE_KINDS).load()
+
+            districts = [
+                label
+                for label, _ in client.options("#ddlDistrict")
+                if label and "Select" not in label
+            ]
+            client.close()
+
+            pending = deque(crawl_pairs(districts, args, ledger))
+            sessions = min(args.max_pages, len(pending))
+            db_lock = threading.Lock()
+            totals = {"requests": 0, "bytes": 0}
+
+            def session_worker(slot):
+                prefix = f"[S{slot}] " if sessions > 1 else ""
+                try:
+                    client = http_open_session(districts[0], END_YEAR)
+                except Exception as e:
+                    log(f"{prefix}'Show All' initialization failed", UI.ERR)
+                    log_error({"session": slot, "action": "init", "engine": "http"}, e)
+                    raise
+
+                while True:
+                    try:
+                        year, district = pending.popleft()
+                    except IndexError:
+                        break
+
+                    for attempt in range(1, 4):
+                        try:
+                            client.select_option("#ddlDistrict", label=district)
+                            client.select_option("#ddlYear", label=str(year))
+                            client.click("#btnShow")
+                            save_capture(year, district, client.html)
+
+                            rows = http_extract_table(client)
+                            if not rows:
+                                log(f"{prefix}{year} {district}: No records", UI.WARN)
+                                ledger.record(year, district, "empty")
+                                break
+
+                            with db_lock:
+                                ins, skip = insert_institutes(cur, conn, rows, known)
+                            log(
+                                f"{prefix}{year} {district}: Extracted {len(rows)}, "
+                                f"Inserted: {ins}, Skipped: {skip}",
+                                UI.OK,
+                            )
+                            ledger.record(year, district, "done", len(rows), ins)
+
+                            break
+
+                        except Exception as e:
+                            log(f"{prefix}{year} {district}: Retry {attempt}/3 failed", UI.WARN)
+                            log_error(
+                                {
+                                    "district": district,
+                                    "year": year,
+                                    "attempt": attempt,
+                                    "engine": "http",
+                                },
+                                e,
+                            )
+                            if attempt < 3:
+                                time.sleep(backoff_delay(attempt))
+                            try:
+                                client.load()
+                            except Exception:
+                                pass
+                    else:
+                        ledger.record(year, district, "failed")
+
+                with db_lock:
+                    totals["requests"] += client.requests
+                    totals["bytes"] += client.bytes_received
+                client.close()
+
+            log(f"Crawling {len(pending)} year/district pairs on {sessions} HTTP sessions", UI.INFO)
+            with ThreadPoolExecutor(max_workers=max(sessions, 1)) as pool:
+                futures = [pool.submit(session_worker, slot) for slot in range(1, sessions + 1)]
+            errors = [f.exception() for f in futures]
+            # Not a single working session: the run failed (main() may fall back to the browser)
+            if errors and all(errors):
+                raise errors[0]
+
+            log(f"HTTP requests: {totals['requests']}, received {totals['bytes'] / 1048576:.1f} MiB")
+
+    report_db_time()
+    log("Scraping completed successfully", UI.OK)
+
+
+# ---------------- CAPTURE / REPLAY ----------------
+
+# --capture store the Show responses are recorded in; opened in main()
+CAPTURE = None
+
+
+def save_capture(year, district, html):
+    if CAPTURE is not None:
+        CAPTURE.record("institutes", (year, district, "", ""), {"show": html})
+
+
+def replay_main(args, ledger):
+    """
+    Re-runs extraction and DB inserts on the year/district pages recorded with
+    --capture, without the portal. --years, --districts and --incremental
+    select pairs as in a live crawl.
+    """
+    store = CaptureStore(args.replay)
+    try:
+        captured = {(int(k[0]), k[1]) for k in store.keys("institutes")}
+        districts = list(dict.fromkeys(district for _, district in sorted(captured)))
+        pairs = [p for p in crawl_pairs(districts, args, ledger) if p in captured]
+        log(f"Replaying {len(pairs)} captured year/district pairs from {args.replay}", UI.INFO)
+
+        with mysql.connector.connect(**DB_CONFIG) as conn:
+            with conn.cursor() as cur:
+                known = KnownInstitutes(cur)
+                for year, district in pairs:
+                    html = store.grid("institutes", (year, district, "", ""))
+                    rows = grid_institute_rows(parse_grid_html(html, "grdView"))
+                    if not rows:
+                        log(f"{year} {district}: No records", UI.WARN)
+                        ledger.record(year, district, "empty")
+                        continue
+
+                    ins, skip = insert_institutes(cur, conn, rows, known)
+                    log(f"{year} {district}: Extracted {len(rows)}, Inserted: {ins}, Skipped: {skip}", UI.OK)
+                    ledger.record(year, district, "done", len(rows), ins)
+    finally:
+        store.close()
+
+    report_db_time()
+    log("Replay completed successfully", UI.OK)
+
+
 # ---------------- MAIN ----------------
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Odisha HSS Institute Scraper")
+    parser.add_argument(
+        "--engine",
+        choices=("sync", "async", "http"),
+        default="sync",
+        help="sync: one page, one district at a time (default); async: several pages at once; "
+             "http: browserless postbacks",
+    )
+    parser.add_argument(
+        "--block-resources",
+        default=None,
+        help="Comma-separated resource types the browser should not load "
+             "(image, stylesheet, font, media, third-party, ...) or 'none' "
+             "(default: image,stylesheet,font,media,third-party)",
+    )
+    parser.add_argument(
+        "--no-browser-fallback",
+        dest="browser_fallback",
+        action="store_false",
+        help="With --engine http, do not fall back to the browser if the page cannot be loaded",
+    )
+    parser.add_argument(
+        "--max-pages",
+        type=int,
+        default=None,
+        help=f"Pages in flight with --engine async (default {DEFAULT_MAX_PAGES}), "
+             "or HTTP sessions with --engine http (default 1)",
+    )
+    parser.add_argument(
+        "--years",
+        default=None,
+        help=f"Year or range to crawl, e.g. 2024 or 2020..2024 (default {START_YEAR}..{END_YEAR})",
+    )
+    parser.add_argument(
+        "--districts",
+        default=None,
+        help="Comma-separated districts to crawl (default: all)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Skip year/district pairs crawled successfully within --max-age-days",
+    )
+    parser.add_argument(
+        "--max-age-days",
+        type=float,
+        default=DEFAULT_MAX_AGE_DAYS,
+        help=f"How old a crawl may be before --incremental repeats it (default {DEFAULT_MAX_AGE_DAYS})",
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=DEFAULT_MAX_RATE,
+        help=f"Most year/district crawls (HTTP: requests) started per second (default {DEFAULT_MAX_RATE:g})",
+    )
+    parser.add_argument(
+        "--no-rate-control",
+        dest="rate_control",
+        action="store_false",
+        help="Do not pace the crawl by the portal's latency and errors",
+    )
+    parser.add_argument(
+        "--capture",
+        metavar="DIR",
+        default=None,
+        help="Record every year/district page in this capture store (see capture_store.py)",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="DIR",
+        default=None,
+        help="Insert institutes from the pages recorded in this capture store instead of crawling",
+    )
+    parser.add_argument(
+        "--ledger",
+        default=CRAWL_LEDGER_PATH,
+        help=f"SQLite file that records crawled year/district pairs (default {CRAWL_LEDGER_PATH})",
+    )
+    args = parser.parse_args()
+
+    if args.max_pages is None:
+        args.max_pages = DEFAULT_MAX_PAGES if args.engine == "async" else 1
+    if args.max_pages < 1:
+        parser.error("--max-pages must be at least 1")
+    if args.engine == "sync" and args.max_pages > 1:
+        parser.error("--max-pages needs --engine async or --engine http")
+    if args.max_rate <= 0:
+        parser.error("--max-rate must be above 0")
+    if args.replay and args.capture:
+        parser.error("--replay cannot be combined with --capture")
+    try:
+        parse_years(args.years)
+    except ValueError:
+        parser.error(f"--years must be YYYY or YYYY..YYYY, got {args.years!r}")
+    return args
+
+
 def main():
+    global CAPTURE
+    args = parse_args()
     ensure_log_dir()
     log("Starting institute scraper", UI.HDR)
+    ledger = CrawlLedger(args.ledger)
+    RATE.reset(args.max_pages, args.max_rate, args.rate_control)
+    if args.capture:
+        CAPTURE = CaptureStore(args.capture, datetime.now().strftime("%Y%m%d-%H%M%S"))
+
+    try:
+        run_engine(args, ledger)
+    finally:
+        if CAPTURE is not None:
+            CAPTURE.close()
+        ledger.close()
+        if RATE.summary():
+            log(RATE.summary())
+
+
+def run_engine(args, ledger):
+    if args.replay:
+        replay_main(args, ledger)
+        return
+
+    if args.engine == "async":
+        asyncio.run(async_main(args, ledger))
+        return
+
+    if args.engine == "http":
+        try:
+            http_main(args, ledger)
+            return
+        except Exception as e:
+            if not args.browser_fallback:
+                raise
+            log(f"HTTP engine failed ({e}); falling back to the browser", UI.WARN)
+            log_error({"engine": "http", "action": "run"}, e)
+
+    blocker = ResourceBlocker(BASE_URL, parse_blocked_resources(args.block_resources))
 
     with mysql.connector.connect(**DB_CONFIG) as conn:
         with conn.cursor() as cur:
+            known = KnownInstitutes(cur)
             with sync_playwright() as p:
                 browser = p.chromium.launch(headless=True)
                 page = browser.new_page()
+                blocker.install(page)
 
                 log("Opening base URL")
                 page.goto(BASE_URL, timeout=90000, wait_until="networkidle")
@@ -147,84 +812,94 @@ def main():
                     for d in page.locator("#ddlDistrict option").all_text_contents()
                     if d.strip() and "Select" not in d
                 ]
-
-                def small_wait():
-                    page.wait_for_timeout(200)
+                pairs = crawl_pairs(districts, args, ledger)
 
                 # ---------- ONE-TIME SHOW ALL INITIALIZATION ----------
-                log("Initializing 'Show All' (one time)", UI.INFO)
+                if pairs:
+                    log("Initializing 'Show All' (one time)", UI.INFO)
 
-                init_district = districts[0]
-                init_year = END_YEAR
+                    init_district = districts[0]
+                    init_year = END_YEAR
 
-                page.select_option("#ddlDistrict", label=init_district)
-                small_wait()
+                    page.select_option("#ddlDistrict", label=init_district)
+                    with page.expect_navigation(wait_until="networkidle"):
+                        page.select_option("#ddlYear", label=str(init_year))
 
-                with page.expect_navigation(wait_until="networkidle"):
-                    page.select_option("#ddlYear", label=str(init_year))
-                small_wait()
+                    with page.expect_navigation(wait_until="networkidle"):
+                        page.click("#btnShow")
 
-                with page.expect_navigation(wait_until="networkidle"):
-                    page.click("#btnShow")
+                    with page.expect_navigation(wait_until="networkidle"):
+                        page.locator("#lbtnAll").click()
 
-                with page.expect_navigation(wait_until="networkidle"):
-                    page.locator("#lbtnAll").click()
-
-                log("'Show All' initialized successfully", UI.OK)
+                    log("'Show All' initialized successfully", UI.OK)
 
                 # ---------- NORMAL SCRAPING ----------
-                for year in range(END_YEAR, START_YEAR - 1, -1):
-                    log(f"\n===== YEAR {year} =====", UI.HDR)
+                current_year = None
+                for year, district in pairs:
+                    if year != current_year:
+                        log(f"\n===== YEAR {year} =====", UI.HDR)
+                        current_year = year
 
-                    for district in districts:
-                        log(f"District: {district}")
+                    log(f"District: {district}")
 
-                        for attempt in range(1, 4):
-                            try:
+                    for attempt in range(1, 4):
+                        try:
+                            with RATE.slot():
                                 page.select_option("#ddlDistrict", label=district)
-                                small_wait()
-
                                 with page.expect_navigation(wait_until="networkidle"):
                                     page.select_option("#ddlYear", label=str(year))
-                                small_wait()
 
+                            with RATE.slot(SHOW_RATE_KIND) as ticket:
                                 try:
                                     with page.expect_navigation(
                                         wait_until="networkidle"
                                     ):
                                         page.click("#btnShow")
                                 except TimeoutError:
-                                    pass
-
-                                try:
-                                    page.wait_for_selector(
-                                        "#grdView .tblItem", timeout=20000
-                                    )
-                                except TimeoutError:
-                                    log("No records", UI.WARN)
-                                    break
-
-                                rows = extract_table(page)
-                                log(f"Extracted {len(rows)} rows")
-
-                                ins, skip = insert_institutes(cur, conn, rows)
-                                log(f"Inserted: {ins}, Skipped: {skip}", UI.OK)
+                                    ticket.failed = True
 
+                            try:
+                                page.wait_for_selector(
+                                    "#grdView .tblItem", timeout=20000
+                                )
+                            except TimeoutError:
+                                save_capture(year, district, page.content())
+                                log("No records", UI.WARN)
+                                ledger.record(year, district, "empty")
                                 break
 
-                            except Exception as e:
-                                log(f"Retry {attempt}/3 failed", UI.WARN)
-                                log_error(
-                                    {
-                                        "district": district,
-                                        "year": year,
-                                        "attempt": attempt,
-                                    },
-                                    e,
-                                )
+                            save_capture(year, district, page.content())
+                            rows = extract_table(page)
+                            log(f"Extracted {len(rows)} rows")
+
+                            ins, skip = insert_institutes(cur, conn, rows, known)
+                            log(f"Inserted: {ins}, Skipped: {skip}", UI.OK)
+                            ledger.record(year, district, "done", len(rows), ins)
+
+                            break
+
+                        except Exception as e:
+                            log(f"Retry {attempt}/3 failed", UI.WARN)
+                            log_error(
+                                {
+                                    "district": district,
+                                    "year": year,
+                                    "attempt": attempt,
+                                },
+                                e,
+                            )
+                            if attempt < 3:
+                                time.sleep(backoff_delay(attempt))
+                    else:
+                        ledger.record(year, district, "failed")
 
                 browser.close()
 
+    report = blocker.summary()
+    if report:
+        log(report)
+
+    report_db_time()
     log("Scraping completed successfully", UI.OK)
 
 
@@ -0,0 +1,58 @@
+"""
+Database settings and console helpers shared by scraper.py and the scripts
+that only talk to MySQL (load_staged.py, migrate_students.py, benchmark.py).
+Kept free of Playwright so those scripts run on a host without a browser.
+"""
+
+import os
+from datetime import datetime
+
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "your_username",
+    "password": "your_password",
+    "database": os.environ.get("SAMS_DB_NAME", "student_db"),
+}
+
+# Table student rows are upserted into (and bulk-loaded into by load_staged.py)
+STUDENTS_TABLE = "students"
+
+# Order of the fields in every student row tuple (see scraper.build_student_rows)
+STUDENT_FIELDS = (
+    "reg_no", "exam_roll_no", "student_name", "father_name", "mother_name",
+    "gender", "stream", "year", "district", "college", "institute_id", "sams_code",
+)
+
+# Directory file sinks stream staged rows to, for load_staged.py to bulk-load
+STAGING_DIR = "staged"
+
+
+class Colors:
+    HEADER = '\033[95m'
+    BLUE = '\033[94m'
+    CYAN = '\033[96m'
+    GREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+def print_status(message, status="INFO"):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    ts_str = f"{Colors.CYAN}[{timestamp}]{Colors.ENDC}"
+
+    if status == "INFO":
+        label = f"{Colors.BLUE}[INFO]{Colors.ENDC} "
+    elif status == "SUCCESS":
+        label = f"{Colors.GREEN}[DONE]{Colors.ENDC} "
+    elif status == "WARNING":
+        label = f"{Colors.WARNING}[WARN]{Colors.ENDC} "
+    elif status == "ERROR":
+        label = f"{Colors.FAIL}[ERR ]{Colors.ENDC} "
+    elif status == "HEADER":
+        print(f"\n{Colors.HEADER}{Colors.BOLD}{message}{Colors.ENDC}")
+        return
+    else:
+        label = f"{Colors.BLUE}[{status}]{Colors.ENDC}"
+
+    print(f"{ts_str} {label} {message}")
@@ -0,0 +1,155 @@
+"""
+Bulk-loads student rows staged by `scraper.py --sink csv|jsonl|parquet` into
+the students table with LOAD DATA LOCAL INFILE, one statement per file.
+JSONL and Parquet files are converted to a temporary CSV first. Loaded files
+are moved to a `loaded/` subdirectory so a re-run does not load them twice.
+
+    python load_staged.py                       # every staged file under staged/
+    python load_staged.py staged/students-20250101-120000-main-4242.csv
+
+The MySQL server must allow it: SET GLOBAL local_infile = 1.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import mysql.connector
+
+from db_config import DB_CONFIG, STAGING_DIR, STUDENT_FIELDS, STUDENTS_TABLE, print_status
+
+STAGED_EXTENSIONS = (".csv", ".jsonl", ".parquet")
+LOADED_DIR = "loaded"
+
+
+def staged_files(paths):
+    """Staged files named by paths (files or directories), oldest first."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [p for p in glob.glob(os.path.join(path, "students-*")) if p.endswith(STAGED_EXTENSIONS)]
+        elif path.endswith(STAGED_EXTENSIONS):
+            files.append(path)
+        else:
+            print_status(f"Skipping {path}: not a staged .csv/.jsonl/.parquet file", "WARNING")
+    return sorted(set(files), key=os.path.getmtime)
+
+
+def write_csv(rows, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(STUDENT_FIELDS)
+        writer.writerows(rows)
+
+
+def jsonl_rows(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield [record.get(field) for field in STUDENT_FIELDS]
+
+
+def parquet_rows(path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("loading .parquet files needs pyarrow (pip install pyarrow)")
+    for batch in pq.ParquetFile(path).iter_batches(columns=list(STUDENT_FIELDS)):
+        columns = [batch.column(i).to_pylist() for i in range(batch.num_columns)]
+        yield from zip(*columns)
+
+
+def as_csv(path, tmpdir):
+    """Path of a CSV with the staged rows of path (the file itself if it already is one)."""
+    if path.endswith(".csv"):
+        return path
+    rows = jsonl_rows(path) if path.endswith(".jsonl") else parquet_rows(path)
+    out = os.path.join(tmpdir, os.path.basename(path) + ".csv")
+    write_csv(rows, out)
+    return out
+
+
+def load_sql(duplicates):
+    """LOAD DATA for the staged CSV layout: header line, STUDENT_FIELDS in order, RFC 4180 quoting."""
+    return (
+        f"LOAD DATA LOCAL INFILE %s {duplicates.upper()} INTO TABLE {STUDENTS_TABLE} "
+        "CHARACTER SET utf8mb4 "
+        "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+        "LINES TERMINATED BY '\\n' "
+        "IGNORE 1 LINES "
+        f"({', '.join(STUDENT_FIELDS)}) "
+        "SET updated_at = NOW()"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load staged student rows into MySQL")
+    parser.add_argument("paths", nargs="*", default=[STAGING_DIR], help=f"Staged files or directories (default {STAGING_DIR})")
+    parser.add_argument(
+        "--duplicates",
+        choices=("replace", "ignore"),
+        default="replace",
+        help="Rows that collide with a unique key replace the stored row (default) or are skipped",
+    )
+    parser.add_argument("--keep", action="store_true", help=f"Leave loaded files in place instead of moving them to {LOADED_DIR}/")
+    args = parser.parse_args()
+
+    files = staged_files(args.paths)
+    if not files:
+        print_status("No staged files to load.", "WARNING")
+        return
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG, allow_local_infile=True)
+        cursor = conn.cursor()
+    except mysql.connector.Error as e:
+        print_status(f"DB Connect Error: {e}", "ERROR")
+        sys.exit(1)
+
+    sql = load_sql(args.duplicates)
+    total_rows = total_seconds = 0
+    failed = 0
+
+    with tempfile.TemporaryDirectory(prefix="sams-load-") as tmpdir:
+        for path in files:
+            t0 = time.time()
+            try:
+                cursor.execute(sql, (os.path.abspath(as_csv(path, tmpdir)),))
+                conn.commit()
+            except (mysql.connector.Error, RuntimeError, ValueError, OSError) as e:
+                conn.rollback()
+                failed += 1
+                print_status(f"{path}: load failed: {e}", "ERROR")
+                continue
+
+            elapsed = time.time() - t0
+            total_rows += cursor.rowcount
+            total_seconds += elapsed
+            rate = cursor.rowcount / elapsed if elapsed > 0 else float(cursor.rowcount)
+            print_status(f"{path}: {cursor.rowcount} rows affected in {elapsed:.2f}s ({rate:.0f} rows/sec)", "SUCCESS")
+
+            if not args.keep:
+                done_dir = os.path.join(os.path.dirname(path) or ".", LOADED_DIR)
+                os.makedirs(done_dir, exist_ok=True)
+                shutil.move(path, os.path.join(done_dir, os.path.basename(path)))
+
+    cursor.close()
+    conn.close()
+
+    print_status(
+        f"Loaded {len(files) - failed} of {len(files)} files: {total_rows} rows affected in {total_seconds:.1f}s",
+        "HEADER",
+    )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
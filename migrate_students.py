@@ -0,0 +1,134 @@
+"""
+One-off migration that gives the students table its natural primary key
+(year, institute_id, reg_no, exam_roll_no), the key dedup_student_rows()
+already uses, so the scraper's ON DUPLICATE KEY UPDATE updates rows instead
+of appending duplicates.
+
+Existing duplicates are removed in bulk: rows are copied once, year by year,
+into a new table that keeps the most recently updated row per key, and the
+tables are then swapped with an atomic RENAME TABLE. The original table is
+kept as <table>_predup until --drop-backup is given. Stop running scrapers
+first; rows written during the copy are not carried over.
+
+    python migrate_students.py --dry-run        # count duplicates only
+    python migrate_students.py
+    python migrate_students.py --table students_test --drop-backup
+"""
+
+import argparse
+import sys
+import time
+
+import mysql.connector
+
+from db_config import DB_CONFIG, STUDENTS_TABLE, print_status
+
+NATURAL_KEY = ("year", "institute_id", "reg_no", "exam_roll_no")
+
+# Left prefix of idx_students_sams_year, so it only costs space and writes
+REDUNDANT_INDEXES = ("idx_students_sams_code",)
+
+
+def has_primary_key(cursor, table):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.table_constraints "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND constraint_type = 'PRIMARY KEY'",
+        (table,),
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def table_columns(cursor, table):
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s ORDER BY ordinal_position",
+        (table,),
+    )
+    return [r[0] for r in cursor.fetchall()]
+
+
+def table_indexes(cursor, table):
+    cursor.execute(f"SHOW INDEX FROM `{table}`")
+    return {r[2] for r in cursor.fetchall()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add the natural primary key to the students table")
+    parser.add_argument("--table", default=STUDENTS_TABLE, help=f"Table to migrate (default {STUDENTS_TABLE})")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many duplicate rows exist")
+    parser.add_argument("--drop-backup", action="store_true", help="Drop <table>_predup after the swap")
+    args = parser.parse_args()
+
+    table = args.table
+    staging = f"{table}_dedup"
+    backup = f"{table}_predup"
+    key = ", ".join(NATURAL_KEY)
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+    except mysql.connector.Error as e:
+        print_status(f"DB Connect Error: {e}", "ERROR")
+        sys.exit(1)
+
+    if has_primary_key(cursor, table):
+        print_status(f"`{table}` already has a primary key; nothing to do.", "SUCCESS")
+        return
+
+    print_status(f"Counting duplicates in `{table}`...", "INFO")
+    cursor.execute(f"SELECT COUNT(*), COUNT(DISTINCT {key}) FROM `{table}`")
+    total, distinct = cursor.fetchone()
+    print_status(f"{total} rows, {distinct} distinct keys, {total - distinct} duplicates.", "INFO")
+    if args.dry_run:
+        return
+
+    t0 = time.time()
+    columns = table_columns(cursor, table)
+    column_list = ", ".join(f"`{c}`" for c in columns)
+
+    cursor.execute(f"DROP TABLE IF EXISTS `{staging}`")
+    cursor.execute(f"CREATE TABLE `{staging}` LIKE `{table}`")
+    for index in REDUNDANT_INDEXES:
+        if index in table_indexes(cursor, staging):
+            cursor.execute(f"ALTER TABLE `{staging}` DROP INDEX `{index}`")
+    if "row_hash" not in columns:
+        cursor.execute(f"ALTER TABLE `{staging}` ADD COLUMN `row_hash` char(40) DEFAULT NULL")
+    cursor.execute(f"ALTER TABLE `{staging}` ADD PRIMARY KEY ({key})")
+
+    # One INSERT ... SELECT per year keeps each transaction (and its undo log) bounded
+    cursor.execute(f"SELECT DISTINCT year FROM `{table}` ORDER BY year")
+    years = [r[0] for r in cursor.fetchall()]
+    copied = 0
+    for year in years:
+        cursor.execute(
+            f"INSERT INTO `{staging}` ({column_list}) "
+            f"SELECT {column_list} FROM ("
+            f"  SELECT {column_list}, ROW_NUMBER() OVER ("
+            f"    PARTITION BY {key} ORDER BY updated_at DESC"
+            f"  ) AS rn FROM `{table}` WHERE year = %s"
+            f") ranked WHERE rn = 1",
+            (year,),
+        )
+        conn.commit()
+        copied += cursor.rowcount
+        print_status(f"Year {year}: kept {cursor.rowcount} rows", "INFO")
+
+    cursor.execute(f"RENAME TABLE `{table}` TO `{backup}`, `{staging}` TO `{table}`")
+    print_status(
+        f"`{table}` now has PRIMARY KEY ({key}): {copied} rows kept, "
+        f"{total - copied} duplicates removed in {time.time() - t0:.1f}s.",
+        "SUCCESS",
+    )
+
+    if args.drop_backup:
+        cursor.execute(f"DROP TABLE `{backup}`")
+        print_status(f"Dropped `{backup}`.", "INFO")
+    else:
+        print_status(f"Original rows kept in `{backup}`; drop it once you are satisfied.", "INFO")
+
+    cursor.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""
+Local stand-in for the two SAMS report pages, used by benchmark.py and for
+offline development. It serves the student report (cascading Year ->
+District -> College -> Stream dropdowns, #btnShow, #lbtnAll, #grdRptStd) and
+the institute report (#ddlDistrict, #ddlYear, #btnShow, #lbtnAll, #grdView)
+as ASP.NET-style postback forms, with generated data of configurable size and
+a configurable per-request latency.
+
+Run it on its own and point the scrapers at it:
+
+    python mock_portal.py --port 8765 --rows 200 --latency-ms 100
+    SAMS_STUDENTS_URL=... SAMS_INSTITUTES_URL=... python scraper.py --engine http
+"""
+
+import argparse
+import base64
+import html
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+# Same paths as the live pages, so PORTAL_PATH checks behave identically
+STUDENTS_PATH = "/newHSS/ReportCollegeWiseStudentDetails_Approved.aspx"
+INSTITUTES_PATH = "/newHSS/CollegeWiseApplicantReport_Approve.aspx"
+
+DISTRICT_NAMES = (
+    "Khurda", "Cuttack", "Koraput", "Balasore", "Ganjam", "Sambalpur", "Puri",
+    "Mayurbhanj", "Sundargarh", "Kalahandi", "Bolangir", "Jajpur", "Kendrapara",
+    "Dhenkanal", "Angul", "Keonjhar", "Bargarh", "Nayagarh", "Rayagada", "Bhadrak",
+)
+STREAM_NAMES = ("Arts", "Science", "Commerce", "Vocational")
+FIRST_NAMES = ("Aditya", "Bikash", "Chinmayee", "Debasish", "Gitanjali", "Jyoti",
+               "Lipsa", "Manas", "Priyanka", "Rashmi", "Sanjay", "Subhashree")
+LAST_NAMES = ("Behera", "Das", "Mohanty", "Nayak", "Panda", "Patra", "Rout",
+              "Sahoo", "Swain", "Tripathy")
+
+# The institute report lists every college for every year in this range
+# (creaper.py walks START_YEAR..END_YEAR)
+INSTITUTE_YEARS = tuple(str(y) for y in range(2016, 2027))
+
+# Rows shown before "Show All" is clicked
+PAGE_SIZE = 20
+
+# Size of the dummy stylesheet/image/font each page references
+ASSET_BYTES = 8192
+
+
+class MockDataset:
+    """
+    Deterministic portal contents. Every college offers `streams` streams in
+    every year; each (year, college, stream) grid holds `rows` students, give
+    or take 20%, and about one grid in `empty_every` is empty.
+    """
+
+    def __init__(self, years=("2024", "2025"), districts=3, colleges=4, streams=2,
+                 rows=100, empty_every=10, seed=1):
+        self.years = [str(y) for y in years]
+        self.districts = list(DISTRICT_NAMES[:districts])
+        self.streams = list(STREAM_NAMES[:streams])
+        self.rows = rows
+        self.empty_every = empty_every
+        self.seed = seed
+
+        # district -> [(sams_code, chse_code, block, college_name)]
+        self.colleges = {}
+        for d_idx, district in enumerate(self.districts, 1):
+            self.colleges[district] = [
+                (
+                    f"{d_idx:02d}{c_idx:04d}",
+                    f"{d_idx:02d}-{c_idx:03d}",
+                    f"{district} Block {1 + c_idx % 3}",
+                    f"{district} Higher Secondary School No. {c_idx}",
+                )
+                for c_idx in range(1, colleges + 1)
+            ]
+
+    def college_names(self, district):
+        return [c[3] for c in self.colleges.get(district, [])]
+
+    def institute_rows(self):
+        """(sams_code, chse_code, district, block, college_name) for seeding the institutes table."""
+        return [
+            (sams, chse, district, block, name)
+            for district, colleges in self.colleges.items()
+            for sams, chse, block, name in colleges
+        ]
+
+    def students(self, year, district, college, stream):
+        """Grid rows for one task: (Sl, reg_no, exam_roll_no, name, father, mother, gender)."""
+        rng = random.Random(f"{self.seed}|{year}|{college}|{stream}")
+        if self.empty_every and rng.randrange(self.empty_every) == 0:
+            return []
+        sams = next((c[0] for c in self.colleges.get(district, []) if c[3] == college), "0")
+        s_idx = self.streams.index(stream) if stream in self.streams else 0
+        count = max(1, int(self.rows * rng.uniform(0.8, 1.2)))
+        rows = []
+        for i in range(1, count + 1):
+            last = rng.choice(LAST_NAMES)
+            rows.append((
+                str(i),
+                f"{year[-2:]}{sams}{s_idx}{i:04d}",
+                f"{year[-2:]}{s_idx}{sams}{i:04d}",
+                f"{rng.choice(FIRST_NAMES)} {last}".upper(),
+                f"{rng.choice(FIRST_NAMES)} {last}".upper(),
+                f"{rng.choice(FIRST_NAMES)} {last}".upper(),
+                rng.choice(("Male", "Female")),
+            ))
+        return rows
+
+    def describe(self):
+        n_colleges = sum(len(c) for c in self.colleges.values())
+        return {
+            "years": len(self.years),
+            "districts": len(self.districts),
+            "colleges": n_colleges,
+            "streams": len(self.streams),
+            "rows": self.rows,
+            "tasks": len(self.years) * n_colleges * len(self.streams),
+        }
+
+
+# ---------- HTML ----------
+
+PAGE_HEAD = """<!DOCTYPE html>
+<html><head><title>SAMS Odisha (mock)</title>
+<link rel="stylesheet" href="/static/site.css" />
+</head><body>
+<img src="/static/logo.png" alt="SAMS" />
+<form method="post" action="{action}" id="form1">
+<input type="hidden" name="__EVENTTARGET" id="__EVENTTARGET" value="" />
+<input type="hidden" name="__EVENTARGUMENT" id="__EVENTARGUMENT" value="" />
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{viewstate}" />
+<script type="text/javascript">
+var theForm = document.forms['form1'];
+function __doPostBack(eventTarget, eventArgument) {{
+    theForm.__EVENTTARGET.value = eventTarget;
+    theForm.__EVENTARGUMENT.value = eventArgument;
+    theForm.submit();
+}}
+</script>
+"""
+PAGE_TAIL = "</form></body></html>"
+
+
+def select_html(name, labels, selected, autopostback=True):
+    """ASP.NET DropDownList: value "0" is the --Select-- prompt, options are numbered from 1."""
+    onchange = ""
+    if autopostback:
+        onchange = (f' onchange="javascript:setTimeout(&#39;__doPostBack(\\&#39;{name}'
+                    f'\\&#39;,\\&#39;\\&#39;)&#39;, 0)"')
+    options = ['<option value="0">--Select--</option>']
+    for i, label in enumerate(labels, 1):
+        mark = ' selected="selected"' if str(i) == selected else ""
+        options.append(f'<option{mark} value="{i}">{html.escape(label)}</option>')
+    return f'<select name="{name}" id="{name}"{onchange}>{"".join(options)}</select>\n'
+
+
+def chosen(labels, value):
+    """Label behind a dropdown value, or None for the prompt/unknown values."""
+    try:
+        idx = int(value)
+    except (TypeError, ValueError):
+        return None
+    return labels[idx - 1] if 1 <= idx <= len(labels) else None
+
+
+def grid_html(table_id, header, rows, show_all, item_class=None, always_link=False):
+    parts = []
+    if not show_all and (always_link or len(rows) > PAGE_SIZE):
+        parts.append('<a id="lbtnAll" href="javascript:__doPostBack(&#39;lbtnAll&#39;,&#39;&#39;)">Show All</a>\n')
+        rows = rows[:PAGE_SIZE]
+    cls = f' class="{item_class}"' if item_class else ""
+    parts.append(f'<table id="{table_id}" cellspacing="0" rules="all" border="1">')
+    parts.append("<tr>" + "".join(f"<th>{h}</th>" for h in header) + "</tr>")
+    for row in rows:
+        parts.append(f"<tr{cls}>" + "".join(f"<td>{html.escape(c)}</td>" for c in row) + "</tr>")
+    parts.append("</table>\n")
+    return "".join(parts)
+
+
+# ---------- PAGES ----------
+
+class StudentsPage:
+    """ReportCollegeWiseStudentDetails_Approved.aspx"""
+
+    cascade = ("ddlYear", "ddlDistrict", "ddlCollege")
+    header = ("Sl No", "Registration No", "Exam Roll No", "Student Name",
+              "Father Name", "Mother Name", "Gender")
+
+    def __init__(self, dataset):
+        self.data = dataset
+
+    def update(self, state, form, target):
+        for name in self.cascade + ("ddlStream",):
+            state[name] = form.get(name, "0")
+        if target in self.cascade:
+            for name in self.cascade[self.cascade.index(target) + 1:] + ("ddlStream",):
+                state[name] = "0"
+            state["show"] = state["all"] = False
+        if "btnShow" in form:
+            state["show"], state["all"] = True, False
+        if target == "lbtnAll":
+            state["all"] = True
+
+    def body(self, state):
+        year = chosen(self.data.years, state.get("ddlYear"))
+        districts = self.data.districts if year else []
+        district = chosen(districts, state.get("ddlDistrict"))
+        colleges = self.data.college_names(district) if district else []
+        college = chosen(colleges, state.get("ddlCollege"))
+        streams = self.data.streams if college else []
+        stream = chosen(streams, state.get("ddlStream"))
+
+        out = [
+            select_html("ddlYear", self.data.years, state.get("ddlYear")),
+            select_html("ddlDistrict", districts, state.get("ddlDistrict")),
+            select_html("ddlCollege", colleges, state.get("ddlCollege")),
+            select_html("ddlStream", streams, state.get("ddlStream"), autopostback=False),
+            '<input type="submit" name="btnShow" value="Show" id="btnShow" />\n',
+        ]
+        if state.get("show") and stream:
+            rows = self.data.students(year, district, college, stream)
+            if rows:
+                out.append(grid_html("grdRptStd", self.header, rows, state.get("all")))
+            else:
+                out.append('<span id="lblMsg">No Record Found</span>\n')
+        return "".join(out)
+
+
+class InstitutesPage:
+    """
+    CollegeWiseApplicantReport_Approve.aspx. The "Show All" link is always
+    offered and, once clicked, sticks for the session, as on the portal.
+    """
+
+    header = ("Sl No", "SAMS Code", "CHSE Code", "District", "Block/ULB", "College Name")
+
+    def __init__(self, dataset):
+        self.data = dataset
+
+    def update(self, state, form, target):
+        for name in ("ddlDistrict", "ddlYear"):
+            state[name] = form.get(name, "0")
+        if target in ("ddlDistrict", "ddlYear"):
+            state["show"] = False
+        if "btnShow" in form:
+            state["show"] = True
+        if target == "lbtnAll":
+            state["all"] = True
+
+    def body(self, state):
+        district = chosen(self.data.districts, state.get("ddlDistrict"))
+        year = chosen(INSTITUTE_YEARS, state.get("ddlYear"))
+        out = [
+            select_html("ddlDistrict", self.data.districts, state.get("ddlDistrict"), autopostback=False),
+            select_html("ddlYear", INSTITUTE_YEARS, state.get("ddlYear")),
+            '<input type="submit" name="btnShow" value="Show" id="btnShow" />\n',
+        ]
+        if state.get("show") and district and year:
+            rows = [
+                (str(i), sams, chse, district, block, name)
+                for i, (sams, chse, block, name) in enumerate(self.data.colleges[district], 1)
+            ]
+            out.append(grid_html("grdView", self.header, rows, state.get("all"),
+                                 item_class="tblItem", always_link=True))
+        return "".join(out)
+
+
+# ---------- SERVER ----------
+
+class PortalHandler(BaseHTTPRequestHandler):
+    server_version = "MockSAMS/1.0"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        self.server.portal.delay()
+        if path.startswith("/static/"):
+            kind = "text/css" if path.endswith(".css") else "application/octet-stream"
+            self.send(b"/*" + b"." * (ASSET_BYTES - 4) + b"*/", kind)
+        elif path == "/stats":
+            self.send(json.dumps(self.server.portal.stats).encode(), "application/json")
+        elif path in self.server.portal.pages:
+            self.render(path, {})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        page = self.server.portal.pages.get(path)
+        if page is None:
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        form = dict(parse_qsl(self.rfile.read(length).decode("utf-8"), keep_blank_values=True))
+        try:
+            state = json.loads(base64.b64decode(form.get("__VIEWSTATE", "")) or b"{}")
+        except ValueError:
+            state = {}
+        page.update(state, form, form.get("__EVENTTARGET", ""))
+        self.server.portal.count("postbacks")
+        self.server.portal.delay()
+        self.render(path, state)
+
+    def render(self, path, state):
+        page = self.server.portal.pages[path]
+        viewstate = base64.b64encode(json.dumps(state).encode()).decode()
+        action = html.escape("." + path[path.rfind("/"):] + "?" + (urlparse(self.path).query or ""))
+        doc = PAGE_HEAD.format(action=action, viewstate=viewstate) + page.body(state) + PAGE_TAIL
+        self.send(doc.encode("utf-8"), "text/html; charset=utf-8")
+
+    def send(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.portal.count("requests")
+        self.server.portal.count("bytes_sent", len(body))
+
+
+class MockPortal:
+    """
+    Threaded HTTP server for a MockDataset. Every request waits latency_ms
+    (plus up to `jitter` of it again) before it is answered.
+    """
+
+    def __init__(self, dataset, latency_ms=0, jitter=0.25, host="127.0.0.1", port=0):
+        self.dataset = dataset
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter
+        self.pages = {STUDENTS_PATH: StudentsPage(dataset), INSTITUTES_PATH: InstitutesPage(dataset)}
+        self.stats = {"requests": 0, "postbacks": 0, "bytes_sent": 0}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), PortalHandler)
+        self.server.daemon_threads = True
+        self.server.portal = self
+        self._thread = None
+
+    @property
+    def root(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def students_url(self):
+        return self.root + STUDENTS_PATH + "?mock=1"
+
+    @property
+    def institutes_url(self):
+        return self.root + INSTITUTES_PATH + "?mock=1"
+
+    def delay(self):
+        if self.latency:
+            time.sleep(self.latency * (1 + random.random() * self.jitter))
+
+    def count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def add_dataset_args(parser):
+    """Dataset/latency flags shared by mock_portal.py and benchmark.py."""
+    parser.add_argument("--years", default="2024,2025", help="Comma-separated years on the student report")
+    parser.add_argument("--districts", type=int, default=3, help="Number of districts")
+    parser.add_argument("--colleges", type=int, default=4, help="Colleges per district")
+    parser.add_argument("--streams", type=int, default=2, help="Streams per college (max 4)")
+    parser.add_argument("--rows", type=int, default=100, help="Average students per grid")
+    parser.add_argument("--empty-every", type=int, default=10, help="About one grid in N is empty (0: none)")
+    parser.add_argument("--latency-ms", type=int, default=50, help="Delay added to every response")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def dataset_from_args(args):
+    return MockDataset(
+        years=[y.strip() for y in args.years.split(",") if y.strip()],
+        districts=args.districts,
+        colleges=args.colleges,
+        streams=args.streams,
+        rows=args.rows,
+        empty_every=args.empty_every,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the SAMS report pages")
+    add_dataset_args(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    dataset = dataset_from_args(args)
+    portal = MockPortal(dataset, latency_ms=args.latency_ms, host=args.host, port=args.port)
+    print(f"Mock SAMS portal on {portal.root} ({json.dumps(dataset.describe())})")
+    print(f"  export SAMS_STUDENTS_URL='{portal.students_url}'")
+    print(f"  export SAMS_INSTITUTES_URL='{portal.institutes_url}'")
+    try:
+        portal.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        portal.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
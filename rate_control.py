@@ -0,0 +1,207 @@
+"""
+Adaptive request pacing shared by scraper.py and creaper.py.
+
+RateController watches how long portal postbacks take and how often they
+time out or fail, and adjusts two knobs with additive-increase /
+multiplicative-decrease (AIMD), the way TCP finds a link's capacity:
+
+  - the request rate: the minimum spacing between postback starts
+  - the concurrency: postbacks allowed in flight at once (async pages,
+    HTTP sessions)
+
+Every on-time response adds a little to both. A slow response (latency
+EWMA well above the best latency seen for that kind of postback) or a
+failure cuts both in half, at most once per round trip, so one burst of
+timeouts is one decrease. Postbacks whose time grows with the grid they
+return (GRID_KINDS) are never judged slow, only failed.
+backoff_delay() gives the jittered exponential wait between retries.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+# Requests per second the controller starts at and never exceeds, and the
+# floor it backs off to (one postback every 5 s)
+DEFAULT_MAX_RATE = 10.0
+MIN_RATE = 0.2
+# Added to the rate (req/s) and to the concurrency limit (in 1/limit steps,
+# one slot per window of on-time responses) per on-time response
+RATE_INCREASE = 0.25
+# Both knobs are multiplied by this on a slow or failed response
+DECREASE_FACTOR = 0.5
+
+# A response is slow when the latency EWMA is this many times the baseline
+# (the best latency seen, drifting up slowly) and above MIN_SLOW_LATENCY s
+LATENCY_TOLERANCE = 2.0
+MIN_SLOW_LATENCY = 1.0
+EWMA_WEIGHT = 0.2
+BASELINE_DRIFT = 0.01
+
+# Kind of postback a slot is for, unless the caller names one. Latency is
+# tracked per kind, so cheap dropdown postbacks and grid loads do not share
+# a baseline.
+DEFAULT_KIND = "postback"
+# Kinds that return a whole grid: a large college is slow without the portal
+# being overloaded, so only their failures count
+GRID_KINDS = ("show_all",)
+
+# Retry waits: uniformly random in [0, min(cap, base * 2**(attempt-1))]
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Seconds to wait before retry number `attempt` (1-based), with full jitter."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class Ticket:
+    """Handed out by a slot; set failed to count a response that did not raise as a failure."""
+
+    def __init__(self):
+        self.failed = False
+
+
+class RateController:
+    """
+    AIMD pacing and concurrency limit for postbacks to one portal. Thread-safe;
+    slot() is for threads, async_slot() for coroutines on one event loop.
+
+        with rate.slot("show") as ticket:
+            response = post(...)
+            if response_was_bad:
+                ticket.failed = True      # exceptions count as failures too
+    """
+
+    def __init__(self, max_concurrency=1, max_rate=DEFAULT_MAX_RATE, enabled=True):
+        self._cond = threading.Condition()
+        self.reset(max_concurrency, max_rate, enabled)
+
+    def reset(self, max_concurrency=1, max_rate=DEFAULT_MAX_RATE, enabled=True):
+        """Starts over with new limits (e.g. once the CLI arguments are known)."""
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_rate = max_rate
+        self.enabled = enabled
+        self.rate = max_rate
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.next_start = 0.0
+        # Per kind of postback: latency EWMA and the best latency seen
+        self.latency = {}
+        self.baseline = {}
+        self.last_decrease = 0.0
+        self.stats = {"requests": 0, "slow": 0, "failed": 0, "decreases": 0, "waited": 0.0}
+
+    # ---------- admission ----------
+
+    def _try_start(self, now):
+        """Takes a slot if one is free and the pacing allows it; else seconds to wait."""
+        if not self.enabled:
+            self.in_flight += 1
+            return 0.0
+        if self.in_flight >= max(1, int(self.limit)):
+            return None
+        wait = self.next_start - now
+        if wait > 0:
+            return wait
+        self.in_flight += 1
+        self.next_start = max(self.next_start, now) + 1.0 / self.rate
+        return 0.0
+
+    def acquire(self):
+        t0 = time.time()
+        with self._cond:
+            while True:
+                wait = self._try_start(time.time())
+                if wait == 0.0:
+                    break
+                self._cond.wait(wait)
+            self.stats["waited"] += time.time() - t0
+
+    async def async_acquire(self):
+        t0 = time.time()
+        while True:
+            with self._cond:
+                wait = self._try_start(time.time())
+                if wait == 0.0:
+                    self.stats["waited"] += time.time() - t0
+                    return
+            # A released slot does not wake coroutines; poll at the pacing interval
+            await asyncio.sleep(wait if wait else min(0.05, 1.0 / self.rate))
+
+    def release(self, seconds, ok=True, kind=DEFAULT_KIND):
+        with self._cond:
+            self.in_flight -= 1
+            self._observe(seconds, ok, kind)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, kind=DEFAULT_KIND):
+        self.acquire()
+        ticket = Ticket()
+        t0 = time.time()
+        try:
+            yield ticket
+        except BaseException:
+            ticket.failed = True
+            raise
+        finally:
+            self.release(time.time() - t0, not ticket.failed, kind)
+
+    @asynccontextmanager
+    async def async_slot(self, kind=DEFAULT_KIND):
+        await self.async_acquire()
+        ticket = Ticket()
+        t0 = time.time()
+        try:
+            yield ticket
+        except BaseException:
+            ticket.failed = True
+            raise
+        finally:
+            self.release(time.time() - t0, not ticket.failed, kind)
+
+    # ---------- AIMD ----------
+
+    def _observe(self, seconds, ok, kind=DEFAULT_KIND):
+        self.stats["requests"] += 1
+        slow = False
+        if ok:
+            latency = self.latency.get(kind)
+            latency = seconds if latency is None else (1 - EWMA_WEIGHT) * latency + EWMA_WEIGHT * seconds
+            baseline = self.baseline.get(kind)
+            baseline = seconds if baseline is None else min(seconds, baseline + (latency - baseline) * BASELINE_DRIFT)
+            self.latency[kind] = latency
+            self.baseline[kind] = baseline
+            slow = kind not in GRID_KINDS and latency > max(baseline * LATENCY_TOLERANCE, MIN_SLOW_LATENCY)
+        if slow:
+            self.stats["slow"] += 1
+        if not ok:
+            self.stats["failed"] += 1
+
+        if not ok or slow:
+            # One decrease per round trip: a burst of failures is one congestion event
+            now = time.time()
+            if now - self.last_decrease < max(self.latency.get(kind, 0.0), 1.0):
+                return
+            self.last_decrease = now
+            self.stats["decreases"] += 1
+            self.rate = max(MIN_RATE, self.rate * DECREASE_FACTOR)
+            self.limit = max(1.0, self.limit * DECREASE_FACTOR)
+        else:
+            self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+            self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+
+    def summary(self):
+        s = self.stats
+        if not s["requests"]:
+            return ""
+        latency = ", ".join(f"{k} {v:.2f}s" for k, v in sorted(self.latency.items())) or "-"
+        return (
+            f"Rate control: {s['requests']} postbacks, {s['slow']} slow, {s['failed']} failed, "
+            f"{s['decreases']} slowdowns, {s['waited']:.1f}s paced; now {self.rate:.2f} req/s, "
+            f"{int(self.limit)}/{self.max_concurrency} in flight, latency {latency}"
+        )
@@ -0,0 +1,386 @@
+"""
+Browserless access to the SAMS ASP.NET WebForms report pages.
+
+The pages are driven entirely by form postbacks (__VIEWSTATE,
+__EVENTVALIDATION, __EVENTTARGET), so they can be replayed over plain HTTP:
+SamsHttpClient keeps the current form state, fires the same postbacks the
+browser would, and parses the result grids out of the returned HTML.
+Used by `scraper.py --engine http` and `creaper.py --engine http`.
+"""
+
+import re
+import time
+from contextlib import nullcontext
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+)
+
+# javascript:__doPostBack('lbtnAll','') -> ("lbtnAll", "")
+DO_POSTBACK_RE = re.compile(r"__doPostBack\(\s*'([^']*)'\s*,\s*'([^']*)'\s*\)")
+# Opening or closing <table> tag; group 1 is "/" for a closing one
+TABLE_TAG_RE = re.compile(r"<(/?)table\b", re.I)
+
+
+# ================= GRID PARSING =================
+
+class GridParser(HTMLParser):
+    """
+    Incremental parser for an ASP.NET GridView table.
+    Feed it HTML (whole page or chunks) and collect rows with pop_rows().
+    Every <tr> inside the table becomes one row of <td> texts, in document
+    order, like querySelectorAll("tr") would return them.
+    """
+
+    def __init__(self, table_id):
+        super().__init__(convert_charrefs=True)
+        self.table_id = table_id
+        self._table_depth = 0      # nesting depth of <table> inside the grid
+        self._open_rows = []       # stack of [slot, cells] for unfinished <tr>
+        self._open_cells = []      # stack of text buffers for unfinished <td>
+        self._slots = []           # rows in start order; None until closed
+        self._emitted = 0
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == "table":
+            if self._table_depth:
+                self._table_depth += 1
+            elif dict(attrs).get("id") == self.table_id:
+                self._table_depth = 1
+            return
+        if not self._table_depth:
+            return
+        if tag == "tr":
+            self._slots.append(None)
+            self._open_rows.append([len(self._slots) - 1, []])
+        elif tag == "td" and self._open_rows:
+            self._open_cells.append([])
+        elif tag == "br" and self._open_cells:
+            self._open_cells[-1].append("\n")
+
+    def handle_endtag(self, tag):
+        if not self._table_depth:
+            return
+        if tag == "td" and self._open_cells:
+            self._close_cell()
+        elif tag == "tr" and self._open_rows:
+            self._close_row()
+        elif tag == "table":
+            self._table_depth -= 1
+            if not self._table_depth:
+                while self._open_rows:
+                    self._close_row()
+                self.done = True
+
+    def handle_data(self, data):
+        if self._table_depth and self._open_cells:
+            # Text of a nested cell also belongs to every enclosing cell
+            for buf in self._open_cells:
+                buf.append(data)
+
+    def _close_cell(self):
+        text = "".join(self._open_cells.pop())
+        if self._open_rows:
+            self._open_rows[-1][1].append(text)
+
+    def _close_row(self):
+        while len(self._open_cells) > len(self._open_rows) - 1 and self._open_cells:
+            self._close_cell()
+        slot, cells = self._open_rows.pop()
+        self._slots[slot] = cells
+
+    def pop_rows(self):
+        """Returns rows that are complete and not yet returned, in order."""
+        out = []
+        while self._emitted < len(self._slots) and self._slots[self._emitted] is not None:
+            out.append(self._slots[self._emitted])
+            self._slots[self._emitted] = ()  # release the cells, keep the slot
+            self._emitted += 1
+        return out
+
+
+def parse_grid_html(html, table_id="grdRptStd"):
+    """Parses a grid out of an HTML string. Header row is dropped."""
+    parser = GridParser(table_id)
+    parser.feed(html)
+    parser.close()
+    return parser.pop_rows()[1:]
+
+
+def iter_grid_html(html, table_id="grdRptStd", chunk_size=65536):
+    """
+    Yields the data rows of a grid (header dropped) while the HTML is fed to
+    GridParser chunk by chunk, so only one chunk's rows are held at a time.
+    Stops reading once the table has closed.
+    """
+    parser = GridParser(table_id)
+    header = True
+    for start in range(0, len(html), chunk_size):
+        parser.feed(html[start:start + chunk_size])
+        for row in parser.pop_rows():
+            if header:
+                header = False
+                continue
+            yield row
+        if parser.done:
+            return
+    parser.close()
+    for row in parser.pop_rows()[1 if header else 0:]:
+        yield row
+
+
+def cut_grid_html(html, table_id="grdRptStd"):
+    """
+    Returns (html, found): the page with everything inside <table id=table_id>
+    removed (the empty table itself stays, so selectors still match) and
+    whether the table was there.
+    """
+    start = re.search(r"""<table\b[^>]*\bid\s*=\s*["']?%s["'\s>]""" % re.escape(table_id), html, re.I)
+    if not start:
+        return html, False
+    body_start = html.index(">", start.start()) + 1
+    depth = 1
+    for tag in TABLE_TAG_RE.finditer(html, body_start):
+        depth += -1 if tag.group(1) else 1
+        if not depth:
+            return html[:body_start] + html[tag.start():], True
+    return html, False
+
+
+# ================= FORM STATE =================
+
+class FormParser(HTMLParser):
+    """
+    Collects what is needed to post the page's form back: the action URL,
+    every input value, each <select> with its options and selection, submit
+    buttons, __doPostBack links, and the set of element ids on the page.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.action = None
+        self.fields = {}      # name -> value of hidden/text/checked inputs
+        self.selects = {}     # id -> {"name", "options": [(label, value)], "selected", "autopostback"}
+        self.buttons = {}     # id -> (name, value) of submit inputs/buttons
+        self.links = {}       # id -> (event_target, event_argument)
+        self.ids = set()
+        self._select = None
+        self._option = None
+
+    def handle_starttag(self, tag, attrs):
+        a = {k: (v if v is not None else "") for k, v in attrs}
+        if a.get("id"):
+            self.ids.add(a["id"])
+
+        if tag == "form" and self.action is None:
+            self.action = a.get("action", "")
+        elif tag == "input":
+            kind = a.get("type", "text").lower()
+            name = a.get("name")
+            if kind in ("submit", "image", "button"):
+                if a.get("id") and name:
+                    self.buttons[a["id"]] = (name, a.get("value", ""))
+            elif kind in ("checkbox", "radio"):
+                if name and "checked" in a:
+                    self.fields[name] = a.get("value", "on")
+            elif name:
+                self.fields[name] = a.get("value", "")
+        elif tag == "button" and a.get("id") and a.get("name"):
+            self.buttons[a["id"]] = (a["name"], a.get("value", ""))
+        elif tag == "select":
+            self._select = {
+                "name": a.get("name", a.get("id", "")),
+                "options": [],
+                "selected": None,
+                "autopostback": "__doPostBack" in a.get("onchange", ""),
+            }
+            self.selects[a.get("id") or self._select["name"]] = self._select
+        elif tag == "option" and self._select is not None:
+            self._option = [a.get("value"), [], "selected" in a]
+        elif tag == "a" and a.get("id"):
+            m = DO_POSTBACK_RE.search(a.get("href", ""))
+            if m:
+                self.links[a["id"]] = (m.group(1), m.group(2))
+
+    def handle_endtag(self, tag):
+        if tag == "option":
+            self._close_option()
+        elif tag == "select" and self._select is not None:
+            self._close_option()
+            sel = self._select
+            if sel["selected"] is None and sel["options"]:
+                sel["selected"] = sel["options"][0][1]
+            self._select = None
+
+    def handle_data(self, data):
+        if self._option is not None:
+            self._option[1].append(data)
+
+    def _close_option(self):
+        if self._option is None or self._select is None:
+            return
+        value, text, selected = self._option
+        label = "".join(text).strip()
+        value = label if value is None else value
+        self._select["options"].append((label, value))
+        if selected:
+            self._select["selected"] = value
+        self._option = None
+
+
+class PortalError(Exception):
+    """The page did not contain what a postback needed (missing control or option)."""
+
+
+# ================= CLIENT =================
+
+# RateController kind of a postback, by the id of the control that sent it
+# (others count as "postback"); see rate_control.GRID_KINDS
+DEFAULT_RATE_KINDS = {"btnShow": "show", "lbtnAll": "show_all"}
+
+
+class SamsHttpClient:
+    """
+    One browserless "page" on a SAMS report URL, backed by a pooled
+    requests.Session (cookies keep the ASP.NET session).
+
+    Controls are addressed by the same "#id" selectors the Playwright code
+    uses. select_option() posts back only for AutoPostBack dropdowns whose
+    value actually changes; click() handles submit buttons and __doPostBack
+    links. With a rate_control.RateController every request waits for a
+    slot, and errors and 4xx/5xx responses count as failures; rate_kinds
+    maps control ids to the kind of postback the rate is judged by.
+    """
+
+    def __init__(self, base_url, timeout=60, session=None, pool_size=4, rate=None, rate_kinds=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.rate = rate
+        self.rate_kinds = DEFAULT_RATE_KINDS if rate_kinds is None else rate_kinds
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+        self.session = session
+        self.url = base_url
+        self.html = ""
+        self.form = FormParser()
+        self.requests = 0
+        self.postbacks_avoided = 0
+        self.bytes_received = 0
+        self.seconds = 0.0
+
+    # ---------- transport ----------
+
+    def _record(self, response, t0):
+        self.requests += 1
+        self.bytes_received += len(response.content)
+        self.seconds += time.time() - t0
+
+    def _send(self, method, url, kind="postback", **kwargs):
+        with self.rate.slot(kind) if self.rate else nullcontext() as ticket:
+            t0 = time.time()
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            self._record(response, t0)
+            if ticket and response.status_code >= 400:
+                ticket.failed = True
+        return response
+
+    def _parse(self, response):
+        response.raise_for_status()
+        self.url = response.url
+        self.html = response.text
+        form = FormParser()
+        form.feed(self.html)
+        form.close()
+        self.form = form
+
+    def load(self):
+        response = self._send("GET", self.base_url, "load")
+        self._parse(response)
+        return self
+
+    def _post(self, event_target="", event_argument="", extra=None, control=None):
+        data = dict(self.form.fields)
+        for sel in self.form.selects.values():
+            if sel["selected"] is not None:
+                data[sel["name"]] = sel["selected"]
+        data["__EVENTTARGET"] = event_target
+        data["__EVENTARGUMENT"] = event_argument
+        if extra:
+            data.update(extra)
+
+        url = urljoin(self.url, self.form.action) if self.form.action else self.url
+        response = self._send("POST", url, self.rate_kinds.get(control, "postback"), data=data)
+        self._parse(response)
+
+    # ---------- page-like API ----------
+
+    @staticmethod
+    def _id(selector):
+        return selector.lstrip("#")
+
+    def has(self, selector):
+        return self._id(selector) in self.form.ids
+
+    def options(self, selector):
+        """Returns [(label, value), ...] of a dropdown."""
+        sel = self.form.selects.get(self._id(selector))
+        if sel is None:
+            raise PortalError(f"No dropdown {selector} on page")
+        return list(sel["options"])
+
+    def selected_label(self, selector):
+        sel = self.form.selects.get(self._id(selector))
+        if sel is None:
+            return None
+        for label, value in sel["options"]:
+            if value == sel["selected"]:
+                return label
+        return None
+
+    def select_option(self, selector, label=None, value=None):
+        sel = self.form.selects.get(self._id(selector))
+        if sel is None:
+            raise PortalError(f"No dropdown {selector} on page")
+        if value is None:
+            matches = [v for lbl, v in sel["options"] if lbl == label]
+            if not matches:
+                raise PortalError(f"No option '{label}' in {selector}")
+            value = matches[0]
+        if sel["selected"] == value and sel["autopostback"]:
+            # Already the server-side selection; a postback would change nothing
+            self.postbacks_avoided += 1
+            return
+        sel["selected"] = value
+        if sel["autopostback"]:
+            self._post(event_target=sel["name"], control=self._id(selector))
+
+    def click(self, selector):
+        key = self._id(selector)
+        if key in self.form.buttons:
+            name, value = self.form.buttons[key]
+            self._post(extra={name: value}, control=key)
+        elif key in self.form.links:
+            target, argument = self.form.links[key]
+            self._post(event_target=target, event_argument=argument, control=key)
+        else:
+            raise PortalError(f"No button or postback link {selector} on page")
+
+    def grid_rows(self, selector):
+        """Data rows (header excluded) of a grid on the current page."""
+        return parse_grid_html(self.html, self._id(selector))
+
+    def close(self):
+        self.session.close()
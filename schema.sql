@@ -51,6 +51,8 @@ CREATE TABLE IF NOT EXISTS `institutes` (
 -- =====================================
 -- Table: students
 -- =====================================
+-- The primary key is the natural key scraper.py dedups and upserts on.
+-- Existing databases with duplicate rows: python migrate_students.py
 
 CREATE TABLE IF NOT EXISTS `students` (
   `reg_no` varchar(255) NOT NULL,
@@ -66,11 +68,66 @@ CREATE TABLE IF NOT EXISTS `students` (
   `institute_id` int NOT NULL,
   `sams_code` varchar(50) NOT NULL,
   `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  `row_hash` char(40) DEFAULT NULL COMMENT 'SHA-1 of the scraped fields, for change detection',
+  PRIMARY KEY (`year`, `institute_id`, `reg_no`, `exam_roll_no`),
   KEY `idx_institute_year_roll` (`institute_id`, `year`, `exam_roll_no`),
   KEY `idx_students_sams_year` (`sams_code`, `year`),
-  KEY `idx_students_sams_code` (`sams_code`),
   KEY `idx_students_year_stream` (`year`, `stream`),
   KEY `idx_students_district_year` (`district`, `year`)
 ) ENGINE=InnoDB
   DEFAULT CHARSET=utf8mb4
   COLLATE=utf8mb4_0900_ai_ci;
+
+
+-- =====================================
+-- Table: student_snapshots
+-- =====================================
+-- Content hash of the last written grid per (year, institute, stream).
+-- scraper.py skips the DB write when a re-scraped grid hashes the same.
+--
+-- Existing databases also need the row_hash column on the students table
+-- (migrate_students.py adds it):
+--   ALTER TABLE students ADD COLUMN `row_hash` char(40) DEFAULT NULL;
+
+CREATE TABLE IF NOT EXISTS `student_snapshots` (
+  `year` varchar(50) NOT NULL,
+  `institute_id` int NOT NULL,
+  `stream` varchar(255) NOT NULL,
+  `snapshot_hash` char(40) NOT NULL,
+  `row_count` int NOT NULL DEFAULT 0,
+  `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`year`, `institute_id`, `stream`)
+) ENGINE=InnoDB
+  DEFAULT CHARSET=utf8mb4
+  COLLATE=utf8mb4_0900_ai_ci;
+
+
+-- =====================================
+-- Table: scrape_tasks
+-- =====================================
+-- Shared task queue for scraper.py --shared-queue NAME. Discovered tasks are
+-- published once per queue; hosts claim them with SELECT ... FOR UPDATE
+-- SKIP LOCKED and hold them under a lease that a heartbeat keeps extending.
+-- A lease that expires (its host died) is claimed again by another host.
+
+CREATE TABLE IF NOT EXISTS `scrape_tasks` (
+  `task_id` bigint NOT NULL AUTO_INCREMENT,
+  `queue_name` varchar(100) NOT NULL,
+  `year` varchar(50) NOT NULL,
+  `district` varchar(255) NOT NULL,
+  `college` varchar(512) NOT NULL,
+  `stream` varchar(255) NOT NULL,
+  `status` varchar(20) NOT NULL DEFAULT 'pending' COMMENT 'pending, leased, or the final task status',
+  `owner` varchar(255) DEFAULT NULL COMMENT 'host:pid of the worker holding the lease',
+  `lease_expires` datetime DEFAULT NULL,
+  `heartbeat_at` datetime DEFAULT NULL,
+  `attempts` int NOT NULL DEFAULT 0,
+  `row_count` int NOT NULL DEFAULT 0,
+  `last_error` text,
+  `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`task_id`),
+  UNIQUE KEY `uq_scrape_tasks_task` (`queue_name`, `year`, `district`(100), `college`(200), `stream`(100)),
+  KEY `idx_scrape_tasks_claim` (`queue_name`, `status`, `lease_expires`)
+) ENGINE=InnoDB
+  DEFAULT CHARSET=utf8mb4
+  COLLATE=utf8mb4_0900_ai_ci;
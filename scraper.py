@@ -1,63 +1,147 @@
 import mysql.connector
+import asyncio
 import time
 import argparse
 import os
 import json
+import csv
 import re
+import shlex
+import base64
+import hashlib
+from collections import defaultdict, deque
 from datetime import datetime
 import sys
 import traceback
+import multiprocessing
+import queue
+import sqlite3
+import socket
+import threading
+import itertools
+import contextvars
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import parse_qs, urlparse
 from playwright.sync_api import sync_playwright, TimeoutError, Error as PlaywrightError
+from playwright.async_api import async_playwright, TimeoutError as AsyncTimeoutError
+from sams_http import SamsHttpClient, cut_grid_html, iter_grid_html, parse_grid_html
+from browser_tools import ResourceBlocker, descendant_pss_mb, parse_blocked_resources
+from rate_control import DEFAULT_MAX_RATE, RateController, backoff_delay
+from capture_store import CaptureStore
+from db_config import DB_CONFIG, STAGING_DIR, STUDENT_FIELDS, STUDENTS_TABLE, Colors, print_status
 
 # ================= CONFIG =================
 
-DB_CONFIG = {
-    "host": "localhost",
-    "user": "your_username",
-    "password": "your_password",
-    "database": "student_db",
-}
+# DB_CONFIG, STUDENTS_TABLE, STUDENT_FIELDS and STAGING_DIR live in db_config.py
 
-BASE_URL = "https://hss.samsodisha.gov.in/newHSS/ReportCollegeWiseStudentDetails_Approved.aspx?MYx4BuYeE1G1NjtO83XBep3DRVEn1aNZYsg5QGBtTGc="
+# SAMS_STUDENTS_URL / SAMS_DB_NAME point a run at another portal or database
+# (benchmark.py uses them to run against mock_portal.py)
+BASE_URL = os.environ.get(
+    "SAMS_STUDENTS_URL",
+    "https://hss.samsodisha.gov.in/newHSS/ReportCollegeWiseStudentDetails_Approved.aspx?MYx4BuYeE1G1NjtO83XBep3DRVEn1aNZYsg5QGBtTGc=",
+)
 
 LOG_DIR = "logs"
 DB_ERRORS_LOG = os.path.join(LOG_DIR, "db_errors.log")
 FAILED_ROWS_LOG = os.path.join(LOG_DIR, "failed_rows.log")
 COLLEGE_MISMATCH_LOG = os.path.join(LOG_DIR, "college_name_mismatch.log")
+BROWSER_EVENTS_LOG = os.path.join(LOG_DIR, "browser_events.log")
+
+# Local SQLite file recording every task's outcome, used by --resume
+LEDGER_PATH = "scrape_ledger.sqlite3"
+# Cached Year/District/College/Stream option tree used to skip discovery walks
+DISCOVERY_CACHE_PATH = "discovery_cache.json"
+DISCOVERY_CACHE_TTL_HOURS = 24
+
+# Postback waits: how long to wait for the ASP.NET POST response, then for the
+# dependent element to be re-rendered, before falling back to networkidle
+POSTBACK_RESPONSE_TIMEOUT_MS = 30000
+POSTBACK_READY_TIMEOUT_MS = 10000
+
+# Task statuses that --resume treats as finished
+LEDGER_COMPLETE_STATUSES = ("done", "empty")
+
+# Shared task queue (--shared-queue NAME) in the MySQL scrape_tasks table:
+# tasks claimed per worker per round, seconds a lease lasts without a
+# heartbeat (heartbeats run every third of that), and how often a task that
+# ended in error is handed out again before it stays failed
+SHARED_TASKS_TABLE = "scrape_tasks"
+DEFAULT_CLAIM_SIZE = 25
+DEFAULT_LEASE_SECONDS = 120
+SHARED_TASK_MAX_ATTEMPTS = 3
+
+# How the #grdRptStd grid is read back from the page:
+#   evaluate - one page.evaluate() call returning every row's cell texts
+#   html     - fetch the grid's outerHTML once and parse it in Python
+#   locator  - legacy per-row locator calls (one round trip per row)
+#   response - the "Show All" postback response is intercepted and parsed in
+#              Python; the browser renders the page without the grid (sync
+#              engine only)
+EXTRACT_MODES = ("evaluate", "html", "locator", "response")
+DEFAULT_EXTRACT_MODE = "evaluate"
+
+# Worker pool (--workers N): how often a task is retried after its worker
+# process died, and how often a worker slot is respawned before giving up
+MAX_TASK_ATTEMPTS = 2
+MAX_WORKER_RESTARTS = 3
+
+# Async engine (--engine async): pages in flight in one process, and how many
+# extracted task batches may wait for the DB writer before pages back off
+DEFAULT_MAX_PAGES = 8
+ASYNC_WRITE_QUEUE_SIZE = 16
+
+# Sync engine (--write-queue N): extracted tasks that may wait for the
+# background DB writer before scraping blocks (0 writes inline), and how
+# often the writer retries a task's rows after a DB error before giving up
+DEFAULT_WRITE_QUEUE_SIZE = 8
+WRITE_RETRIES = 3
+
+# Browser lifecycle (sync engine): the browser context is recycled after
+# --recycle-every tasks, and the whole browser relaunched once its processes
+# use more than --max-browser-mb MiB of PSS (0 disables either)
+DEFAULT_RECYCLE_EVERY = 200
+DEFAULT_MAX_BROWSER_MB = 1500
+
+# A dropped MySQL connection is re-established this many times, this many
+# seconds apart, before the write fails
+DB_RECONNECT_ATTEMPTS = 5
+DB_RECONNECT_DELAY = 2
+
+# HTTP engine (--engine http): seconds before a postback request is abandoned
+HTTP_TIMEOUT = 60
+
+# Minimum trigram similarity for accepting a near-miss college name, and how
+# far ahead of the runner-up the best candidate has to be
+DEFAULT_MATCH_THRESHOLD = 0.85
+FUZZY_MATCH_MARGIN = 0.02
+
+# Rows per multi-row INSERT ... ON DUPLICATE KEY UPDATE statement
+DEFAULT_DB_BATCH_SIZE = 500
+
+# Content hash of the last written grid per (year, institute_id, stream); the
+# MySQL sink skips grids whose hash is unchanged (see schema.sql)
+SNAPSHOTS_TABLE = "student_snapshots"
+
+# Where student rows go (--sink): upserted into MySQL as they are extracted,
+# or streamed to files under STAGING_DIR for load_staged.py to bulk-load
+SINKS = ("mysql", "jsonl", "csv", "parquet")
+DEFAULT_SINK = "mysql"
+# Rows buffered per Parquet row group
+PARQUET_ROW_GROUP_SIZE = 50000
+
+# Copy of the institutes table refreshed on every run that reaches MySQL, so
+# file-sink runs can still resolve colleges without a database
+INSTITUTES_SNAPSHOT_PATH = "institutes_snapshot.json"
+
+# Per-task phase timings/counters (one JSON line per task) and a Prometheus
+# textfile (node_exporter textfile collector format) with the last run's totals
+METRICS_PATH = os.path.join(LOG_DIR, "task_metrics.jsonl")
+PROM_PATH = os.path.join(LOG_DIR, "scraper_metrics.prom")
 
 
 # ================= UI / UTILS =================
 
-class Colors:
-    HEADER = '\033[95m'
-    BLUE = '\033[94m'
-    CYAN = '\033[96m'
-    GREEN = '\033[92m'
-    WARNING = '\033[93m'
-    FAIL = '\033[91m'
-    ENDC = '\033[0m'
-    BOLD = '\033[1m'
-
-def print_status(message, status="INFO"):
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    ts_str = f"{Colors.CYAN}[{timestamp}]{Colors.ENDC}"
-
-    if status == "INFO":
-        label = f"{Colors.BLUE}[INFO]{Colors.ENDC} "
-    elif status == "SUCCESS":
-        label = f"{Colors.GREEN}[DONE]{Colors.ENDC} "
-    elif status == "WARNING":
-        label = f"{Colors.WARNING}[WARN]{Colors.ENDC} "
-    elif status == "ERROR":
-        label = f"{Colors.FAIL}[ERR ]{Colors.ENDC} "
-    elif status == "HEADER":
-        print(f"\n{Colors.HEADER}{Colors.BOLD}{message}{Colors.ENDC}")
-        return
-    else:
-        label = f"{Colors.BLUE}[{status}]{Colors.ENDC}"
-
-    print(f"{ts_str} {label} {message}")
-
 def log(msg, level="INFO"):
     """Compatibility wrapper for execute_task logging."""
     print_status(msg, level if level in ["INFO", "ERROR", "WARNING", "SUCCESS"] else "INFO")
@@ -101,29 +185,491 @@ def find_matching_options(available_options, search_term, field_name="Option"):
     return partial_matches
 
 
-# ================= DISCOVERY =================
+# ================= METRICS =================
+
+# Task phases in execution order, as reported in the end-of-run latency table
+PHASES = ("navigate", "show", "show_all", "resolve", "extract", "db")
+
+# Metrics of the task being executed. A ContextVar so that every HTTP engine
+# thread and every async page worker charges its own task.
+CURRENT_METRICS = contextvars.ContextVar("current_metrics", default=None)
 
-def discover_and_populate_tasks(page, args):
+
+class TaskMetrics:
+    """Phase timers (seconds) and counters (postbacks, rows, bytes, ...) of one task."""
+
+    def __init__(self):
+        self.phases = defaultdict(float)
+        self.counters = defaultdict(int)
+
+    @contextmanager
+    def phase(self, name):
+        t0 = time.time()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.time() - t0
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def as_dict(self):
+        return {
+            "phases": {k: round(v, 4) for k, v in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+
+
+def phase(name):
+    """Times a block against the current task (no-op outside a task)."""
+    metrics = CURRENT_METRICS.get()
+    return metrics.phase(name) if metrics is not None else nullcontext()
+
+def count_metric(name, n=1):
+    metrics = CURRENT_METRICS.get()
+    if metrics is not None:
+        metrics.count(name, n)
+
+def start_task_metrics():
+    """Makes a fresh TaskMetrics current. Returns (metrics, token) for finish_task_metrics()."""
+    metrics = TaskMetrics()
+    return metrics, CURRENT_METRICS.set(metrics)
+
+def finish_task_metrics(summary, metrics, token):
+    CURRENT_METRICS.reset(token)
+    summary["metrics"] = metrics.as_dict()
+
+def note_retry(summary):
+    """Counts one more execution of a task whose summary is being replaced by a retry."""
+    counters = summary.setdefault("metrics", {"phases": {}, "counters": {}})["counters"]
+    counters["retries"] = counters.get("retries", 0) + 1
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list (q in 0..100)."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+def phase_samples(summaries):
+    samples = defaultdict(list)
+    for sm in summaries:
+        for name, seconds in sm.get("metrics", {}).get("phases", {}).items():
+            samples[name].append(seconds)
+    return samples
+
+def metric_totals(summaries):
+    totals = defaultdict(int)
+    for sm in summaries:
+        for name, n in sm.get("metrics", {}).get("counters", {}).items():
+            totals[name] += n
+    return totals
+
+def write_task_metrics(path, tasks, summaries, run_id, engine):
+    """Appends one JSON line per task with its status, phase timings and counters."""
+    with open(path, "a", encoding="utf-8") as f:
+        for task, sm in zip(tasks, summaries):
+            year, district, college, stream = task
+            metrics = sm.get("metrics", {})
+            f.write(json.dumps({
+                "run_id": run_id,
+                "engine": engine,
+                "year": year,
+                "district": district,
+                "college": college,
+                "stream": stream,
+                "status": sm["status"],
+                "duration": sm.get("duration"),
+                "rows": sm["total"],
+                "inserted": sm["inserted"],
+                "updated": sm["updated"],
+                "failed": sm["failed"],
+                "unchanged": sm.get("unchanged", 0),
+                "removed": sm.get("removed", 0),
+                "phases": metrics.get("phases", {}),
+                "counters": metrics.get("counters", {}),
+            }) + "\n")
+
+def write_prometheus_textfile(path, summaries, elapsed):
     """
-    Navigates dropdowns to find new combinations and return a list of tasks.
-    Returns a list of tuples: (year, district, college, stream)
+    Writes the run's totals and phase quantiles in the Prometheus text format,
+    replacing the file atomically so a collector never reads half of it.
     """
-    print_status("Starting discovery of scraping tasks...", "HEADER")
+    counts = defaultdict(int)
+    for sm in summaries:
+        counts[sm["status"]] += 1
+    counters = metric_totals(summaries)
+    samples = phase_samples(summaries)
+
+    lines = [
+        "# HELP sams_scraper_tasks Tasks in the last run, by status.",
+        "# TYPE sams_scraper_tasks gauge",
+    ]
+    for status in ("done", "empty", "no_institute", "error"):
+        lines.append(f'sams_scraper_tasks{{status="{status}"}} {counts[status]}')
+    lines += [
+        "# HELP sams_scraper_rows Student rows in the last run, by what the sink did with them.",
+        "# TYPE sams_scraper_rows gauge",
+    ]
+    for kind in ("inserted", "updated", "unchanged", "removed", "failed"):
+        lines.append(f'sams_scraper_rows{{kind="{kind}"}} {sum(sm.get(kind, 0) for sm in summaries)}')
+    lines += [
+        "# HELP sams_scraper_phase_seconds Per-task time spent in each phase in the last run.",
+        "# TYPE sams_scraper_phase_seconds summary",
+    ]
+    for name in PHASES:
+        values = samples.get(name)
+        if not values:
+            continue
+        for q in (50, 95):
+            lines.append(f'sams_scraper_phase_seconds{{phase="{name}",quantile="{q / 100}"}} {percentile(values, q):.4f}')
+        lines.append(f'sams_scraper_phase_seconds_sum{{phase="{name}"}} {sum(values):.4f}')
+        lines.append(f'sams_scraper_phase_seconds_count{{phase="{name}"}} {len(values)}')
+    lines += [
+        "# HELP sams_scraper_events Counters summed over the tasks of the last run.",
+        "# TYPE sams_scraper_events gauge",
+    ]
+    for name in sorted(counters):
+        lines.append(f'sams_scraper_events{{name="{name}"}} {counters[name]}')
+    lines += [
+        "# HELP sams_scraper_run_duration_seconds Wall time of the last run.",
+        "# TYPE sams_scraper_run_duration_seconds gauge",
+        f"sams_scraper_run_duration_seconds {elapsed:.3f}",
+        "# HELP sams_scraper_last_run_timestamp_seconds When the last run finished.",
+        "# TYPE sams_scraper_last_run_timestamp_seconds gauge",
+        f"sams_scraper_last_run_timestamp_seconds {time.time():.0f}",
+    ]
+
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+
+def print_phase_summary(summaries):
+    samples = phase_samples(summaries)
+    if not samples:
+        return
+    print_status("Phase Latency (per task)", "HEADER")
+    print(f"    {Colors.BOLD}{'phase':<10}{'tasks':>7}{'p50':>9}{'p95':>9}{'total':>10}{Colors.ENDC}")
+    for name in PHASES + tuple(sorted(set(samples) - set(PHASES))):
+        values = samples.get(name)
+        if values:
+            print(
+                f"    {name:<10}{len(values):>7}{percentile(values, 50):>8.2f}s"
+                f"{percentile(values, 95):>8.2f}s{sum(values):>9.1f}s"
+            )
+    counters = metric_totals(summaries)
+    if counters:
+        parts = ", ".join(f"{name} {n}" for name, n in sorted(counters.items()))
+        print(f"    {Colors.BOLD}Counters:{Colors.ENDC} {parts}")
 
-    # --- 1. Year ---
+
+# ================= POSTBACK WAITS =================
+
+# Flags the current copies of the given elements, so a re-rendered copy can be told apart
+MARK_STALE_JS = """
+(selectors) => selectors.forEach((sel) => {
+    const el = document.querySelector(sel);
+    if (el) el.dataset.postbackStale = "1";
+})
+"""
+
+# True once any of the given elements exists and was rendered after MARK_STALE_JS ran
+READY_JS = """
+(selectors) => document.readyState !== "loading" && selectors.some((sel) => {
+    const el = document.querySelector(sel);
+    return el && el.dataset.postbackStale !== "1";
+})
+"""
+
+PORTAL_PATH = urlparse(BASE_URL).path
+
+
+def is_postback_response(response):
+    return response.request.method == "POST" and urlparse(response.url).path == PORTAL_PATH
+
+
+class WaitStats:
+    """Accumulates time actually spent waiting on postbacks, per kind."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.avoided = defaultdict(int)
+        self.fallbacks = 0
+
+    def record(self, kind, seconds):
+        self.seconds[kind] += seconds
+        self.counts[kind] += 1
+
+    def report(self, prefix=""):
+        if self.avoided:
+            parts = ", ".join(f"{kind} {n}" for kind, n in sorted(self.avoided.items()))
+            print_status(
+                f"{prefix}Postbacks avoided by reusing dropdown state: {sum(self.avoided.values())} ({parts})",
+                "INFO",
+            )
+        if not self.counts:
+            return
+        total = sum(self.seconds.values())
+        parts = ", ".join(
+            f"{kind} {self.counts[kind]}x {self.seconds[kind]:.1f}s" for kind in sorted(self.counts)
+        )
+        print_status(
+            f"{prefix}Postback waits: {total:.1f}s over {sum(self.counts.values())} postbacks "
+            f"({parts}; {self.fallbacks} fallbacks)",
+            "INFO",
+        )
+
+
+WAIT_STATS = WaitStats()
+
+# Paces postbacks (browser and HTTP) by the portal's observed latency and
+# failures; configure_rate() applies the CLI limits
+RATE = RateController()
+
+
+def configure_rate(args):
+    """Sets RATE's ceilings: one postback in flight per page, --max-pages/--workers for async/HTTP."""
+    if args.engine == "async":
+        concurrency = args.max_pages
+    elif args.engine == "http":
+        concurrency = args.workers
+    else:
+        concurrency = 1
+    RATE.reset(concurrency, args.max_rate, args.rate_control)
+
+
+def report_rate(prefix=""):
+    report = RATE.summary()
+    if report:
+        print_status(f"{prefix}{report}", "INFO")
+
+
+def response_body_size(response):
+    """Bytes of a postback response body as received over the network (0 if unknown)."""
     try:
-        page.wait_for_selector("#ddlYear", timeout=30000)
-    except:
-        print_status("Failed to load initial page.", "ERROR")
-        return []
+        return max(0, response.request.sizes()["responseBodySize"])
+    except (PlaywrightError, KeyError):
+        return 0
 
-    raw_years = page.locator("#ddlYear option").all_text_contents()
+async def async_response_body_size(response):
+    try:
+        return max(0, (await response.request.sizes())["responseBodySize"])
+    except (PlaywrightError, KeyError):
+        return 0
+
+
+def postback(page, action, ready, kind="postback"):
+    """
+    Runs action() (a select_option/click that triggers an ASP.NET postback) and
+    returns as soon as the POST response has arrived and one of the `ready`
+    selectors has been re-rendered. Falls back to networkidle if either step
+    times out. Time spent is recorded in WAIT_STATS under `kind`; the start
+    is paced by RATE (latency judged per kind), and a timeout counts as a
+    failure there. Returns the
+    POST response, or None after a fallback.
+    """
+    ready = [ready] if isinstance(ready, str) else list(ready)
+    with RATE.slot(kind) as ticket:
+        t0 = time.time()
+        count_metric("postbacks")
+        try:
+            page.evaluate(MARK_STALE_JS, ready)
+            with page.expect_response(is_postback_response, timeout=POSTBACK_RESPONSE_TIMEOUT_MS) as info:
+                action()
+            page.wait_for_function(READY_JS, arg=ready, timeout=POSTBACK_READY_TIMEOUT_MS)
+            count_metric("bytes", response_body_size(info.value))
+            return info.value
+        except TimeoutError:
+            ticket.failed = True
+            WAIT_STATS.fallbacks += 1
+            count_metric("postback_fallbacks")
+            page.wait_for_load_state("networkidle", timeout=POSTBACK_RESPONSE_TIMEOUT_MS)
+        finally:
+            WAIT_STATS.record(kind, time.time() - t0)
+
+
+async def async_postback(page, action, ready, kind="postback"):
+    """Async counterpart of postback(); `action` is a zero-argument coroutine function."""
+    ready = [ready] if isinstance(ready, str) else list(ready)
+    async with RATE.async_slot(kind) as ticket:
+        t0 = time.time()
+        count_metric("postbacks")
+        try:
+            await page.evaluate(MARK_STALE_JS, ready)
+            async with page.expect_response(is_postback_response, timeout=POSTBACK_RESPONSE_TIMEOUT_MS) as info:
+                await action()
+            await page.wait_for_function(READY_JS, arg=ready, timeout=POSTBACK_READY_TIMEOUT_MS)
+            response = await info.value
+            count_metric("bytes", await async_response_body_size(response))
+            return response
+        except AsyncTimeoutError:
+            ticket.failed = True
+            WAIT_STATS.fallbacks += 1
+            count_metric("postback_fallbacks")
+            await page.wait_for_load_state("networkidle", timeout=POSTBACK_RESPONSE_TIMEOUT_MS)
+        finally:
+            WAIT_STATS.record(kind, time.time() - t0)
+
+
+class PageState:
+    """
+    The Year/District/College selections a page is known to hold (None when
+    unknown). navigate() only fires postbacks from the first level that
+    differs from the wanted task, counting skipped levels in WAIT_STATS.avoided.
+    Call reset() whenever the page is reloaded or a postback failed.
+    """
+
+    LEVELS = (
+        ("#ddlYear", "#ddlDistrict", "year"),
+        ("#ddlDistrict", "#ddlCollege", "district"),
+        ("#ddlCollege", "#ddlStream", "college"),
+    )
+
+    def __init__(self):
+        self.selected = [None] * len(self.LEVELS)
+
+    def reset(self):
+        self.selected = [None] * len(self.LEVELS)
 
+    def _plan(self, task):
+        """Index of the first level that needs a postback; earlier levels are counted as avoided."""
+        for i, (_, _, kind) in enumerate(self.LEVELS):
+            if self.selected[i] is None or self.selected[i] != task[i]:
+                return i
+            WAIT_STATS.avoided[kind] += 1
+            count_metric("postbacks_avoided")
+        return len(self.LEVELS)
+
+    def navigate(self, page, task):
+        for i in range(self._plan(task), len(self.LEVELS)):
+            selector, ready, kind = self.LEVELS[i]
+            self.selected[i:] = [None] * (len(self.LEVELS) - i)
+            postback(page, lambda: page.select_option(selector, label=task[i]), ready, kind)
+            self.selected[i] = task[i]
+
+    async def async_navigate(self, page, task):
+        for i in range(self._plan(task), len(self.LEVELS)):
+            selector, ready, kind = self.LEVELS[i]
+            self.selected[i:] = [None] * (len(self.LEVELS) - i)
+            await async_postback(page, lambda: page.select_option(selector, label=task[i]), ready, kind)
+            self.selected[i] = task[i]
+
+
+# ================= DISCOVERY =================
+
+# (textContent, value) of every <option> in a dropdown, in one call
+OPTIONS_JS = """
+(selector) => Array.from(document.querySelectorAll(selector + " option")).map(
+    (o) => [o.textContent, o.value]
+)
+"""
+
+def read_options(page, selector):
+    """Returns [(label, value), ...] for a dropdown, labels stripped."""
+    return [(label.strip(), value) for label, value in page.evaluate(OPTIONS_JS, selector)]
+
+
+class DiscoveryCache:
+    """
+    JSON cache of the Year -> District -> College -> Stream option tree.
+
+    Per year it keeps the district options; per (year, district) the college
+    options and the stream options of every college walked so far, each as
+    [label, value] pairs. Entries older than ttl seconds are ignored, and
+    refresh=True ignores every entry (fresh results are still saved).
+    A path of None disables the cache.
+    """
+
+    def __init__(self, path, ttl=DISCOVERY_CACHE_TTL_HOURS * 3600, refresh=False):
+        self.path = path
+        self.ttl = ttl
+        self.refresh = refresh
+        self.data = {"years": {}}
+        self.dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError) as e:
+                print_status(f"Ignoring unreadable discovery cache {path}: {e}", "WARNING")
+
+    def _fresh(self, entry):
+        if not entry or self.refresh or not self.path:
+            return None
+        if time.time() - entry.get("fetched_at", 0) > self.ttl:
+            return None
+        return entry
+
+    def year(self, year):
+        return self._fresh(self.data["years"].get(year))
+
+    def district(self, year, district):
+        year_entry = self.data["years"].get(year) or {}
+        return self._fresh(year_entry.get("district_tree", {}).get(district))
+
+    def set_year(self, year, district_options):
+        year_entry = self.data["years"].setdefault(year, {})
+        year_entry["districts"] = [list(o) for o in district_options]
+        year_entry["fetched_at"] = time.time()
+        self.dirty = True
+
+    def set_district(self, year, district, college_options, college_streams):
+        year_entry = self.data["years"].setdefault(year, {})
+        tree = year_entry.setdefault("district_tree", {})
+        entry = tree.get(district)
+        if not self._fresh(entry):
+            entry = {"streams": {}}
+        entry["colleges"] = [list(o) for o in college_options]
+        entry["streams"].update({c: [list(o) for o in opts] for c, opts in college_streams.items()})
+        entry["fetched_at"] = time.time()
+        tree[district] = entry
+        self.dirty = True
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+def cached_district_tasks(cache, year, district, args):
+    """
+    Tasks for one (year, district) from a fresh cache entry, or None when the
+    entry is missing, stale or lacks the streams of a matching college.
+    """
+    entry = cache.district(year, district)
+    if not entry:
+        return None
+
+    colleges_to_scan = find_matching_options(
+        [label for label, _ in entry["colleges"]], args.college, "College"
+    )
+    if any(c not in entry["streams"] for c in colleges_to_scan):
+        return None
+
+    print_status(f"    Found {len(colleges_to_scan)} matching colleges (cached).", "INFO")
+    tasks = []
+    for college in colleges_to_scan:
+        raw_streams = [label for label, _ in entry["streams"][college]]
+        for stream in find_matching_options(raw_streams, args.stream, "Stream"):
+            tasks.append((year, district, college, stream))
+    return tasks
+
+
+def select_years(raw_years, year_arg):
+    """
+    Resolves the year argument (single, comma-separated list or START..END
+    range) against the Year dropdown options.
+    """
     # Support comma-separated years and ranges
     years_to_scan = []
     missing_years = []
-    if args.year:
-        tokens = [t.strip() for t in str(args.year).split(",") if t.strip()]
+    if year_arg:
+        tokens = [t.strip() for t in str(year_arg).split(",") if t.strip()]
         for token in tokens:
             if ".." in token:
                 parts = token.split("..")
@@ -156,52 +702,155 @@ def discover_and_populate_tasks(page, args):
 
         years_to_scan = list(dict.fromkeys(years_to_scan))
     else:
-        years_to_scan = find_matching_options(raw_years, args.year, "Year")
+        years_to_scan = find_matching_options(raw_years, year_arg, "Year")
+
+    return years_to_scan
+
+
+FILTER_FIELDS = ("year", "district", "college", "stream")
+
+
+def parse_filter(text):
+    """
+    Parses one batch filter, written like the positional arguments with
+    shell quoting: YEAR [DISTRICT [COLLEGE [STREAM]]]. Empty fields match
+    every option. Raises ValueError for a malformed filter.
+    """
+    values = shlex.split(text)
+    if not values or len(values) > len(FILTER_FIELDS):
+        raise ValueError(f"expected YEAR [DISTRICT [COLLEGE [STREAM]]], got {text!r}")
+    values += [None] * (len(FILTER_FIELDS) - len(values))
+    return {field: value or None for field, value in zip(FILTER_FIELDS, values)}
+
+
+def batch_filters(args):
+    """
+    Filters a run covers: the positional arguments, every --filter and every
+    line of the --job file (blank lines and # comments skipped), in that
+    order and without repeats.
+    """
+    filters = []
+    if any(getattr(args, f) for f in FILTER_FIELDS) or not (args.filter or args.job):
+        filters.append({f: getattr(args, f) for f in FILTER_FIELDS})
+    filters += [parse_filter(text) for text in args.filter]
+    if args.job:
+        with open(args.job, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    filters.append(parse_filter(line))
+                except ValueError as e:
+                    raise ValueError(f"{args.job}:{line_no}: {e}")
+    unique = {tuple(f[k] for k in FILTER_FIELDS): f for f in filters}
+    return list(unique.values())
+
+
+def describe_filter(f):
+    return " | ".join(f[k] or f"all {k}s" for k in FILTER_FIELDS)
+
+
+def discover_batch(discover, args):
+    """
+    Runs discover(filter_args) once per batch filter, all on the caller's
+    page or HTTP session and DiscoveryCache, and merges the tasks in order
+    without duplicates (filters may overlap).
+    """
+    tasks = []
+    for f in args.filters:
+        if len(args.filters) > 1:
+            print_status(f"Filter: {describe_filter(f)}", "HEADER")
+        tasks += discover(argparse.Namespace(**{**vars(args), **f}))
+    return list(dict.fromkeys(tasks))
+
+
+def discover_and_populate_tasks(page, args, cache=None):
+    """
+    Navigates dropdowns to find new combinations and return a list of tasks.
+    Option lists found in a fresh DiscoveryCache entry are used instead of
+    walking the page; whatever is walked is written back to the cache.
+    Returns a list of tuples: (year, district, college, stream)
+    """
+    print_status("Starting discovery of scraping tasks...", "HEADER")
+
+    # --- 1. Year ---
+    try:
+        page.wait_for_selector("#ddlYear", timeout=30000)
+    except:
+        print_status("Failed to load initial page.", "ERROR")
+        return []
+
+    raw_years = page.locator("#ddlYear option").all_text_contents()
+
+    years_to_scan = select_years(raw_years, args.year)
 
     if not years_to_scan:
         return []
 
+    cache = cache or DiscoveryCache(None)
     tasks = []
     for year in years_to_scan:
         print_status(f"Scanning Year: {year}", "HEADER")
-        try:
-            page.select_option("#ddlYear", label=year)
-            time.sleep(1)
-        except Exception as e:
-            print_status(f"Failed to select year {year}: {e}", "WARNING")
-            continue
 
         # --- 2. District ---
-        page.wait_for_load_state("networkidle")
-        raw_districts = page.locator("#ddlDistrict option").all_text_contents()
+        year_entry = cache.year(year)
+        year_selected = False
+        if year_entry:
+            raw_districts = [label for label, _ in year_entry["districts"]]
+        else:
+            try:
+                postback(page, lambda: page.select_option("#ddlYear", label=year), "#ddlDistrict", "year")
+            except Exception as e:
+                print_status(f"Failed to select year {year}: {e}", "WARNING")
+                continue
+            year_selected = True
+
+            options = read_options(page, "#ddlDistrict")
+            cache.set_year(year, options)
+            raw_districts = [label for label, _ in options]
+
         districts_to_scan = find_matching_options(raw_districts, args.district, "District")
 
         for district in districts_to_scan:
             print_status(f"  > District: {district}", "INFO")
+
+            cached_tasks = cached_district_tasks(cache, year, district, args)
+            if cached_tasks is not None:
+                tasks.extend(cached_tasks)
+                continue
+
+            if not year_selected:
+                try:
+                    postback(page, lambda: page.select_option("#ddlYear", label=year), "#ddlDistrict", "year")
+                except Exception as e:
+                    print_status(f"Failed to select year {year}: {e}", "WARNING")
+                    break
+                year_selected = True
+
             try:
-                page.select_option("#ddlDistrict", label=district)
-                time.sleep(2)
-                page.wait_for_load_state("networkidle", timeout=30000)
+                postback(page, lambda: page.select_option("#ddlDistrict", label=district), "#ddlCollege", "district")
             except Exception as e:
                 print_status(f"    Failed to select district {district}: {e}", "WARNING")
                 continue
 
             # --- 3. College ---
-            raw_colleges = []
+            college_options = []
             for attempt in range(3):
                 try:
                     page.wait_for_selector("#ddlCollege", state="attached", timeout=10000)
-                    raw_colleges = page.locator("#ddlCollege option").all_text_contents()
+                    college_options = read_options(page, "#ddlCollege")
                     break
                 except PlaywrightError as e:
                     if "Execution context was destroyed" in str(e) or "Navigating" in str(e):
                         print_status("    Page reloading detected, retrying college extraction...", "WARNING")
-                        time.sleep(2)
+                        time.sleep(backoff_delay(attempt + 1))
                         continue
                     else:
                         print_status(f"    Error reading colleges: {e}", "ERROR")
                         break
 
+            raw_colleges = [label for label, _ in college_options]
             colleges_to_scan = find_matching_options(raw_colleges, args.college, "College")
 
             if args.college and not colleges_to_scan:
@@ -209,133 +858,290 @@ def discover_and_populate_tasks(page, args):
 
             print_status(f"    Found {len(colleges_to_scan)} matching colleges.", "INFO")
 
+            college_streams = {}
             for college in colleges_to_scan:
                 try:
-                    page.select_option("#ddlCollege", label=college)
-                    time.sleep(2)
-                    page.wait_for_load_state("networkidle", timeout=30000)
+                    postback(page, lambda: page.select_option("#ddlCollege", label=college), "#ddlStream", "college")
                 except Exception as e:
                     print_status(f"    Failed to select college {college}: {e}", "WARNING")
                     continue
 
                 # --- 4. Stream ---
-                raw_streams = []
+                stream_options = None
                 for attempt in range(3):
                     try:
                         page.wait_for_selector("#ddlStream", state="attached", timeout=10000)
-                        raw_streams = page.locator("#ddlStream option").all_text_contents()
+                        stream_options = read_options(page, "#ddlStream")
                         break
                     except PlaywrightError as e:
                         if "Execution context" in str(e):
-                            time.sleep(2)
+                            time.sleep(backoff_delay(attempt + 1))
                             continue
                         break
 
+                if stream_options is None:
+                    continue
+                college_streams[college] = stream_options
+
+                raw_streams = [label for label, _ in stream_options]
                 streams_to_scan = find_matching_options(raw_streams, args.stream, "Stream")
 
                 if streams_to_scan:
                     for stream in streams_to_scan:
                         tasks.append((year, district, college, stream))
 
+            if college_options:
+                cache.set_district(year, district, college_options, college_streams)
+
+    cache.save()
     print_status("    Discovery phase complete.", "SUCCESS")
     return tasks
 
 
 # ================= DB LOOKUP =================
 
-def resolve_institute(cursor, college_name):
-    # Exact match
-    cursor.execute(
-        "SELECT institute_id, sams_code, college_name FROM institutes WHERE college_name=%s",
-        (college_name,),
-    )
-    row = cursor.fetchone()
-    if row:
-        return row[0], row[1]
-
-    # Normalized fallback
-    cursor.execute("SELECT institute_id, sams_code, college_name FROM institutes")
-    site_norm = normalize_name(college_name)
-
-    for iid, sams, db_name in cursor.fetchall():
-        if normalize_name(db_name) == site_norm:
-            write_json_line(
-                COLLEGE_MISMATCH_LOG,
-                {
-                    "type": "NORMALIZED_MATCH",
-                    "site_college_name": college_name,
-                    "db_college_name": db_name,
-                    "sams_code": sams,
-                    "timestamp": datetime.utcnow().isoformat(),
-                },
-            )
-            return iid, sams
+class InstituteIndex:
+    """
+    In-memory copy of the institutes table, loaded once per run.
+    Lookups go exact name -> normalize_name() key -> trigram similarity.
+    """
 
-    write_json_line(
-        COLLEGE_MISMATCH_LOG,
-        {
-            "type": "NO_MATCH",
-            "site_college_name": college_name,
-            "timestamp": datetime.utcnow().isoformat(),
-        },
-    )
+    def __init__(self, rows, threshold=DEFAULT_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.entries = []          # (institute_id, sams_code, college_name, normalized)
+        self.exact = {}
+        self.normalized = {}
+        self.trigrams = defaultdict(set)
+        self.gram_counts = []
+
+        for iid, sams, db_name in rows:
+            if not db_name:
+                continue
+            norm = normalize_name(db_name)
+            idx = len(self.entries)
+            self.entries.append((iid, sams, db_name, norm))
+            self.exact.setdefault(db_name.strip().casefold(), idx)
+            self.normalized.setdefault(norm, idx)
+            grams = name_trigrams(norm)
+            self.gram_counts.append(len(grams))
+            for g in grams:
+                self.trigrams[g].add(idx)
+
+    @classmethod
+    def load(cls, cursor, threshold=DEFAULT_MATCH_THRESHOLD):
+        cursor.execute("SELECT institute_id, sams_code, college_name FROM institutes")
+        return cls(cursor.fetchall(), threshold)
+
+    @classmethod
+    def load_snapshot(cls, path, threshold=DEFAULT_MATCH_THRESHOLD):
+        with open(path, encoding="utf-8") as f:
+            return cls([tuple(r) for r in json.load(f)], threshold)
+
+    def save_snapshot(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([[iid, sams, name] for iid, sams, name, _ in self.entries], f)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, college_name):
+        """
+        Returns (entry, match_type, score) where match_type is EXACT,
+        NORMALIZED_MATCH, FUZZY_MATCH, AMBIGUOUS or NO_MATCH and entry is None
+        unless matched.
+        """
+        idx = self.exact.get(college_name.strip().casefold())
+        if idx is not None:
+            return self.entries[idx], "EXACT", 1.0
+
+        site_norm = normalize_name(college_name)
+        idx = self.normalized.get(site_norm)
+        if idx is not None:
+            return self.entries[idx], "NORMALIZED_MATCH", 1.0
+
+        site_grams = name_trigrams(site_norm)
+        if not site_grams:
+            return None, "NO_MATCH", 0.0
+
+        shared = defaultdict(int)
+        for g in site_grams:
+            for cand in self.trigrams.get(g, ()):
+                shared[cand] += 1
+
+        scored = []
+        for cand, common in shared.items():
+            total = len(site_grams) + self.gram_counts[cand]
+            scored.append((2.0 * common / total, cand))
+        if not scored:
+            return None, "NO_MATCH", 0.0
+
+        scored.sort(reverse=True)
+        best_score, best = scored[0]
+        if best_score < self.threshold:
+            return None, "NO_MATCH", best_score
+
+        # Two different institutes scoring (almost) the same is not a match
+        if len(scored) > 1:
+            runner_score, runner = scored[1]
+            if best_score - runner_score < FUZZY_MATCH_MARGIN and \
+                    self.entries[runner][0] != self.entries[best][0]:
+                return None, "AMBIGUOUS", best_score
+
+        return self.entries[best], "FUZZY_MATCH", best_score
+
+
+def name_trigrams(norm):
+    """Character trigrams of a normalized name, padded so short words still count."""
+    padded = f"  {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def resolve_institute(institutes, college_name):
+    entry, match_type, score = institutes.lookup(college_name)
+
+    if entry and match_type == "EXACT":
+        return entry[0], entry[1]
+
+    record = {
+        "type": match_type,
+        "site_college_name": college_name,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+    if entry:
+        record["db_college_name"] = entry[2]
+        record["sams_code"] = entry[1]
+    if match_type != "NORMALIZED_MATCH":
+        record["score"] = round(score, 3)
+    write_json_line(COLLEGE_MISMATCH_LOG, record)
+
+    if entry:
+        return entry[0], entry[1]
     return None, None
 
 
-# ================= EXECUTION =================
+# ================= EXTRACTION =================
 
-def print_task_summary(total, inserted, failed):
-    if total == 0:
-        print_status("No records found (Empty Table).", "WARNING")
-    else:
-        msg = f"Extracted: {total:<4} | Saved: {inserted:<4} | Failed: {failed:<4}"
-        if failed > 0:
-            print_status(msg, "WARNING")
-        else:
-            print_status(msg, "SUCCESS")
+# Mirrors the legacy `locator("tr").all()[1:]` / `locator("td").all_inner_texts()`
+# walk, but runs entirely inside the page so the grid comes back in one call.
+GRID_ROWS_JS = """
+(selector) => {
+    const table = document.querySelector(selector);
+    if (!table) return [];
+    return Array.from(table.querySelectorAll("tr")).slice(1).map(
+        (tr) => Array.from(tr.querySelectorAll("td")).map((td) => td.innerText)
+    );
+}
+"""
 
-def execute_task(page, cursor, conn, task):
-    year, district, college, stream = task
 
-    # 1. Year
-    page.select_option("#ddlYear", label=year)
+def extract_grid_rows(page, mode=DEFAULT_EXTRACT_MODE, selector="#grdRptStd"):
+    """
+    Returns the data rows (header excluded) of a grid as lists of cell texts.
+    """
+    if mode == "evaluate":
+        return page.evaluate(GRID_ROWS_JS, selector)
 
-    # 2. District
-    page.select_option("#ddlDistrict", label=district)
-    time.sleep(1)
-    page.wait_for_load_state("networkidle")
+    if mode == "html":
+        html = page.locator(selector).first.evaluate("el => el.outerHTML")
+        return parse_grid_html(html, selector.lstrip("#"))
 
-    # 3. College
-    page.select_option("#ddlCollege", label=college)
-    time.sleep(1)
-    page.wait_for_load_state("networkidle")
+    rows = page.locator(f"{selector} tr").all()[1:]
+    return [r.locator("td").all_inner_texts() for r in rows]
 
-    # 4. Stream & Show
-    page.select_option("#ddlStream", label=stream)
-    page.click("#btnShow")
 
-    try:
-        page.wait_for_selector("#grdRptStd", timeout=20000)
-    except TimeoutError:
-        log(f"Table not found (Timeout waiting for #grdRptStd)", "INFO")
-        print_task_summary(0, 0, 0)
-        return
+# Response headers that no longer hold once GridCapture rewrites the body
+REWRITTEN_BODY_HEADERS = ("content-length", "content-encoding")
 
-    if page.locator("#lbtnAll").count():
-        log("Expanding all records...", "INFO")
-        with page.expect_navigation(wait_until="networkidle"):
-            page.click("#lbtnAll")
 
-    institute_id, sams_code = resolve_institute(cursor, college)
-    if not institute_id:
-        log(f"Institute not found in DB for {college}", "ERROR")
-        return
+def posted_event_target(request):
+    """__EVENTTARGET of a DevTools Fetch request's form POST ('' if none)."""
+    data = request.get("postData")
+    if data is None:
+        entries = request.get("postDataEntries") or []
+        data = "".join(base64.b64decode(e.get("bytes", "")).decode("latin-1") for e in entries)
+    return parse_qs(data).get("__EVENTTARGET", [""])[0]
 
-    rows = page.locator("#grdRptStd tr").all()[1:]
+
+class GridCapture:
+    """
+    Response capture for --extract-mode response. The "Show All" postback's
+    HTML is kept in self.html for execute_task() to parse, and Chromium gets
+    the page with the #grdRptStd table emptied, so the full grid is never
+    laid out in the DOM.
+
+    Like ResourceBlocker this pauses responses through a DevTools Fetch
+    session rather than page.route(), which would turn the HTTP cache off:
+    only portal documents are paused, and all but the lbtnAll POST are
+    continued as they are. Installed per page.
+    """
+
+    def __init__(self, table_id="grdRptStd"):
+        self.table_id = table_id
+        self.html = None
+
+    def install(self, page):
+        cdp = page.context.new_cdp_session(page)
+
+        def paused(event):
+            try:
+                cdp.send(*self._verdict(cdp, event))
+            except PlaywrightError:
+                pass  # page closed while the response was paused
+
+        cdp.on("Fetch.requestPaused", paused)
+        cdp.send("Fetch.enable", {"patterns": [
+            {"urlPattern": f"*{PORTAL_PATH}*", "resourceType": "Document", "requestStage": "Response"},
+        ]})
+
+    def _verdict(self, cdp, event):
+        """The Fetch command answering a paused portal response."""
+        request = event["request"]
+        resume = "Fetch.continueRequest", {"requestId": event["requestId"]}
+        if (
+            request["method"] != "POST"
+            or "responseErrorReason" in event
+            or not posted_event_target(request).endswith("lbtnAll")
+        ):
+            return resume
+
+        headers = event.get("responseHeaders") or []
+        charset = "utf-8"
+        for h in headers:
+            if h["name"].lower() == "content-type" and "charset=" in h["value"].lower():
+                charset = h["value"].lower().split("charset=", 1)[1].split(";")[0].strip(" \"'")
+        body = cdp.send("Fetch.getResponseBody", {"requestId": event["requestId"]})
+        if body["base64Encoded"]:
+            html = base64.b64decode(body["body"]).decode(charset, errors="replace")
+        else:
+            html = body["body"]
+
+        trimmed, found = cut_grid_html(html, self.table_id)
+        if not found:
+            return resume
+        self.html = html
+        return "Fetch.fulfillRequest", {
+            "requestId": event["requestId"],
+            "responseCode": event["responseStatusCode"],
+            "responseHeaders": [h for h in headers if h["name"].lower() not in REWRITTEN_BODY_HEADERS],
+            "body": base64.b64encode(trimmed.encode(charset, errors="replace")).decode("ascii"),
+        }
+
+
+def dedup_student_rows(batch):
+    """Keeps the last row per (year, institute_id, reg_no, exam_roll_no)."""
+    dedup = {}
+    for r in batch:
+        key = f"{r[7]}||{r[10]}||{r[0]}||{r[1]}"
+        dedup[key] = r
+    return list(dedup.values())
+
+
+def build_student_rows(cell_rows, task, institute_id, sams_code):
+    """Maps raw grid cells to the 12-field tuples written to the students table."""
+    year, district, college, stream = task
     batch = []
 
-    for r in rows:
-        c = r.locator("td").all_inner_texts()
+    for c in cell_rows:
         if len(c) < 7:
             continue
         batch.append(
@@ -355,20 +1161,17 @@ def execute_task(page, cursor, conn, task):
             )
         )
 
-    if not batch:
-        print_task_summary(0, 0, 0)
-        return
+    return batch
 
-    dedup = {}
-    for r in batch:
-        key = f"{r[7]}||{r[10]}||{r[0]}||{r[1]}"
-        dedup[key] = r
 
-    stmt = """
-        INSERT INTO students_test
-        (reg_no, exam_roll_no, student_name, father_name, mother_name,
-         gender, stream, year, district, college, institute_id, sams_code, updated_at)
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())
+# ================= DB WRITES =================
+
+STUDENT_COLUMNS = ", ".join(STUDENT_FIELDS) + ", updated_at"
+STUDENT_ROW_PLACEHOLDER = "(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW())"
+# Same, for rows carrying their row_hash as a 13th value
+HASHED_STUDENT_COLUMNS = STUDENT_COLUMNS + ", row_hash"
+HASHED_ROW_PLACEHOLDER = "(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,NOW(),%s)"
+STUDENT_UPSERT_UPDATE = """
         ON DUPLICATE KEY UPDATE
         student_name=VALUES(student_name),
         father_name=VALUES(father_name),
@@ -378,111 +1181,2241 @@ def execute_task(page, cursor, conn, task):
         district=VALUES(district),
         college=VALUES(college),
         updated_at=NOW()
+"""
+
+
+def student_upsert_sql(n_rows, with_hash=False):
+    """Builds a multi-row INSERT ... ON DUPLICATE KEY UPDATE for n_rows rows."""
+    if with_hash:
+        values = ",".join([HASHED_ROW_PLACEHOLDER] * n_rows)
+        return (
+            f"INSERT INTO {STUDENTS_TABLE} ({HASHED_STUDENT_COLUMNS}) VALUES {values} "
+            f"{STUDENT_UPSERT_UPDATE.rstrip()},\n        row_hash=VALUES(row_hash)"
+        )
+    values = ",".join([STUDENT_ROW_PLACEHOLDER] * n_rows)
+    return f"INSERT INTO {STUDENTS_TABLE} ({STUDENT_COLUMNS}) VALUES {values} {STUDENT_UPSERT_UPDATE}"
+
+
+def split_upsert_rowcount(rowcount, n_rows):
     """
+    MySQL reports 1 per inserted row and 2 per updated row for an upsert.
+    Returns (inserted, updated) for a statement that wrote n_rows rows.
+    """
+    updated = min(max(rowcount - n_rows, 0), n_rows)
+    inserted = max(min(rowcount - 2 * updated, n_rows - updated), 0)
+    return inserted, updated
+
 
-    inserted = 0
-    failed = 0
+def upsert_student_rows(cursor, conn, rows, batch_size=DEFAULT_DB_BATCH_SIZE, context=None, with_hash=False):
+    """
+    Writes rows in multi-row upserts of batch_size rows, committing once at the end.
+    A batch that fails is retried row by row so only the bad rows are logged
+    to FAILED_ROWS_LOG. with_hash: rows end with their row_hash. Returns
+    (inserted, updated, failed).
+    """
+    context = context or {}
+    batch_size = max(1, int(batch_size))
+    inserted = updated = failed = 0
     failed_rows = []
 
-    rows = list(dedup.values())
-    for r in rows:
+    for i in range(0, len(rows), batch_size):
+        chunk = rows[i:i + batch_size]
+        params = [v for r in chunk for v in r]
         try:
-            cursor.execute(stmt, r)
-            rc = cursor.rowcount
-            if rc == 1:
-                inserted += 1
+            cursor.execute(student_upsert_sql(len(chunk), with_hash), params)
+            ins, upd = split_upsert_rowcount(cursor.rowcount, len(chunk))
+            inserted += ins
+            updated += upd
+            continue
         except Exception as e:
-            failed += 1
-            failed_rows.append(
-                {
-                    "error": str(e),
-                    "row": r,
-                    "college": college,
-                    "stream": stream,
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "trace": traceback.format_exc(),
-                }
-            )
+            if len(chunk) > 1:
+                log(f"Batch of {len(chunk)} rows failed ({e}); retrying row by row", "WARNING")
+
+        single_stmt = student_upsert_sql(1, with_hash)
+        for r in chunk:
+            try:
+                cursor.execute(single_stmt, r)
+                ins, upd = split_upsert_rowcount(cursor.rowcount, 1)
+                inserted += ins
+                updated += upd
+            except Exception as e:
+                failed += 1
+                failed_rows.append(
+                    {
+                        "error": str(e),
+                        "row": r,
+                        **context,
+                        "timestamp": datetime.utcnow().isoformat(),
+                        "trace": traceback.format_exc(),
+                    }
+                )
 
     try:
         conn.commit()
     except Exception as e:
         log(f"DB Commit failed: {e}", "ERROR")
 
-    if failed_rows:
-        for fr in failed_rows:
-            write_json_line(FAILED_ROWS_LOG, fr)
+    for fr in failed_rows:
+        write_json_line(FAILED_ROWS_LOG, fr)
 
-    print_task_summary(len(rows), inserted, failed)
+    return inserted, updated, failed
 
 
-# ================= MAIN =================
+def write_counts(inserted=0, updated=0, failed=0, unchanged=0, removed=0):
+    """What a sink did with one task's rows; merged into the task summary."""
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "failed": failed,
+        "unchanged": unchanged,
+        "removed": removed,
+    }
 
-def main():
-    start_time = time.time()  # Start the global timer
 
-    parser = argparse.ArgumentParser(description="Odisha HSS Scraper")
-    parser.add_argument("year", nargs="?", default=None)
-    parser.add_argument("district", nargs="?", default=None)
-    parser.add_argument("college", nargs="?", default=None)
-    parser.add_argument("stream", nargs="?", default=None)
-    parser.add_argument("--show-browser", action="store_true", help="Launch browser visible")
-    args = parser.parse_args()
+def student_row_hash(row):
+    return hashlib.sha1("\x1f".join(str(v) for v in row).encode("utf-8")).hexdigest()
 
-    ensure_log_dir()
 
-    print_status("Initializing Scraper...", "HEADER")
+def snapshot_hash(row_hashes):
+    """Order-independent hash of a whole grid."""
+    return hashlib.sha1("\n".join(sorted(row_hashes)).encode("ascii")).hexdigest()
 
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-    except mysql.connector.Error as e:
-        print_status(f"DB Connect Error: {e}", "ERROR")
-        sys.exit(1)
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=not args.show_browser)
-        page = browser.new_page()
+def write_student_snapshot(cursor, conn, rows, batch_size=DEFAULT_DB_BATCH_SIZE, context=None):
+    """
+    Change-detecting write of one (year, institute_id, stream) grid. Nothing
+    is written when the grid's snapshot hash matches SNAPSHOTS_TABLE;
+    otherwise only rows that are new or whose row_hash differs are upserted,
+    and the snapshot hash is stored once they all made it. Rows no longer on
+    the portal are counted as removed but kept. Returns write_counts().
+    """
+    year, institute_id, stream = rows[0][7], rows[0][10], rows[0][6]
+    hashes = [student_row_hash(r) for r in rows]
+    digest = snapshot_hash(hashes)
+
+    cursor.execute(
+        f"SELECT snapshot_hash FROM {SNAPSHOTS_TABLE} WHERE year=%s AND institute_id=%s AND stream=%s",
+        (year, institute_id, stream),
+    )
+    stored = cursor.fetchone()
+    if stored and stored[0] == digest:
+        conn.commit()  # end the read transaction so later reads see fresh data
+        return write_counts(unchanged=len(rows))
+
+    cursor.execute(
+        f"SELECT reg_no, exam_roll_no, row_hash FROM {STUDENTS_TABLE} "
+        "WHERE institute_id=%s AND year=%s AND stream=%s",
+        (institute_id, year, stream),
+    )
+    existing = {(reg, roll): h for reg, roll, h in cursor.fetchall()}
+
+    pending = []
+    for row, h in zip(rows, hashes):
+        if existing.pop((row[0], row[1]), None) != h:
+            pending.append(row + (h,))
+    unchanged = len(rows) - len(pending)
+    removed = len(existing)
 
+    inserted = updated = failed = 0
+    if pending:
+        inserted, updated, failed = upsert_student_rows(cursor, conn, pending, batch_size, context, with_hash=True)
+
+    if not failed:
         try:
-            print_status(f"Navigating to website...", "INFO")
-            page.goto(BASE_URL, timeout=90000)
-            page.wait_for_selector("#ddlYear", timeout=60000)
-        except Exception as e:
-            print_status(f"Failed to load website: {e}", "ERROR")
-            browser.close()
-            return
+            cursor.execute(
+                f"INSERT INTO {SNAPSHOTS_TABLE} (year, institute_id, stream, snapshot_hash, row_count, updated_at) "
+                "VALUES (%s, %s, %s, %s, %s, NOW()) "
+                "ON DUPLICATE KEY UPDATE snapshot_hash=VALUES(snapshot_hash), "
+                "row_count=VALUES(row_count), updated_at=NOW()",
+                (year, institute_id, stream, digest, len(rows)),
+            )
+            conn.commit()
+        except mysql.connector.Error as e:
+            log(f"Could not store snapshot hash: {e}", "WARNING")
+    else:
+        conn.commit()
 
-        tasks = discover_and_populate_tasks(page, args)
+    return write_counts(inserted, updated, failed, unchanged, removed)
 
-        if not tasks:
-            print_status("No tasks found matching criteria.", "WARNING")
-            return
 
-        print_status(f"Queue contains {len(tasks)} tasks.", "HEADER")
+# ================= SINKS =================
 
-        for i, task in enumerate(tasks, 1):
-            year, district, college, stream = task
-            print_status(f"Processing Task {i} of {len(tasks)}", "HEADER")
-            print(f"    {Colors.BOLD}Target  :{Colors.ENDC} {college}")
-            print(f"    {Colors.BOLD}Stream  :{Colors.ENDC} {stream}")
-            print(f"    {Colors.BOLD}Context :{Colors.ENDC} {district} | {year}\n")
+class MySQLSink:
+    """
+    Upserts rows into STUDENTS_TABLE as they are extracted (the default sink),
+    skipping unchanged grids and rows when change detection is on and the
+    schema has row_hash and SNAPSHOTS_TABLE.
+    """
 
-            try:
-                execute_task(page, cursor, conn, task)
-            except Exception as e:
-                print_status(f"Task Crashed: {e}", "ERROR")
-                try:
-                    page.goto(BASE_URL, timeout=30000)
-                    page.wait_for_selector("#ddlYear", timeout=30000)
-                except:
-                    pass
+    def __init__(self, batch_size=DEFAULT_DB_BATCH_SIZE, change_detection=True):
+        self.conn = mysql.connector.connect(**DB_CONFIG)
+        self.cursor = self.conn.cursor()
+        self.batch_size = batch_size
+        self.change_detection = change_detection and self._has_change_tracking()
+
+    def _has_change_tracking(self):
+        self.cursor.execute(f"SHOW COLUMNS FROM {STUDENTS_TABLE} LIKE 'row_hash'")
+        has_column = bool(self.cursor.fetchall())
+        self.cursor.execute(f"SHOW TABLES LIKE '{SNAPSHOTS_TABLE}'")
+        has_table = bool(self.cursor.fetchall())
+        if not (has_column and has_table):
+            print_status(
+                f"Change detection off: {STUDENTS_TABLE}.row_hash or {SNAPSHOTS_TABLE} missing (see schema.sql).",
+                "WARNING",
+            )
+        return has_column and has_table
 
+    def ensure_connected(self):
+        """Reconnects (with a fresh cursor) if the server dropped the connection."""
+        if self.conn.is_connected():
+            return
+        log("DB connection lost; reconnecting...", "WARNING")
+        self.conn.reconnect(attempts=DB_RECONNECT_ATTEMPTS, delay=DB_RECONNECT_DELAY)
+        self.cursor = self.conn.cursor()
+
+    def write(self, rows, context=None):
+        self.ensure_connected()
+        if self.change_detection:
+            return write_student_snapshot(self.cursor, self.conn, rows, self.batch_size, context)
+        return write_counts(*upsert_student_rows(self.cursor, self.conn, rows, self.batch_size, context))
+
+    def close(self):
+        try:
+            self.cursor.close()
+            self.conn.close()
+        except:
+            pass
+
+
+class FileSink:
+    """
+    Streams rows to STAGING_DIR/students-<run>-<label>-<pid>.<ext> as they
+    are extracted, without touching MySQL; load_staged.py bulk-loads the
+    files later. The file is created on the first write. write() reports
+    every row as inserted (there is no change detection).
+    """
+
+    ext = None
+
+    def __init__(self, directory, run_id, label):
+        self.path = os.path.join(directory, f"students-{run_id}-{label}-{os.getpid()}.{self.ext}")
+        self.rows = 0
+        self._file = None
+
+    def write(self, rows, context=None):
+        if rows:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._open()
+            self._write(rows)
+            self.rows += len(rows)
+        return write_counts(inserted=len(rows))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class JsonlSink(FileSink):
+    ext = "jsonl"
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _write(self, rows):
+        self._file.writelines(json.dumps(dict(zip(STUDENT_FIELDS, r)), ensure_ascii=False) + "\n" for r in rows)
+        self._file.flush()
+
+
+class CsvSink(FileSink):
+    """Header row + one line per student, in the layout load_staged.py feeds to LOAD DATA."""
+
+    ext = "csv"
+
+    def _open(self):
+        self._file = open(self.path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file, lineterminator="\n")
+        self._writer.writerow(STUDENT_FIELDS)
+
+    def _write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+
+class ParquetSink(FileSink):
+    """Columnar output in row groups of PARQUET_ROW_GROUP_SIZE rows. Needs pyarrow."""
+
+    ext = "parquet"
+
+    def __init__(self, directory, run_id, label):
+        super().__init__(directory, run_id, label)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("--sink parquet needs pyarrow (pip install pyarrow)")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self._schema = pyarrow.schema(
+            [(f, pyarrow.int64() if f == "institute_id" else pyarrow.string()) for f in STUDENT_FIELDS]
+        )
+        self._buffer = []
+
+    def _open(self):
+        self._file = self._pq.ParquetWriter(self.path, self._schema)
+
+    def _write(self, rows):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= PARQUET_ROW_GROUP_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        columns = list(zip(*self._buffer))
+        arrays = [self._pa.array(list(col), type=field.type) for col, field in zip(columns, self._schema)]
+        self._file.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+        self._buffer = []
+
+    def close(self):
+        if self._file is not None:
+            self._flush()
+        super().close()
+
+
+FILE_SINKS = {"jsonl": JsonlSink, "csv": CsvSink, "parquet": ParquetSink}
+
+
+def open_sink(args, label):
+    """
+    The --sink for one writer (main process, worker, thread or async writer).
+    label keeps concurrent file sinks of one run apart.
+    """
+    kind = getattr(args, "sink", None) or DEFAULT_SINK
+    if kind == "mysql":
+        return MySQLSink(
+            getattr(args, "db_batch_size", None) or DEFAULT_DB_BATCH_SIZE,
+            getattr(args, "change_detection", True),
+        )
+    return FILE_SINKS[kind](getattr(args, "sink_dir", None) or STAGING_DIR, args.run_id, label)
+
+
+def load_institutes(args, sink):
+    """
+    The institute index for a run. Read from MySQL when it is reachable
+    (refreshing INSTITUTES_SNAPSHOT_PATH); file-sink runs fall back to the
+    snapshot when it is not.
+    """
     try:
-        cursor.close()
-        conn.close()
-    except:
+        if isinstance(sink, MySQLSink):
+            institutes = InstituteIndex.load(sink.cursor, args.match_threshold)
+        else:
+            conn = mysql.connector.connect(**DB_CONFIG)
+            try:
+                cursor = conn.cursor()
+                institutes = InstituteIndex.load(cursor, args.match_threshold)
+                cursor.close()
+            finally:
+                conn.close()
+    except mysql.connector.Error as e:
+        if isinstance(sink, MySQLSink) or not os.path.exists(INSTITUTES_SNAPSHOT_PATH):
+            raise
+        print_status(f"DB unavailable ({e}); using institutes from {INSTITUTES_SNAPSHOT_PATH}.", "WARNING")
+        return InstituteIndex.load_snapshot(INSTITUTES_SNAPSHOT_PATH, args.match_threshold)
+
+    try:
+        institutes.save_snapshot(INSTITUTES_SNAPSHOT_PATH)
+    except OSError as e:
+        print_status(f"Could not save institute snapshot: {e}", "WARNING")
+    return institutes
+
+
+# ================= WRITE PIPELINE =================
+
+class WritePipeline:
+    """
+    Background DB writer for the sync engine. execute_task() hands a task's
+    rows to submit() and moves on to the next grid while a writer thread
+    drains a bounded queue into the sink, so page loads and upserts overlap.
+    A full queue blocks submit() (backpressure, counted as "write_waits").
+    A write that raises is retried WRITE_RETRIES times (MySQLSink reconnects
+    first), then its rows go to FAILED_ROWS_LOG. Finished writes are handed
+    back by completed()/close() on the producer's thread, so summaries and
+    the ledger are only touched there.
+    """
+
+    def __init__(self, sink, maxsize=DEFAULT_WRITE_QUEUE_SIZE):
+        self.sink = sink
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, task, rows, summary):
+        try:
+            self.queue.put_nowait((task, rows, summary))
+        except queue.Full:
+            count_metric("write_waits")
+            log(f"DB writer is {self.queue.maxsize} tasks behind; waiting", "INFO")
+            self.queue.put((task, rows, summary))
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            task, rows, summary = item
+            t0 = time.time()
+            counts = self._write(task, rows)
+            self.results.put((task, summary, counts, time.time() - t0))
+
+    def _write(self, task, rows):
+        return write_with_retry(self.sink, task, rows)
+
+    def completed(self):
+        """(task, summary, counts, seconds) of every write finished since the last call."""
+        done = []
+        while True:
+            try:
+                done.append(self.results.get_nowait())
+            except queue.Empty:
+                return done
+
+    def close(self):
+        """Waits for the queued writes and returns their completed() entries. The sink stays open."""
+        self.queue.put(None)
+        self.thread.join()
+        return self.completed()
+
+
+def write_with_retry(sink, task, rows):
+    """
+    sink.write() for a background writer, which must never die: a write that
+    raises is retried WRITE_RETRIES times (MySQLSink reconnects first), then
+    its rows go to FAILED_ROWS_LOG and are counted as failed.
+    """
+    context = {"college": task[2], "stream": task[3]}
+    for attempt in range(1, WRITE_RETRIES + 1):
+        try:
+            return sink.write(rows, context)
+        except Exception as e:
+            error = e
+            log(f"DB write failed for {task[2]} | {task[3]} ({e}); attempt {attempt}/{WRITE_RETRIES}", "WARNING")
+            if attempt < WRITE_RETRIES:
+                time.sleep(DB_RECONNECT_DELAY * attempt)
+
+    timestamp = datetime.utcnow().isoformat()
+    for r in rows:
+        write_json_line(FAILED_ROWS_LOG, {"error": str(error), "row": r, **context, "timestamp": timestamp})
+    return write_counts(failed=len(rows))
+
+
+def write_pipeline(sink, args):
+    """A WritePipeline over sink when --write-queue is on, else None (inline writes)."""
+    size = getattr(args, "write_queue", 0) or 0
+    return WritePipeline(sink, size) if size > 0 else None
+
+
+def write_error(counts):
+    """
+    Error of a task whose rows failed to write (see FAILED_ROWS_LOG), else
+    None. Such a task ends as "error", so --resume and the shared queue run
+    it again.
+    """
+    return f"{counts['failed']} rows failed to write" if counts["failed"] else None
+
+
+def written_summary(total, counts):
+    """task_summary() of a task whose rows were written inline."""
+    error = write_error(counts)
+    return task_summary("error" if error else "done", total, error=error, **counts)
+
+
+def apply_write(summary, counts, seconds, label):
+    """Folds a background write's counts and DB time into its task summary and prints them."""
+    summary.update(counts)
+    summary["error"] = write_error(counts)
+    summary["status"] = "error" if summary["error"] else "done"
+    summary.setdefault("metrics", {"phases": {}, "counters": {}})["phases"]["db"] = round(seconds, 4)
+    print_status(
+        f"{label}: Extracted {summary['total']} | Saved {counts['inserted']} | "
+        f"Updated {counts['updated']} | Unchanged {counts['unchanged']} | Failed {counts['failed']}",
+        "WARNING" if counts["failed"] else "SUCCESS",
+    )
+
+
+# ================= TASK LEDGER =================
+
+class TaskLedger:
+    """
+    Durable record of scraping tasks in a local SQLite file.
+
+    `tasks` keeps one row per (year, district, college, stream) with its last
+    status, row count, duration and error. `task_sets` remembers which tasks
+    discovery produced for a given set of CLI filters, so --resume can skip
+    discovery as well as the tasks that already finished.
+    """
+
+    def __init__(self, path=LEDGER_PATH):
+        self.path = path
+        # The HTTP engine marks tasks running from its session threads
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                year TEXT NOT NULL,
+                district TEXT NOT NULL,
+                college TEXT NOT NULL,
+                stream TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                row_count INTEGER NOT NULL DEFAULT 0,
+                inserted INTEGER NOT NULL DEFAULT 0,
+                updated INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                duration REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (year, district, college, stream)
+            );
+            CREATE TABLE IF NOT EXISTS task_sets (
+                filter_key TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                year TEXT NOT NULL,
+                district TEXT NOT NULL,
+                college TEXT NOT NULL,
+                stream TEXT NOT NULL,
+                PRIMARY KEY (filter_key, position)
+            );
+            """
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def load_task_set(self, filter_key):
+        cur = self.conn.execute(
+            "SELECT year, district, college, stream FROM task_sets WHERE filter_key=? ORDER BY position",
+            (filter_key,),
+        )
+        return [tuple(r) for r in cur.fetchall()]
+
+    def save_task_set(self, filter_key, tasks):
+        with self.conn:
+            self.conn.execute("DELETE FROM task_sets WHERE filter_key=?", (filter_key,))
+            self.conn.executemany(
+                "INSERT INTO task_sets (filter_key, position, year, district, college, stream) VALUES (?,?,?,?,?,?)",
+                [(filter_key, i, *t) for i, t in enumerate(tasks)],
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tasks (year, district, college, stream) VALUES (?,?,?,?)",
+                tasks,
+            )
+
+    def statuses(self):
+        cur = self.conn.execute("SELECT year, district, college, stream, status FROM tasks")
+        return {tuple(r[:4]): r[4] for r in cur.fetchall()}
+
+    def pending(self, tasks):
+        """Tasks that are not yet recorded as done (new, failed or interrupted)."""
+        statuses = self.statuses()
+        return [t for t in tasks if statuses.get(tuple(t)) not in LEDGER_COMPLETE_STATUSES]
+
+    def mark_running(self, task):
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO tasks (year, district, college, stream, status, attempts, updated_at)
+                VALUES (?,?,?,?,'running',1,?)
+                ON CONFLICT (year, district, college, stream) DO UPDATE SET
+                status='running', attempts=attempts + 1, updated_at=excluded.updated_at
+                """,
+                (*task, datetime.utcnow().isoformat()),
+            )
+
+    def record(self, task, summary):
+        with self.lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO tasks (year, district, college, stream, status, row_count, inserted,
+                                   updated, failed, duration, attempts, last_error, updated_at)
+                VALUES (?,?,?,?,?,?,?,?,?,?,1,?,?)
+                ON CONFLICT (year, district, college, stream) DO UPDATE SET
+                status=excluded.status, row_count=excluded.row_count, inserted=excluded.inserted,
+                updated=excluded.updated, failed=excluded.failed, duration=excluded.duration,
+                last_error=excluded.last_error, updated_at=excluded.updated_at
+                """,
+                (
+                    *task,
+                    summary["status"],
+                    summary["total"],
+                    summary["inserted"],
+                    summary["updated"],
+                    summary["failed"],
+                    summary.get("duration"),
+                    summary.get("error"),
+                    datetime.utcnow().isoformat(),
+                ),
+            )
+
+
+def ledger_filter_key(args):
+    keys = [[f[k] for k in FILTER_FIELDS] for f in args.filters]
+    return json.dumps(keys[0] if len(keys) == 1 else keys)
+
+
+# ================= SHARED TASK QUEUE =================
+
+class SharedTaskQueue:
+    """
+    Task queue shared by every host running with the same --shared-queue
+    name, kept in the MySQL scrape_tasks table (see schema.sql).
+
+    publish() adds discovered tasks that the queue does not have yet.
+    claim() leases pending tasks, and tasks whose lease expired because their
+    host stopped heartbeating (up to SHARED_TASK_MAX_ATTEMPTS attempts), with
+    SELECT ... FOR UPDATE SKIP LOCKED, so two hosts never claim the same task. A heartbeat thread extends the leases
+    this host holds; complete() releases a task with its outcome.
+    """
+
+    def __init__(self, name, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.conn = mysql.connector.connect(**DB_CONFIG)
+        self.task_ids = {}
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._beat, name="lease-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def _cursor(self):
+        if not self.conn.is_connected():
+            log("Shared queue connection lost; reconnecting...", "WARNING")
+            self.conn.reconnect(attempts=DB_RECONNECT_ATTEMPTS, delay=DB_RECONNECT_DELAY)
+        return self.conn.cursor()
+
+    def publish(self, tasks):
+        """Adds tasks the queue does not have yet; returns how many were new."""
+        cur = self._cursor()
+        added = 0
+        for i in range(0, len(tasks), DEFAULT_DB_BATCH_SIZE):
+            cur.executemany(
+                f"INSERT IGNORE INTO {SHARED_TASKS_TABLE} (queue_name, year, district, college, stream) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                [(self.name, *task) for task in tasks[i:i + DEFAULT_DB_BATCH_SIZE]],
+            )
+            added += max(cur.rowcount, 0)
+        self.conn.commit()
+        cur.close()
+        return added
+
+    def claim(self, n):
+        """
+        Leases up to n claimable tasks, in publish order. An expired lease is
+        only taken over while the task has attempts left; otherwise the task
+        is marked as an error.
+        """
+        cur = self._cursor()
+        try:
+            cur.execute(
+                f"UPDATE {SHARED_TASKS_TABLE} SET status = 'error', owner = NULL, lease_expires = NULL, "
+                "last_error = 'lease expired on its last attempt' "
+                "WHERE queue_name = %s AND status = 'leased' AND lease_expires < NOW() AND attempts >= %s",
+                (self.name, SHARED_TASK_MAX_ATTEMPTS),
+            )
+            exhausted = cur.rowcount
+            cur.execute(
+                f"SELECT task_id, year, district, college, stream, status FROM {SHARED_TASKS_TABLE} "
+                "WHERE queue_name = %s AND (status = 'pending' "
+                "OR (status = 'leased' AND lease_expires < NOW() AND attempts < %s)) "
+                "ORDER BY task_id LIMIT %s FOR UPDATE SKIP LOCKED",
+                (self.name, SHARED_TASK_MAX_ATTEMPTS, n),
+            )
+            rows = cur.fetchall()
+            if rows:
+                ids = [r[0] for r in rows]
+                cur.execute(
+                    f"UPDATE {SHARED_TASKS_TABLE} SET status = 'leased', owner = %s, "
+                    "lease_expires = NOW() + INTERVAL %s SECOND, heartbeat_at = NOW(), attempts = attempts + 1 "
+                    f"WHERE task_id IN ({', '.join(['%s'] * len(ids))})",
+                    (self.owner, self.lease_seconds, *ids),
+                )
+            self.conn.commit()
+        except mysql.connector.Error:
+            self.conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+        if exhausted:
+            print_status(
+                f"{exhausted} tasks lost their lease on attempt {SHARED_TASK_MAX_ATTEMPTS}; marked as errors.",
+                "WARNING",
+            )
+        reclaimed = sum(1 for r in rows if r[5] == "leased")
+        if reclaimed:
+            print_status(f"Reclaimed {reclaimed} tasks whose lease expired (their host stopped).", "WARNING")
+        tasks = []
+        for task_id, *task, _ in rows:
+            self.task_ids[tuple(task)] = task_id
+            tasks.append(tuple(task))
+        return tasks
+
+    def complete(self, task, summary):
+        """
+        Releases a claimed task. Finished tasks keep their status; others go
+        back to pending until they have used SHARED_TASK_MAX_ATTEMPTS.
+        """
+        task_id = self.task_ids.pop(tuple(task), None)
+        if task_id is None:
+            return
+        status = summary["status"]
+        cur = self._cursor()
+        cur.execute(
+            f"UPDATE {SHARED_TASKS_TABLE} SET status = IF(%s OR attempts >= %s, %s, 'pending'), "
+            "owner = NULL, lease_expires = NULL, row_count = %s, last_error = %s "
+            "WHERE task_id = %s AND owner = %s",
+            (
+                status in LEDGER_COMPLETE_STATUSES,
+                SHARED_TASK_MAX_ATTEMPTS,
+                status,
+                summary["total"],
+                summary.get("error"),
+                task_id,
+                self.owner,
+            ),
+        )
+        lost = cur.rowcount == 0
+        self.conn.commit()
+        cur.close()
+        if lost:
+            log(f"Lease on {task} was lost before it finished; another host may have run it again", "WARNING")
+
+    def leased_elsewhere(self):
+        """(tasks other hosts hold, seconds until the first of their leases expires)."""
+        cur = self._cursor()
+        cur.execute(
+            "SELECT COUNT(*), TIMESTAMPDIFF(SECOND, NOW(), MIN(lease_expires)) "
+            f"FROM {SHARED_TASKS_TABLE} WHERE queue_name = %s AND status = 'leased' AND owner <> %s",
+            (self.name, self.owner),
+        )
+        count, expires_in = cur.fetchone()
+        self.conn.commit()
+        cur.close()
+        return count, max(expires_in or 0, 0)
+
+    def _beat(self):
+        conn = None
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if conn is None or not conn.is_connected():
+                    conn = mysql.connector.connect(**DB_CONFIG)
+                cur = conn.cursor()
+                cur.execute(
+                    f"UPDATE {SHARED_TASKS_TABLE} SET lease_expires = NOW() + INTERVAL %s SECOND, heartbeat_at = NOW() "
+                    "WHERE queue_name = %s AND owner = %s AND status = 'leased'",
+                    (self.lease_seconds, self.name, self.owner),
+                )
+                conn.commit()
+                cur.close()
+            except mysql.connector.Error as e:
+                log(f"Lease heartbeat failed: {e}", "WARNING")
+                conn = None
+        if conn is not None:
+            conn.close()
+
+    def close(self):
+        """Stops the heartbeat and hands tasks still held back to the queue."""
+        self._stop.set()
+        self._heartbeat.join()
+        try:
+            cur = self._cursor()
+            cur.execute(
+                f"UPDATE {SHARED_TASKS_TABLE} SET status = 'pending', owner = NULL, lease_expires = NULL, "
+                "attempts = GREATEST(attempts - 1, 0) WHERE queue_name = %s AND owner = %s AND status = 'leased'",
+                (self.name, self.owner),
+            )
+            self.conn.commit()
+            cur.close()
+            self.conn.close()
+        except mysql.connector.Error as e:
+            log(f"Could not release leased tasks (they return once their lease expires): {e}", "WARNING")
+
+
+def run_shared_queue(shared, run_chunk, args):
+    """
+    Claims tasks from the shared queue and runs them with run_chunk(tasks)
+    (which returns their summaries) until no task is pending or leased by
+    another host. Returns (tasks, summaries) for everything this host ran.
+    """
+    claim_size = args.claim_size * max(args.workers, 1)
+    tasks, summaries = [], []
+    while True:
+        claimed = shared.claim(claim_size)
+        if not claimed:
+            leased, expires_in = shared.leased_elsewhere()
+            if not leased:
+                break
+            wait = min(max(expires_in, 1), shared.lease_seconds / 3)
+            print_status(f"{leased} tasks are leased by other hosts; checking again in {wait:.0f}s.", "INFO")
+            time.sleep(wait)
+            continue
+
+        chunk = schedule_tasks(claimed)
+        print_status(f"Claimed {len(chunk)} tasks from shared queue '{shared.name}'.", "HEADER")
+        chunk_summaries = list(run_chunk(chunk) or [])
+        chunk_summaries += [task_summary("error", error="task was not run")] * (len(chunk) - len(chunk_summaries))
+        for task, summary in zip(chunk, chunk_summaries):
+            shared.complete(task, summary)
+        tasks += chunk
+        summaries += chunk_summaries
+    print_status(f"Shared queue '{shared.name}' has no tasks left to claim.", "INFO")
+    return tasks, summaries
+
+
+# ================= EXECUTION =================
+
+def task_summary(status, total=0, inserted=0, updated=0, failed=0, error=None, unchanged=0, removed=0):
+    """Per-task result record, aggregated by print_run_summary()."""
+    return {
+        "status": status,
+        "total": total,
+        "inserted": inserted,
+        "updated": updated,
+        "failed": failed,
+        "unchanged": unchanged,
+        "removed": removed,
+        "error": error,
+    }
+
+def print_task_summary(total, counts=None):
+    if total == 0:
+        print_status("No records found (Empty Table).", "WARNING")
+    else:
+        c = counts or write_counts()
+        failed = c["failed"]
+        msg = (
+            f"Extracted: {total:<4} | Saved: {c['inserted']:<4} | Updated: {c['updated']:<4} | "
+            f"Unchanged: {c['unchanged']:<4} | Failed: {failed:<4}"
+        )
+        if c["removed"]:
+            msg += f" | No longer listed: {c['removed']}"
+        if failed > 0:
+            print_status(msg, "WARNING")
+        else:
+            print_status(msg, "SUCCESS")
+
+def execute_task(page, sink, task, institutes, args=None, state=None, capture=None):
+    year, district, college, stream = task
+    if capture:
+        capture.html = None
+
+    # 1-3. Year, District, College (only the levels that differ from the page)
+    with phase("navigate"):
+        (state or PageState()).navigate(page, task)
+
+    # 4. Stream & Show
+    with phase("show"):
+        page.select_option("#ddlStream", label=stream)
+        response = postback(page, lambda: page.click("#btnShow"), ["#grdRptStd", "#btnShow"], "show")
+        has_grid = page.locator("#grdRptStd").count()
+    captured = {"show": response_html(page, response)} if CAPTURE else None
+
+    if not has_grid:
+        save_capture(task, captured)
+        log("Table not found (no #grdRptStd after Show)", "INFO")
+        print_task_summary(0)
+        return task_summary("empty")
+
+    if page.locator("#lbtnAll").count():
+        log("Expanding all records...", "INFO")
+        with phase("show_all"):
+            response = postback(page, lambda: page.click("#lbtnAll"), "#grdRptStd", "show_all")
+        if captured is not None:
+            # In response mode the page only got the grid-less copy of the response
+            raw = capture.html if capture else None
+            captured["show_all"] = raw if raw is not None else response_html(page, response)
+    save_capture(task, captured)
+
+    with phase("resolve"):
+        institute_id, sams_code = resolve_institute(institutes, college)
+    if not institute_id:
+        log(f"Institute not found in DB for {college}", "ERROR")
+        return task_summary("no_institute")
+
+    extract_mode = getattr(args, "extract_mode", None) or DEFAULT_EXTRACT_MODE
+    html = None
+    if capture:
+        html, capture.html = capture.html, None
+    if extract_mode == "response" and html is None:
+        # No "Show All" response was captured (single-page grid): read the DOM
+        extract_mode = "evaluate"
+    with phase("extract"):
+        t0 = time.time()
+        if html is not None:
+            cell_rows = list(iter_grid_html(html, "grdRptStd"))
+        else:
+            cell_rows = extract_grid_rows(page, extract_mode)
+        elapsed = time.time() - t0
+    count_metric("rows", len(cell_rows))
+    rate = len(cell_rows) / elapsed if elapsed > 0 else float(len(cell_rows))
+    log(f"Read {len(cell_rows)} rows in {elapsed:.2f}s ({rate:.0f} rows/sec, mode={extract_mode})", "INFO")
+
+    return write_task_rows(sink, task, cell_rows, institute_id, sams_code)
+
+
+def write_task_rows(sink, task, cell_rows, institute_id, sams_code):
+    """
+    Builds and dedups a task's student rows and writes them, or hands them to
+    the background writer when sink is a WritePipeline. Shared by
+    execute_task() and replay_task().
+    """
+    college, stream = task[2], task[3]
+    batch = build_student_rows(cell_rows, task, institute_id, sams_code)
+    if not batch:
+        print_task_summary(0)
+        return task_summary("empty")
+
+    rows = dedup_student_rows(batch)
+    if isinstance(sink, WritePipeline):
+        # Counts and the "db" phase are filled in by apply_write() once written
+        summary = task_summary("queued", len(rows))
+        sink.submit(task, rows, summary)
+        log(f"Queued {len(rows)} rows for the DB writer", "INFO")
+        return summary
+
+    with phase("db"):
+        counts = sink.write(rows, {"college": college, "stream": stream})
+
+    print_task_summary(len(rows), counts)
+    return written_summary(len(rows), counts)
+
+
+# ================= CAPTURE / REPLAY =================
+
+# Store every task's Show/Show All responses are saved to (--capture DIR)
+CAPTURE = None
+
+
+def open_capture(args):
+    global CAPTURE
+    if getattr(args, "capture", None):
+        CAPTURE = CaptureStore(args.capture, args.run_id)
+
+
+def response_html(page, response):
+    """Body of a postback response; the page's HTML when the response was missed (networkidle fallback)."""
+    try:
+        if response is not None:
+            return response.text()
+    except PlaywrightError:
         pass
+    return page.content()
+
+
+async def async_response_html(page, response):
+    try:
+        if response is not None:
+            return await response.text()
+    except PlaywrightError:
+        pass
+    return await page.content()
+
+
+def save_capture(task, steps):
+    if CAPTURE is not None and steps:
+        with phase("capture"):
+            CAPTURE.record("students", task, steps)
+
+
+def replay_tasks(store, args):
+    """
+    Captured tasks matching the run's filters (positional arguments,
+    --filter, --job), matched level by level like discovery matches
+    dropdown options.
+    """
+    keys = store.keys("students")
+    selected = []
+    for f in args.filters:
+        matched = keys
+        for level, field in enumerate(FILTER_FIELDS):
+            options = list(dict.fromkeys(k[level] for k in matched))
+            if level == 0:
+                allowed = set(select_years(options, f[field]))
+            else:
+                allowed = set(find_matching_options(options, f[field], field.capitalize()))
+            matched = [k for k in matched if k[level] in allowed]
+        selected += matched
+    return list(dict.fromkeys(selected))
+
+
+def replay_task(store, sink, task, institutes, args):
+    """execute_task() on a captured grid: same resolve, parsing and DB writes, no browser."""
+    college = task[2]
+    with phase("load"):
+        html = store.grid("students", task)
+    if html is None:
+        return task_summary("error", error="not in the capture store")
+
+    if not cut_grid_html(html, "grdRptStd")[1]:
+        log("Table not found (no #grdRptStd after Show)", "INFO")
+        print_task_summary(0)
+        return task_summary("empty")
+
+    with phase("resolve"):
+        institute_id, sams_code = resolve_institute(institutes, college)
+    if not institute_id:
+        log(f"Institute not found in DB for {college}", "ERROR")
+        return task_summary("no_institute")
+
+    with phase("extract"):
+        cell_rows = list(iter_grid_html(html, "grdRptStd"))
+    count_metric("rows", len(cell_rows))
+    return write_task_rows(sink, task, cell_rows, institute_id, sams_code)
+
+
+def replay_one_task(store, sink, task, institutes, args):
+    """run_one_task() for replay_task()."""
+    t0 = time.time()
+    metrics, token = start_task_metrics()
+    try:
+        summary = replay_task(store, sink, task, institutes, args)
+    except Exception as e:
+        print_status(f"Task Crashed: {e}", "ERROR")
+        summary = task_summary("error", error=str(e))
+    summary["duration"] = round(time.time() - t0, 3)
+    finish_task_metrics(summary, metrics, token)
+    return summary
+
+
+# ================= RUNNERS =================
+
+# Request-blocking policy of this process; see resource_blocker()
+BLOCKER = None
+
+def resource_blocker(args):
+    """The process-wide ResourceBlocker, built from --block-resources on first use."""
+    global BLOCKER
+    if BLOCKER is None:
+        blocked = parse_blocked_resources(
+            getattr(args, "block_resources", None), headless=not args.show_browser
+        )
+        BLOCKER = ResourceBlocker(BASE_URL, blocked)
+    return BLOCKER
+
+def report_blocker(prefix=""):
+    line = BLOCKER.summary() if BLOCKER else None
+    if line:
+        print_status(f"{prefix}{line}", "INFO")
+
+class BrowserSession:
+    """
+    The Chromium, context and page of one sync runner (main process or
+    worker), with the PageState of that page. prepare() runs before every
+    task: it relaunches a disconnected browser, replaces a page that fails
+    its health check, recycles the context every --recycle-every tasks and
+    relaunches the browser once its processes pass --max-browser-mb. Every
+    recycle and relaunch is logged to BROWSER_EVENTS_LOG and counted in the
+    task's metrics. The constructor raises if the portal cannot be loaded.
+    """
+
+    def __init__(self, p, args, label=""):
+        self.p = p
+        self.args = args
+        self.label = label
+        self.browser = self.context = self.page = None
+        self.state = PageState()
+        self.capture = None
+        self.tasks_on_page = 0
+        self.usable = False
+        self.launch()
+
+    def launch(self):
+        self.close()
+        self.browser = self.p.chromium.launch(headless=not self.args.show_browser)
+        try:
+            self.new_page()
+        except Exception:
+            self.close()
+            raise
+        self.usable = True
+
+    def new_page(self):
+        """Replaces the context (and with it the page's DOM, heap and renderer) and loads BASE_URL."""
+        if self.context is not None:
+            try:
+                self.context.close()
+            except PlaywrightError:
+                pass
+        self.state.reset()
+        self.tasks_on_page = 0
+        self.context = self.browser.new_context()
+        self.page = self.context.new_page()
+        resource_blocker(self.args).install(self.page)
+        if getattr(self.args, "extract_mode", None) == "response":
+            self.capture = GridCapture()
+            self.capture.install(self.page)
+        self.page.goto(BASE_URL, timeout=90000)
+        self.page.wait_for_selector("#ddlYear", timeout=60000)
+
+    def close(self):
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except PlaywrightError:
+                pass
+        self.browser = self.context = self.page = None
+        self.usable = False
+
+    def healthy(self):
+        try:
+            return not self.page.is_closed() and self.page.evaluate("() => !!document.querySelector('#ddlYear')")
+        except PlaywrightError:
+            return False
+
+    def _record(self, action, reason, pss_mb=None):
+        count_metric("browser_recycles" if action == "recycle" else "browser_relaunches")
+        print_status(f"{self.label}Browser {action}: {reason}", "WARNING" if action == "relaunch" else "INFO")
+        write_json_line(BROWSER_EVENTS_LOG, {
+            "timestamp": datetime.utcnow().isoformat(),
+            "pid": os.getpid(),
+            "label": self.label.strip(),
+            "action": action,
+            "reason": reason,
+            "tasks_on_page": self.tasks_on_page,
+            "pss_mb": round(pss_mb, 1) if pss_mb is not None else None,
+        })
+
+    def _check(self):
+        """("recycle" | "relaunch", reason, pss_mb) when the page should not be reused, else None."""
+        if self.browser is None or not self.browser.is_connected():
+            return "relaunch", "browser disconnected", None
+        if not self.healthy():
+            return "recycle", "page failed health check", None
+        recycle_every = getattr(self.args, "recycle_every", DEFAULT_RECYCLE_EVERY)
+        if recycle_every and self.tasks_on_page >= recycle_every:
+            return "recycle", f"{self.tasks_on_page} tasks on this page", None
+        max_mb = getattr(self.args, "max_browser_mb", DEFAULT_MAX_BROWSER_MB)
+        if max_mb and self.tasks_on_page:
+            pss_mb = descendant_pss_mb()
+            if pss_mb is not None and pss_mb > max_mb:
+                return "relaunch", f"browser PSS {pss_mb:.0f} MiB > {max_mb} MiB", pss_mb
+        return None
+
+    def prepare(self):
+        """Returns a page fit for the next task, recycling or relaunching as needed."""
+        action = self._check()
+        if action:
+            kind, reason, pss_mb = action
+            self._record(kind, reason, pss_mb)
+            try:
+                if kind == "recycle":
+                    self.new_page()
+                else:
+                    self.launch()
+            except Exception as e:
+                if kind == "relaunch":
+                    raise
+                self._record("relaunch", f"recycle failed: {e}")
+                self.launch()
+        self.tasks_on_page += 1
+        return self.page
+
+    def recover(self):
+        """
+        Reloads BASE_URL after a crashed task, relaunching the browser if that
+        fails. Returns (and leaves in self.usable) False if the session is unusable.
+        """
+        self.state.reset()
+        if self.browser is not None and self.browser.is_connected() and recover_page(self.page):
+            return True
+        self._record("relaunch", "page unusable after a crashed task")
+        try:
+            self.launch()
+            return True
+        except Exception as e:
+            print_status(f"{self.label}Browser relaunch failed: {e}", "ERROR")
+            return False
+
+def recover_page(page):
+    """Reloads BASE_URL after a crashed task. Returns False if the page is unusable."""
+    try:
+        page.goto(BASE_URL, timeout=30000)
+        page.wait_for_selector("#ddlYear", timeout=30000)
+        return True
+    except Exception:
+        return False
+
+def announce_task(i, total, task, worker_id=None):
+    year, district, college, stream = task
+    if worker_id is not None:
+        print_status(f"[W{worker_id}] Task {i} of {total}: {college} | {stream} | {district} | {year}", "INFO")
+        return
+    print_status(f"Processing Task {i} of {total}", "HEADER")
+    print(f"    {Colors.BOLD}Target  :{Colors.ENDC} {college}")
+    print(f"    {Colors.BOLD}Stream  :{Colors.ENDC} {stream}")
+    print(f"    {Colors.BOLD}Context :{Colors.ENDC} {district} | {year}\n")
+
+def run_one_task(session, sink, task, institutes, args):
+    """
+    Runs execute_task on the session's page (after BrowserSession.prepare()),
+    turning a crash into an "error" summary and recovering the session.
+    Records the duration and metrics.
+    """
+    t0 = time.time()
+    metrics, token = start_task_metrics()
+    try:
+        page = session.prepare()
+        summary = execute_task(page, sink, task, institutes, args, session.state, session.capture)
+    except Exception as e:
+        print_status(f"Task Crashed: {e}", "ERROR")
+        summary = task_summary("error", error=str(e))
+        session.recover()
+    summary["duration"] = round(time.time() - t0, 3)
+    finish_task_metrics(summary, metrics, token)
+    return summary
+
+def run_tasks_serial(session, sink, tasks, institutes, args, ledger=None, run_task=None):
+    """
+    Runs tasks one after another on a BrowserSession. With --write-queue the
+    DB writes run on a WritePipeline thread while the following tasks are
+    scraped; a task is recorded in the ledger once its rows are written.
+    run_task(sink, task) replaces run_one_task() (--replay has no session).
+    """
+    if run_task is None:
+        run_task = lambda target, task: run_one_task(session, target, task, institutes, args)
+    summaries = []
+    writer = write_pipeline(sink, args)
+
+    def record(done):
+        for task, summary, counts, seconds in done:
+            apply_write(summary, counts, seconds, f"{task[2]} | {task[3]}")
+            if ledger:
+                ledger.record(task, summary)
+
+    for i, task in enumerate(tasks, 1):
+        announce_task(i, len(tasks), task)
+        if ledger:
+            ledger.mark_running(task)
+        summary = run_task(writer or sink, task)
+        if ledger and summary["status"] != "queued":
+            ledger.record(task, summary)
+        summaries.append(summary)
+        if writer:
+            record(writer.completed())
+
+    if writer:
+        record(writer.close())
+    return summaries
+
+def worker_main(worker_id, inbox, result_queue, institutes, args, total):
+    """
+    Worker process for --workers: own browser, own page, own sink (DB connection)
+    and, with --write-queue, own background writer. Takes (group_id,
+    [(index, task), ...]) college groups from its inbox until it receives
+    None. Reports ("start", ...), ("done", ...), ("idle", ...) and
+    ("fatal", ...) messages on result_queue; "done" is sent once a task's
+    rows are written, which may be after the worker went idle.
+    """
+    ensure_log_dir()
+    configure_rate(args)
+    open_capture(args)
+
+    try:
+        sink = open_sink(args, f"w{worker_id}")
+    except (mysql.connector.Error, RuntimeError) as e:
+        result_queue.put(("fatal", worker_id, None, f"DB Connect Error: {e}"))
+        sys.exit(1)
+
+    with sync_playwright() as p:
+        try:
+            session = BrowserSession(p, args, f"[W{worker_id}] ")
+        except Exception as e:
+            result_queue.put(("fatal", worker_id, None, f"Failed to load website: {e}"))
+            sys.exit(1)
+
+        writer = write_pipeline(sink, args)
+        queued = {}
+
+        def send_written(done):
+            for task, summary, counts, seconds in done:
+                apply_write(summary, counts, seconds, f"[W{worker_id}] {task[2]} | {task[3]}")
+                result_queue.put(("done", worker_id, queued.pop(tuple(task)), summary))
+
+        while True:
+            try:
+                # While writes are outstanding, keep reporting them when they finish
+                item = inbox.get(timeout=0.2 if queued else None)
+            except queue.Empty:
+                send_written(writer.completed())
+                continue
+            if item is None:
+                break
+            gid, group = item
+
+            for idx, task in group:
+                result_queue.put(("start", worker_id, idx, None))
+                announce_task(idx + 1, total, task, worker_id)
+
+                summary = run_one_task(session, writer or sink, task, institutes, args)
+                if summary["status"] == "queued":
+                    queued[tuple(task)] = idx
+                else:
+                    result_queue.put(("done", worker_id, idx, summary))
+                if writer:
+                    send_written(writer.completed())
+
+                if summary["status"] == "error" and not session.usable:
+                    # Browser cannot be relaunched; exit so the parent starts a fresh worker
+                    if writer:
+                        send_written(writer.close())
+                    sink.close()
+                    WAIT_STATS.report(f"[W{worker_id}] ")
+                    report_rate(f"[W{worker_id}] ")
+                    report_blocker(f"[W{worker_id}] ")
+                    sys.exit(2)
+
+            result_queue.put(("idle", worker_id, gid, None))
+
+        if writer:
+            send_written(writer.close())
+        session.close()
+
+    WAIT_STATS.report(f"[W{worker_id}] ")
+    report_rate(f"[W{worker_id}] ")
+    report_blocker(f"[W{worker_id}] ")
+    sink.close()
+
+def run_tasks_parallel(tasks, institutes, args, ledger=None):
+    """
+    Runs tasks across args.workers processes, each with an isolated browser and
+    DB connection. The parent hands out one college at a time through each
+    worker's own inbox, so a worker's page keeps its year/district/college
+    selection between streams and the parent always knows what a worker holds.
+    When a worker dies, the unfinished tasks of its college are requeued (the
+    first of them is presumed to have crashed it and is given up after
+    MAX_TASK_ATTEMPTS crashes) and the worker slot is respawned (up to
+    MAX_WORKER_RESTARTS). Returns per-task summaries in task order.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    groups = college_groups(tasks)
+    pending = deque(enumerate(groups))
+
+    inboxes = {}
+
+    def spawn(wid):
+        inboxes[wid] = ctx.Queue()
+        proc = ctx.Process(
+            target=worker_main,
+            args=(wid, inboxes[wid], result_queue, institutes, args, len(tasks)),
+            daemon=True,
+        )
+        proc.start()
+        return proc
+
+    n_workers = max(1, min(args.workers, len(groups)))
+    print_status(f"Starting {n_workers} workers...", "HEADER")
+    workers = {wid: spawn(wid) for wid in range(1, n_workers + 1)}
+
+    assigned = {}
+    # Colleges handed to each worker whose tasks may still wait for its DB writer
+    held = defaultdict(list)
+    crashes = defaultdict(int)
+    restarts = defaultdict(int)
+    summaries = {}
+
+    def dispatch():
+        for wid in workers:
+            if assigned.get(wid) is None and pending:
+                gid, members = pending.popleft()
+                assigned[wid] = gid
+                held[wid] = [g for g in held[wid] if any(idx not in summaries for idx in groups[g])] + [gid]
+                inboxes[wid].put((gid, [(idx, tasks[idx]) for idx in members if idx not in summaries]))
+
+    def handle(msg):
+        kind, wid, idx, payload = msg
+        if kind == "idle":
+            assigned[wid] = None
+        elif kind == "start":
+            if ledger:
+                ledger.mark_running(tasks[idx])
+        elif kind == "done":
+            for _ in range(crashes[idx]):
+                note_retry(payload)
+            summaries[idx] = payload
+            if ledger:
+                ledger.record(tasks[idx], payload)
+            college, stream = tasks[idx][2], tasks[idx][3]
+            print_status(
+                f"[{len(summaries)}/{len(tasks)}] W{wid} {college} | {stream}: "
+                f"{payload['status']} ({payload['total']} rows)",
+                "SUCCESS" if payload["status"] != "error" else "WARNING",
+            )
+        elif kind == "fatal":
+            print_status(f"Worker {wid} failed to start: {payload}", "ERROR")
+
+    dispatch()
+    while len(summaries) < len(tasks):
+        try:
+            handle(result_queue.get(timeout=1))
+        except queue.Empty:
+            pass
+
+        dead = [wid for wid, proc in workers.items() if not proc.is_alive()]
+        if dead:
+            # Read whatever the dead processes managed to send before judging them
+            while True:
+                try:
+                    handle(result_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+        for wid in dead:
+            workers.pop(wid).join()
+            gid = assigned.pop(wid, None)
+            # Earlier colleges were scraped fine; only their unwritten rows are lost
+            for held_gid in held.pop(wid, []):
+                unwritten = [idx for idx in groups[held_gid] if idx not in summaries]
+                if held_gid != gid and unwritten:
+                    pending.appendleft((held_gid, unwritten))
+            remaining = [idx for idx in groups[gid] if idx not in summaries] if gid is not None else []
+            if remaining:
+                crashed = remaining[0]
+                crashes[crashed] += 1
+                if crashes[crashed] >= MAX_TASK_ATTEMPTS:
+                    summaries[crashed] = task_summary("error", error="worker crashed")
+                    if ledger:
+                        ledger.record(tasks[crashed], summaries[crashed])
+                    remaining = remaining[1:]
+            if remaining:
+                print_status(f"Worker {wid} died; requeueing {len(remaining)} tasks.", "WARNING")
+                pending.appendleft((gid, remaining))
+
+            if restarts[wid] < MAX_WORKER_RESTARTS and len(summaries) < len(tasks):
+                restarts[wid] += 1
+                print_status(f"Restarting worker {wid} ({restarts[wid]}/{MAX_WORKER_RESTARTS})", "WARNING")
+                workers[wid] = spawn(wid)
+
+        if not workers:
+            print_status("All workers failed; abandoning remaining tasks.", "ERROR")
+            for idx in range(len(tasks)):
+                summaries.setdefault(idx, task_summary("error", error="no workers left"))
+            break
+
+        dispatch()
+
+    for wid in workers:
+        inboxes[wid].put(None)
+    for proc in workers.values():
+        proc.join(timeout=30)
+
+    return [summaries[idx] for idx in range(len(tasks))]
+
+# ================= ASYNC ENGINE =================
+
+async def async_extract_grid_rows(page, mode=DEFAULT_EXTRACT_MODE, selector="#grdRptStd"):
+    """Async counterpart of extract_grid_rows()."""
+    if mode == "evaluate":
+        return await page.evaluate(GRID_ROWS_JS, selector)
+
+    if mode == "html":
+        html = await page.locator(selector).first.evaluate("el => el.outerHTML")
+        return parse_grid_html(html, selector.lstrip("#"))
+
+    rows = (await page.locator(f"{selector} tr").all())[1:]
+    return [await r.locator("td").all_inner_texts() for r in rows]
+
+async def async_open_page(browser, args):
+    """New isolated context + page on BASE_URL, so every page has its own ASP.NET session."""
+    context = await browser.new_context()
+    page = await context.new_page()
+    await resource_blocker(args).async_install(page)
+    await page.goto(BASE_URL, timeout=90000)
+    await page.wait_for_selector("#ddlYear", timeout=60000)
+    return page
+
+async def async_recover_page(page):
+    try:
+        await page.goto(BASE_URL, timeout=30000)
+        await page.wait_for_selector("#ddlYear", timeout=30000)
+        return True
+    except Exception:
+        return False
+
+async def async_execute_task(page, task, institutes, args, state=None):
+    """
+    Same navigation and extraction as execute_task(), without the DB write.
+    Returns (summary, rows) where rows are the deduplicated student tuples.
+    """
+    year, district, college, stream = task
+
+    with phase("navigate"):
+        await (state or PageState()).async_navigate(page, task)
+
+    with phase("show"):
+        await page.select_option("#ddlStream", label=stream)
+        response = await async_postback(page, lambda: page.click("#btnShow"), ["#grdRptStd", "#btnShow"], "show")
+        has_grid = await page.locator("#grdRptStd").count()
+    captured = {"show": await async_response_html(page, response)} if CAPTURE else None
+
+    if not has_grid:
+        save_capture(task, captured)
+        return task_summary("empty"), []
+
+    if await page.locator("#lbtnAll").count():
+        with phase("show_all"):
+            response = await async_postback(page, lambda: page.click("#lbtnAll"), "#grdRptStd", "show_all")
+        if captured is not None:
+            captured["show_all"] = await async_response_html(page, response)
+    save_capture(task, captured)
+
+    with phase("resolve"):
+        institute_id, sams_code = resolve_institute(institutes, college)
+    if not institute_id:
+        log(f"Institute not found in DB for {college}", "ERROR")
+        return task_summary("no_institute"), []
+
+    extract_mode = getattr(args, "extract_mode", None) or DEFAULT_EXTRACT_MODE
+    if extract_mode == "response":
+        # Response capture is only wired into the sync engine's BrowserSession
+        extract_mode = "evaluate"
+    with phase("extract"):
+        cell_rows = await async_extract_grid_rows(page, extract_mode)
+        batch = build_student_rows(cell_rows, task, institute_id, sams_code)
+    count_metric("rows", len(cell_rows))
+
+    rows = dedup_student_rows(batch)
+
+    return task_summary("done" if rows else "empty", len(rows)), rows
+
+async def run_tasks_async(tasks, institutes, args, ledger=None):
+    """
+    Drives the task list with async Playwright: one browser, up to
+    args.max_pages pages in flight, and a single writer coroutine that
+    drains a bounded queue into the sink through a worker thread. Writes go
+    through write_with_retry(), so a DB error never stops the writer and
+    leaves the pages blocked on a full queue. Returns summaries in task order.
+    """
+    max_pages = max(1, min(getattr(args, "max_pages", DEFAULT_MAX_PAGES), len(tasks)))
+
+    sink = open_sink(args, "async")
+
+    summaries = [None] * len(tasks)
+    task_queue = asyncio.Queue()
+    for members in college_groups(tasks):
+        task_queue.put_nowait(members)
+    write_queue = asyncio.Queue(maxsize=ASYNC_WRITE_QUEUE_SIZE)
+
+    async def writer():
+        while True:
+            item = await write_queue.get()
+            if item is None:
+                return
+            idx, rows = item
+            college, stream = tasks[idx][2], tasks[idx][3]
+            t0 = time.time()
+            counts = await asyncio.to_thread(write_with_retry, sink, tasks[idx], rows)
+            apply_write(summaries[idx], counts, time.time() - t0, f"{college} | {stream}")
+            if ledger:
+                ledger.record(tasks[idx], summaries[idx])
+
+    async def page_worker(slot, browser):
+        try:
+            page = await async_open_page(browser, args)
+        except Exception as e:
+            print_status(f"[P{slot}] Failed to load website: {e}", "ERROR")
+            return
+        state = PageState()
+        while True:
+            try:
+                members = task_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            for idx in members:
+                task = tasks[idx]
+                print_status(f"[P{slot}] Task {idx + 1} of {len(tasks)}: {task[2]} | {task[3]}", "INFO")
+                if ledger:
+                    ledger.mark_running(task)
+                t0 = time.time()
+                metrics, token = start_task_metrics()
+                try:
+                    summary, rows = await async_execute_task(page, task, institutes, args, state)
+                except Exception as e:
+                    print_status(f"[P{slot}] Task Crashed: {e}", "ERROR")
+                    summary, rows = task_summary("error", error=str(e)), []
+                    state.reset()
+                    await async_recover_page(page)
+                summary["duration"] = round(time.time() - t0, 3)
+                finish_task_metrics(summary, metrics, token)
+                summaries[idx] = summary
+                if rows:
+                    await write_queue.put((idx, rows))
+                elif ledger:
+                    ledger.record(task, summary)
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=not args.show_browser)
+        writer_task = asyncio.create_task(writer())
+        print_status(f"Async engine running {max_pages} pages.", "HEADER")
+        await asyncio.gather(*(page_worker(slot, browser) for slot in range(1, max_pages + 1)))
+        await write_queue.put(None)
+        await writer_task
+        await browser.close()
+
+    sink.close()
+
+    for idx in range(len(tasks)):
+        if summaries[idx] is None:
+            summaries[idx] = task_summary("error", error="no page available")
+    return summaries
+
+# ================= HTTP ENGINE =================
+
+def http_discover_tasks(client, args, cache=None):
+    """
+    Browserless discover_and_populate_tasks(): walks the same dropdowns
+    with HTTP postbacks and shares the DiscoveryCache.
+    """
+    print_status("Starting discovery of scraping tasks (HTTP)...", "HEADER")
+
+    raw_years = [label for label, _ in client.options("#ddlYear")]
+    years_to_scan = select_years(raw_years, args.year)
+    if not years_to_scan:
+        return []
+
+    cache = cache or DiscoveryCache(None)
+    tasks = []
+    for year in years_to_scan:
+        print_status(f"Scanning Year: {year}", "HEADER")
+
+        year_entry = cache.year(year)
+        if year_entry:
+            raw_districts = [label for label, _ in year_entry["districts"]]
+        else:
+            try:
+                client.select_option("#ddlYear", label=year)
+            except Exception as e:
+                print_status(f"Failed to select year {year}: {e}", "WARNING")
+                continue
+            options = client.options("#ddlDistrict")
+            cache.set_year(year, options)
+            raw_districts = [label for label, _ in options]
+
+        for district in find_matching_options(raw_districts, args.district, "District"):
+            print_status(f"  > District: {district}", "INFO")
+
+            cached_tasks = cached_district_tasks(cache, year, district, args)
+            if cached_tasks is not None:
+                tasks.extend(cached_tasks)
+                continue
+
+            try:
+                client.select_option("#ddlYear", label=year)
+                client.select_option("#ddlDistrict", label=district)
+                college_options = client.options("#ddlCollege")
+            except Exception as e:
+                print_status(f"    Failed to select district {district}: {e}", "WARNING")
+                continue
+
+            colleges_to_scan = find_matching_options(
+                [label for label, _ in college_options], args.college, "College"
+            )
+            if args.college and not colleges_to_scan:
+                continue
+
+            print_status(f"    Found {len(colleges_to_scan)} matching colleges.", "INFO")
+
+            college_streams = {}
+            for college in colleges_to_scan:
+                try:
+                    client.select_option("#ddlCollege", label=college)
+                    stream_options = client.options("#ddlStream")
+                except Exception as e:
+                    print_status(f"    Failed to select college {college}: {e}", "WARNING")
+                    continue
+                college_streams[college] = stream_options
+
+                raw_streams = [label for label, _ in stream_options]
+                for stream in find_matching_options(raw_streams, args.stream, "Stream"):
+                    tasks.append((year, district, college, stream))
+
+            if college_options:
+                cache.set_district(year, district, college_options, college_streams)
+
+    cache.save()
+    print_status("    Discovery phase complete.", "SUCCESS")
+    return tasks
+
+def http_execute_task(client, sink, task, institutes, args=None):
+    """execute_task() over HTTP postbacks; same summary and DB writes."""
+    year, district, college, stream = task
+
+    with phase("navigate"):
+        client.select_option("#ddlYear", label=year)
+        client.select_option("#ddlDistrict", label=district)
+        client.select_option("#ddlCollege", label=college)
+
+    with phase("show"):
+        client.select_option("#ddlStream", label=stream)
+        client.click("#btnShow")
+    captured = {"show": client.html} if CAPTURE else None
+
+    if not client.has("#grdRptStd"):
+        save_capture(task, captured)
+        log("Table not found (no #grdRptStd after Show)", "INFO")
+        print_task_summary(0)
+        return task_summary("empty")
+
+    if client.has("#lbtnAll"):
+        log("Expanding all records...", "INFO")
+        with phase("show_all"):
+            client.click("#lbtnAll")
+        if captured is not None:
+            captured["show_all"] = client.html
+    save_capture(task, captured)
+
+    with phase("resolve"):
+        institute_id, sams_code = resolve_institute(institutes, college)
+    if not institute_id:
+        log(f"Institute not found in DB for {college}", "ERROR")
+        return task_summary("no_institute")
+
+    with phase("extract"):
+        cell_rows = client.grid_rows("#grdRptStd")
+        batch = build_student_rows(cell_rows, task, institute_id, sams_code)
+    count_metric("rows", len(cell_rows))
+    if not batch:
+        print_task_summary(0)
+        return task_summary("empty")
+
+    rows = dedup_student_rows(batch)
+    with phase("db"):
+        counts = sink.write(rows, {"college": college, "stream": stream})
+
+    print_task_summary(len(rows), counts)
+    return written_summary(len(rows), counts)
+
+def run_tasks_http(tasks, institutes, args, ledger=None):
+    """
+    Runs tasks on args.workers threads, each with its own SamsHttpClient
+    session and sink. Each thread marks its task running in the ledger;
+    results are recorded on the calling thread. Returns summaries in task
+    order.
+    """
+    local = threading.local()
+    opened = []
+    opened_lock = threading.Lock()
+    thread_ids = itertools.count(1)
+
+    def resources():
+        if not hasattr(local, "client"):
+            sink = open_sink(args, f"t{next(thread_ids)}")
+            try:
+                client = SamsHttpClient(BASE_URL, timeout=HTTP_TIMEOUT, rate=RATE).load()
+            except Exception:
+                sink.close()
+                raise
+            local.sink, local.client = sink, client
+            with opened_lock:
+                opened.append((client, sink))
+        return local
+
+    def run_group(members):
+        return [(idx, run(idx, tasks[idx])) for idx in members]
+
+    def run(idx, task):
+        print_status(f"Task {idx + 1} of {len(tasks)}: {task[2]} | {task[3]} | {task[1]} | {task[0]}", "INFO")
+        if ledger:
+            ledger.mark_running(task)
+        t0 = time.time()
+        metrics, token = start_task_metrics()
+        before = None
+        try:
+            res = resources()
+            client = res.client
+            before = (client.requests, client.bytes_received, client.postbacks_avoided)
+            summary = http_execute_task(client, res.sink, task, institutes, args)
+        except Exception as e:
+            print_status(f"Task Crashed: {e}", "ERROR")
+            summary = task_summary("error", error=str(e))
+            if hasattr(local, "client"):
+                try:
+                    local.client.load()
+                except Exception:
+                    pass
+        if before:
+            metrics.count("postbacks", client.requests - before[0])
+            metrics.count("bytes", client.bytes_received - before[1])
+            metrics.count("postbacks_avoided", client.postbacks_avoided - before[2])
+        summary["duration"] = round(time.time() - t0, 3)
+        finish_task_metrics(summary, metrics, token)
+        return summary
+
+    n_workers = max(1, min(args.workers, len(tasks)))
+    print_status(f"HTTP engine running {n_workers} sessions.", "HEADER")
+
+    summaries = [None] * len(tasks)
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        futures = [pool.submit(run_group, members) for members in college_groups(tasks)]
+        for fut in as_completed(futures):
+            for idx, summary in fut.result():
+                summaries[idx] = summary
+                if ledger:
+                    ledger.record(tasks[idx], summary)
+
+    n_requests = sum(c.requests for c, _ in opened)
+    n_bytes = sum(c.bytes_received for c, _ in opened)
+    n_avoided = sum(c.postbacks_avoided for c, _ in opened)
+    print_status(
+        f"HTTP engine: {n_requests} requests, {n_bytes / 1048576:.1f} MiB received, "
+        f"{n_avoided} postbacks avoided.",
+        "INFO",
+    )
+
+    for client, sink in opened:
+        client.close()
+        sink.close()
+
+    return summaries
+
+def run_browser_fallback(tasks, sink, institutes, args, ledger=None):
+    """Re-runs tasks the HTTP engine could not complete on a Playwright page."""
+    print_status(f"Retrying {len(tasks)} tasks with the browser...", "HEADER")
+    with sync_playwright() as p:
+        try:
+            session = BrowserSession(p, args)
+        except Exception as e:
+            print_status(f"Failed to load website: {e}", "ERROR")
+            return None
+        summaries = run_tasks_serial(session, sink, tasks, institutes, args, ledger)
+        session.close()
+    return summaries
+
+def schedule_tasks(tasks):
+    """
+    Orders tasks year -> district -> college (keeping first-seen order at
+    each level) so consecutive tasks share as many dropdown selections as
+    possible and PageState can skip their postbacks.
+    """
+    rank = {}
+    for task in tasks:
+        for depth in (1, 2, 3):
+            rank.setdefault(task[:depth], len(rank))
+    return sorted(tasks, key=lambda t: (rank[t[:1]], rank[t[:2]], rank[t[:3]]))
+
+def college_groups(tasks):
+    """Indexes of tasks grouped by (year, district, college), in task order."""
+    groups = {}
+    for idx, task in enumerate(tasks):
+        groups.setdefault(tuple(task[:3]), []).append(idx)
+    return list(groups.values())
+
+def run_http_tasks(tasks, sink, institutes, args, ledger=None):
+    """run_tasks_http(), then tasks that ended in error again in the browser unless --no-browser-fallback."""
+    summaries = run_tasks_http(tasks, institutes, args, ledger)
+    retry = [i for i, sm in enumerate(summaries) if sm["status"] == "error"]
+    if retry and args.browser_fallback:
+        redone = run_browser_fallback([tasks[i] for i in retry], sink, institutes, args, ledger)
+        for i, sm in zip(retry, redone or []):
+            note_retry(sm)
+            summaries[i] = sm
+    return summaries
+
+def queue_tasks(tasks, ledger, args, shared=None):
+    """
+    Applies --resume to the discovered tasks, schedules them and announces the
+    queue. With --shared-queue the tasks are published instead; hosts then
+    claim them from the shared queue.
+    """
+    if shared:
+        if tasks:
+            added = shared.publish(tasks)
+            print_status(
+                f"Published {added} new tasks to shared queue '{shared.name}' ({len(tasks) - added} already there).",
+                "HEADER",
+            )
+        return tasks
+
+    if not tasks:
+        print_status("No tasks found matching criteria.", "WARNING")
+        return []
+
+    if args.resume:
+        pending = ledger.pending(tasks)
+        print_status(f"Skipping {len(tasks) - len(pending)} tasks already done.", "INFO")
+        tasks = pending
+
+    tasks = schedule_tasks(tasks)
+    print_status(f"Queue contains {len(tasks)} tasks.", "HEADER")
+    return tasks
+
+def print_run_summary(summaries):
+    counts = defaultdict(int)
+    totals = defaultdict(int)
+    for sm in summaries:
+        counts[sm["status"]] += 1
+        for key in ("total", "inserted", "updated", "failed", "unchanged", "removed"):
+            totals[key] += sm.get(key, 0)
+        totals["db_seconds"] += sm.get("metrics", {}).get("phases", {}).get("db", 0.0)
+
+    print_status("Run Summary", "HEADER")
+    print(
+        f"    {Colors.BOLD}Tasks   :{Colors.ENDC} {len(summaries)} "
+        f"(done {counts['done']}, empty {counts['empty']}, "
+        f"no institute {counts['no_institute']}, errors {counts['error']})"
+    )
+    print(
+        f"    {Colors.BOLD}Rows    :{Colors.ENDC} extracted {totals['total']}, "
+        f"saved {totals['inserted']}, updated {totals['updated']}, unchanged {totals['unchanged']}, "
+        f"no longer listed {totals['removed']}, failed {totals['failed']}"
+    )
+    print(f"    {Colors.BOLD}DB time :{Colors.ENDC} {totals['db_seconds']:.2f}s writing student rows")
+
+
+# ================= MAIN =================
+
+def main():
+    start_time = time.time()  # Start the global timer
+
+    parser = argparse.ArgumentParser(description="Odisha HSS Scraper")
+    parser.add_argument("year", nargs="?", default=None)
+    parser.add_argument("district", nargs="?", default=None)
+    parser.add_argument("college", nargs="?", default=None)
+    parser.add_argument("stream", nargs="?", default=None)
+    parser.add_argument(
+        "--filter",
+        action="append",
+        default=[],
+        metavar="'YEAR [DISTRICT [COLLEGE [STREAM]]]'",
+        help="Another set of filters to scrape in the same run, quoted like the positional arguments (repeatable)",
+    )
+    parser.add_argument(
+        "--job",
+        default=None,
+        help="File with one filter per line, written like --filter; every line runs in this one process",
+    )
+    parser.add_argument("--show-browser", action="store_true", help="Launch browser visible")
+    parser.add_argument(
+        "--block-resources",
+        default=None,
+        help="Comma-separated resource types the browser should not load "
+             "(image, stylesheet, font, media, third-party, ...) or 'none'. "
+             "Default: image,stylesheet,font,media,third-party when headless, none with --show-browser",
+    )
+    parser.add_argument(
+        "--extract-mode",
+        choices=EXTRACT_MODES,
+        default=DEFAULT_EXTRACT_MODE,
+        help="How the student grid is read: one page.evaluate call (default), "
+             "Python-side HTML parsing, legacy per-row locators, or response "
+             "(parse the captured Show All response; sync engine)",
+    )
+    parser.add_argument(
+        "--db-batch-size",
+        type=int,
+        default=DEFAULT_DB_BATCH_SIZE,
+        help=f"Rows per multi-row upsert statement (default {DEFAULT_DB_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--match-threshold",
+        type=float,
+        default=DEFAULT_MATCH_THRESHOLD,
+        help=f"Minimum similarity (0-1) for fuzzy college name matches (default {DEFAULT_MATCH_THRESHOLD})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes, each with its own browser and sink/DB connection "
+             "(threads with their own HTTP session for --engine http; default 1)",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("sync", "async", "http"),
+        default="sync",
+        help="Task engine: sync Playwright (default, see --workers), async Playwright in one process, "
+             "or browserless HTTP postbacks (--workers sessions)",
+    )
+    parser.add_argument(
+        "--no-browser-fallback",
+        dest="browser_fallback",
+        action="store_false",
+        help="With --engine http, do not retry failed tasks or discovery in a browser",
+    )
+    parser.add_argument(
+        "--write-queue",
+        type=int,
+        default=DEFAULT_WRITE_QUEUE_SIZE,
+        help="With --engine sync, extracted tasks that may wait for the background DB writer "
+             f"before scraping pauses (default {DEFAULT_WRITE_QUEUE_SIZE}; 0 writes inline)",
+    )
+    parser.add_argument(
+        "--recycle-every",
+        type=int,
+        default=DEFAULT_RECYCLE_EVERY,
+        help=f"With --engine sync, open a fresh browser context after this many tasks (default {DEFAULT_RECYCLE_EVERY}; 0: never)",
+    )
+    parser.add_argument(
+        "--max-browser-mb",
+        type=int,
+        default=DEFAULT_MAX_BROWSER_MB,
+        help="With --engine sync, relaunch the browser once its processes use more than this many MiB "
+             "of PSS (shared pages split between the processes) "
+             f"(default {DEFAULT_MAX_BROWSER_MB}; 0: never)",
+    )
+    parser.add_argument(
+        "--max-pages",
+        type=int,
+        default=DEFAULT_MAX_PAGES,
+        help=f"Pages in flight with --engine async (default {DEFAULT_MAX_PAGES})",
+    )
+    parser.add_argument(
+        "--max-rate",
+        type=float,
+        default=DEFAULT_MAX_RATE,
+        help=f"Most postbacks per second per process; the adaptive rate stays at or below it (default {DEFAULT_MAX_RATE:g})",
+    )
+    parser.add_argument(
+        "--no-rate-control",
+        dest="rate_control",
+        action="store_false",
+        help="Do not pace postbacks by the portal's latency and errors",
+    )
+    parser.add_argument(
+        "--capture",
+        metavar="DIR",
+        default=None,
+        help="Save every task's Show/Show All responses, compressed and indexed, to this store",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="DIR",
+        default=None,
+        help="No browser: re-run extraction and DB writes for the captured tasks in this store that match the filters",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Reuse the task list of a previous run with the same filters and skip tasks already done",
+    )
+    parser.add_argument(
+        "--ledger",
+        default=LEDGER_PATH,
+        help=f"SQLite file that records task progress (default {LEDGER_PATH})",
+    )
+    parser.add_argument(
+        "--shared-queue",
+        metavar="NAME",
+        default=None,
+        help=f"Publish discovered tasks to the MySQL {SHARED_TASKS_TABLE} queue NAME and run tasks claimed from it, "
+             "so several hosts can share one scrape",
+    )
+    parser.add_argument(
+        "--join",
+        action="store_true",
+        help="With --shared-queue, skip discovery and only run tasks other hosts published",
+    )
+    parser.add_argument(
+        "--claim-size",
+        type=int,
+        default=DEFAULT_CLAIM_SIZE,
+        help=f"With --shared-queue, tasks claimed per worker at a time (default {DEFAULT_CLAIM_SIZE})",
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=int,
+        default=DEFAULT_LEASE_SECONDS,
+        help="With --shared-queue, seconds a claimed task stays leased without a heartbeat before "
+             f"another host may take it (default {DEFAULT_LEASE_SECONDS})",
+    )
+    parser.add_argument(
+        "--refresh-discovery",
+        action="store_true",
+        help="Walk the dropdowns again instead of using the discovery cache",
+    )
+    parser.add_argument(
+        "--discovery-ttl",
+        type=float,
+        default=DISCOVERY_CACHE_TTL_HOURS,
+        help=f"Hours a cached dropdown tree stays valid (default {DISCOVERY_CACHE_TTL_HOURS})",
+    )
+    parser.add_argument(
+        "--sink",
+        choices=SINKS,
+        default=DEFAULT_SINK,
+        help="Where student rows go: upserted into MySQL (default) or streamed to "
+             "JSONL/CSV/Parquet files for load_staged.py",
+    )
+    parser.add_argument(
+        "--sink-dir",
+        default=STAGING_DIR,
+        help=f"Directory for file sinks (default {STAGING_DIR})",
+    )
+    parser.add_argument(
+        "--no-change-detection",
+        dest="change_detection",
+        action="store_false",
+        help="Upsert every extracted row even if its grid or row hash is unchanged",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=METRICS_PATH,
+        help=f"JSONL file that receives per-task phase timings and counters (default {METRICS_PATH})",
+    )
+    parser.add_argument(
+        "--prom-file",
+        default=PROM_PATH,
+        help=f"Prometheus textfile with the run's totals and phase quantiles (default {PROM_PATH})",
+    )
+    args = parser.parse_args()
+    try:
+        args.filters = batch_filters(args)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.max_rate <= 0:
+        parser.error("--max-rate must be above 0")
+    if args.replay and (args.capture or args.shared_queue):
+        parser.error("--replay cannot be combined with --capture or --shared-queue")
+    configure_rate(args)
+
+    ensure_log_dir()
+
+    print_status("Initializing Scraper...", "HEADER")
+
+    args.run_id = datetime.fromtimestamp(start_time).strftime("%Y%m%d-%H%M%S")
+    open_capture(args)
+
+    try:
+        sink = open_sink(args, "main")
+        institutes = load_institutes(args, sink)
+    except mysql.connector.Error as e:
+        print_status(f"DB Connect Error: {e}", "ERROR")
+        sys.exit(1)
+    except RuntimeError as e:
+        print_status(str(e), "ERROR")
+        sys.exit(1)
+
+    print_status(f"Loaded {len(institutes)} institutes into memory.", "INFO")
+
+    shared = None
+    if args.shared_queue:
+        try:
+            shared = SharedTaskQueue(args.shared_queue, args.lease_seconds)
+        except mysql.connector.Error as e:
+            print_status(f"Shared queue unavailable: {e}", "ERROR")
+            sys.exit(1)
+        print_status(f"Sharing tasks through queue '{shared.name}' as {shared.owner}.", "INFO")
+
+    ledger = TaskLedger(args.ledger)
+    filter_key = ledger_filter_key(args)
+    tasks = ledger.load_task_set(filter_key) if args.resume else []
+    if tasks:
+        print_status(f"Resuming: reusing {len(tasks)} tasks recorded in {args.ledger}.", "INFO")
+    # --join hosts leave discovery (and publishing) to the others
+    discover = not (shared and args.join)
+
+    cache = DiscoveryCache(DISCOVERY_CACHE_PATH, args.discovery_ttl * 3600, args.refresh_discovery)
+    summaries = []
+
+    client = None
+    if args.engine == "http" and not args.replay:
+        try:
+            print_status("Loading website over HTTP...", "INFO")
+            client = SamsHttpClient(BASE_URL, timeout=HTTP_TIMEOUT, rate=RATE).load()
+            if not tasks and discover:
+                tasks = discover_batch(lambda f: http_discover_tasks(client, f, cache), args)
+                if tasks:
+                    ledger.save_task_set(filter_key, tasks)
+        except Exception as e:
+            if not args.browser_fallback:
+                print_status(f"HTTP engine failed: {e}", "ERROR")
+                return
+            print_status(f"HTTP engine failed ({e}); falling back to the browser.", "WARNING")
+            client = None
+            args.engine = "sync"
+
+    if args.replay:
+        store = CaptureStore(args.replay)
+        print_status(f"Replaying captured responses from {args.replay} (no browser).", "INFO")
+        tasks = queue_tasks(replay_tasks(store, args), ledger, args)
+        if tasks:
+            summaries = run_tasks_serial(
+                None, sink, tasks, institutes, args, ledger,
+                run_task=lambda target, task: replay_one_task(store, target, task, institutes, args),
+            )
+        store.close()
+    elif client:
+        client.close()
+        tasks = queue_tasks(tasks, ledger, args, shared)
+        run_chunk = lambda chunk: run_http_tasks(chunk, sink, institutes, args, ledger)
+        if shared:
+            tasks, summaries = run_shared_queue(shared, run_chunk, args)
+        elif tasks:
+            summaries = run_chunk(tasks)
+    else:
+        with sync_playwright() as p:
+            try:
+                print_status(f"Navigating to website...", "INFO")
+                session = BrowserSession(p, args)
+            except Exception as e:
+                print_status(f"Failed to load website: {e}", "ERROR")
+                return
+
+            if not tasks and discover:
+                tasks = discover_batch(lambda f: discover_and_populate_tasks(session.page, f, cache), args)
+                if tasks:
+                    ledger.save_task_set(filter_key, tasks)
+
+            tasks = queue_tasks(tasks, ledger, args, shared)
+
+            if args.engine == "sync" and args.workers <= 1:
+                run_chunk = lambda chunk: run_tasks_serial(session, sink, chunk, institutes, args, ledger)
+                if shared:
+                    tasks, summaries = run_shared_queue(shared, run_chunk, args)
+                elif tasks:
+                    summaries = run_chunk(tasks)
+
+            session.close()
+
+        run_chunk = None
+        if args.engine == "async":
+            run_chunk = lambda chunk: asyncio.run(run_tasks_async(chunk, institutes, args, ledger))
+        elif args.workers > 1:
+            run_chunk = lambda chunk: run_tasks_parallel(chunk, institutes, args, ledger)
+        if run_chunk and shared:
+            tasks, summaries = run_shared_queue(shared, run_chunk, args)
+        elif run_chunk and tasks:
+            summaries = run_chunk(tasks)
+
+    if shared:
+        shared.close()
+    if CAPTURE is not None:
+        CAPTURE.close()
+    ledger.close()
+
+    print_run_summary(summaries)
+    print_phase_summary(summaries)
+    WAIT_STATS.report()
+    report_rate()
+    report_blocker()
+
+    if summaries:
+        try:
+            write_task_metrics(args.metrics_file, tasks, summaries, args.run_id, "replay" if args.replay else args.engine)
+            write_prometheus_textfile(args.prom_file, summaries, time.time() - start_time)
+        except OSError as e:
+            print_status(f"Could not write metrics: {e}", "WARNING")
+
+    sink.close()
+    if not isinstance(sink, MySQLSink):
+        print_status(
+            f"Rows staged as {args.sink} under {args.sink_dir}/; load them with: python load_staged.py {args.sink_dir}",
+            "INFO",
+        )
 
     elapsed = time.time() - start_time
     m, s = divmod(elapsed, 60)
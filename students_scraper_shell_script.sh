@@ -1,24 +1,29 @@
 #!/bin/bash
+# Scrapes every district/college below for the years START..END in ONE
+# scraper.py process (one browser, one DB connection, one discovery pass).
+# For longer lists put one filter per line in a job file instead:
+#   python scraper.py --job jobs.txt
 
 DISTRICT=("Koraput")
 # insert multiple districts as need
 # Ex DISTRICT=("Koraput" "Khurda" "Balasore")
 SCHOOL=("")
-# insert college names in the same way we did with DISTRICT
+# insert college names in the same way we did with DISTRICT ("" = every college)
 START=2024
 END=2026
 
-for year in {$START..$END}; do
-    echo "Running for year: $year"
-    python scraper.py "$year" "$DISTRICT" "$SCHOOL"
-
-    if [ $? -ne 0 ]; then
-        echo "❌ Failed for year: $year"
-    else
-        echo "✅ Completed for year: $year"
-    fi
-
-    echo "-----------------------------"
+FILTERS=()
+for district in "${DISTRICT[@]}"; do
+    for school in "${SCHOOL[@]}"; do
+        FILTERS+=(--filter "$START..$END $(printf '%q' "$district") $(printf '%q' "$school")")
+    done
 done
 
-echo "All years processed."
+echo "Running years $START..$END for ${#DISTRICT[@]} district(s) and ${#SCHOOL[@]} college filter(s)"
+python scraper.py "${FILTERS[@]}" "$@"
+
+if [ $? -ne 0 ]; then
+    echo "❌ Batch failed"
+    exit 1
+fi
+echo "✅ All years processed."
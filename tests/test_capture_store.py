@@ -0,0 +1,44 @@
+"""
+capture_store.CaptureStore round trips on a temporary directory.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_store import OBJECTS_DIR, CaptureStore  # noqa: E402
+
+TASK = ("2024", "Khordha", "Test College", "Arts")
+
+
+def object_files(root):
+    return [name for _, _, files in os.walk(os.path.join(root, OBJECTS_DIR)) for name in files]
+
+
+def test_record_and_read_back(tmp_path):
+    store = CaptureStore(str(tmp_path), run_id="r1")
+    store.record("students", TASK, {"show": "<p>page 1 – ଓଡ଼ିଆ</p>", "show_all": "<p>all</p>"})
+    store.record("students", ("2024", "Puri", "Other", "Arts"), {"show": "<p>page 1 – ଓଡ଼ିଆ</p>"})
+    store.close()
+
+    store = CaptureStore(str(tmp_path))
+    assert store.keys("students") == [TASK, ("2024", "Puri", "Other", "Arts")]
+    assert store.keys("institutes") == []
+    assert store.grid("students", TASK) == "<p>all</p>"
+    assert store.grid("students", ("2024", "Puri", "Other", "Arts")) == "<p>page 1 – ଓଡ଼ିଆ</p>"
+    assert store.grid("students", ("2023",) + TASK[1:]) is None
+    # Identical bodies are stored once
+    assert len(object_files(str(tmp_path))) == 2
+    store.close()
+
+
+def test_record_replaces_earlier_steps(tmp_path):
+    store = CaptureStore(str(tmp_path))
+    store.record("students", TASK, {"show": "<p>old</p>", "show_all": "<p>old all</p>"})
+    store.record("students", TASK, {"show": "<p>new</p>"})
+    assert store.grid("students", TASK) == "<p>new</p>"
+    assert store.keys("students") == [TASK]
+    store.close()
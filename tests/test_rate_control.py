@@ -0,0 +1,51 @@
+"""
+rate_control.RateController's AIMD decisions, driven through _observe()
+without sleeping.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_control import DECREASE_FACTOR, MIN_RATE, RateController  # noqa: E402
+
+
+def test_show_all_is_not_judged_against_dropdown_latency():
+    rate = RateController(max_concurrency=4, max_rate=10.0)
+    for _ in range(20):
+        rate._observe(0.2, True, "postback")
+        rate._observe(5.0, True, "show_all")
+    assert rate.stats["slow"] == 0
+    assert rate.rate == 10.0
+    assert rate.baseline == {"postback": 0.2, "show_all": 5.0}
+
+
+def test_slow_postbacks_halve_the_rate():
+    rate = RateController(max_concurrency=4, max_rate=10.0)
+    for _ in range(5):
+        rate._observe(0.2, True)
+    rate._observe(30.0, True)
+    assert rate.stats["slow"] == 1
+    assert rate.rate == 10.0 * DECREASE_FACTOR
+    assert rate.limit == 4 * DECREASE_FACTOR
+
+
+def test_failures_count_for_grid_kinds_once_per_round_trip():
+    rate = RateController(max_concurrency=4, max_rate=10.0)
+    for _ in range(3):
+        rate._observe(5.0, False, "show_all")
+    assert rate.stats["failed"] == 3
+    assert rate.stats["decreases"] == 1
+    assert rate.rate == 10.0 * DECREASE_FACTOR
+
+
+def test_on_time_responses_raise_the_rate_up_to_the_max():
+    rate = RateController(max_concurrency=2, max_rate=1.0)
+    rate.rate, rate.limit = MIN_RATE, 1.0
+    for _ in range(10):
+        rate._observe(0.2, True)
+    assert rate.rate == 1.0
+    assert rate.limit == 2.0
@@ -0,0 +1,97 @@
+"""
+SamsHttpClient against mock_portal.MockPortal, and the grid parsing helpers
+the HTTP and stream extract modes rely on.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_portal import PAGE_SIZE, MockDataset, MockPortal  # noqa: E402
+from sams_http import SamsHttpClient, cut_grid_html, iter_grid_html, parse_grid_html  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def portal():
+    dataset = MockDataset(years=("2024",), districts=2, colleges=2, streams=2, rows=40, empty_every=0)
+    portal = MockPortal(dataset).start()
+    yield portal
+    portal.stop()
+
+
+def test_show_all_through_mock_portal(portal):
+    data = portal.dataset
+    year, district = data.years[0], data.districts[1]
+    college, stream = data.college_names(district)[0], data.streams[1]
+    expected = data.students(year, district, college, stream)
+    assert len(expected) > PAGE_SIZE
+
+    client = SamsHttpClient(portal.students_url, timeout=10).load()
+    try:
+        client.select_option("#ddlYear", label=year)
+        client.select_option("#ddlDistrict", label=district)
+        client.select_option("#ddlCollege", label=college)
+        client.select_option("#ddlStream", label=stream)
+        client.click("#btnShow")
+        assert len(client.grid_rows("#grdRptStd")) == PAGE_SIZE
+        assert client.has("#lbtnAll")
+
+        client.click("#lbtnAll")
+        rows = client.grid_rows("#grdRptStd")
+    finally:
+        client.close()
+
+    assert len(rows) == len(expected)
+    assert [tuple(r) for r in rows] == expected
+
+
+def test_select_option_skips_unchanged_postback(portal):
+    client = SamsHttpClient(portal.students_url, timeout=10).load()
+    try:
+        client.select_option("#ddlYear", label=portal.dataset.years[0])
+        requests = client.requests
+        client.select_option("#ddlYear", label=portal.dataset.years[0])
+    finally:
+        client.close()
+    assert client.requests == requests
+    assert client.postbacks_avoided == 1
+
+
+NESTED_GRID = (
+    '<table id="grdRptStd">'
+    "<tr><th>Sl</th><th>Name</th></tr>"
+    "<tr><td>1</td><td>A<table><tr><td>inner</td></tr></table></td></tr>"
+    "<tr><td>2</td><td>B</td></tr>"
+    "</table>"
+)
+
+
+def test_nested_table_rows_in_document_order():
+    # Like querySelectorAll("tr"): the nested row follows its enclosing row,
+    # and the nested cell's text is part of the enclosing cell
+    expected = [["1", "Ainner"], ["inner"], ["2", "B"]]
+    assert parse_grid_html(NESTED_GRID) == expected
+    assert list(iter_grid_html(NESTED_GRID, chunk_size=7)) == expected
+
+
+def test_grid_id_must_match_exactly():
+    html = (
+        '<table id="grdRptStdOld"><tr><th>x</th></tr><tr><td>old</td></tr></table>'
+        + NESTED_GRID
+    )
+    assert parse_grid_html(html)[0] == ["1", "Ainner"]
+    assert parse_grid_html(html, "grdRpt") == []
+
+
+def test_cut_grid_html_matches_exact_id():
+    prefix = '<table id="grdRptStd2"><tr><td>keep</td></tr></table>'
+    html, found = cut_grid_html(prefix + NESTED_GRID + "<p>tail</p>")
+    assert found
+    assert html == prefix + '<table id="grdRptStd"></table><p>tail</p>'
+
+    assert cut_grid_html(prefix) == (prefix, False)
@@ -0,0 +1,225 @@
+"""
+scraper.py helpers that need neither a browser nor a database. Importing
+scraper still needs Playwright and mysql-connector installed.
+
+    python -m pytest tests
+"""
+
+import argparse
+import base64
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("playwright")
+pytest.importorskip("mysql.connector")
+
+import scraper  # noqa: E402
+from capture_store import CaptureStore  # noqa: E402
+
+TASK = ("2024", "Khordha", "Test College", "Arts")
+
+
+class RecordingSink:
+    def __init__(self):
+        self.writes = []
+
+    def write(self, rows, context=None):
+        self.writes.append(list(rows))
+        return scraper.write_counts(inserted=len(rows))
+
+
+def grid_cells(*students):
+    return [[str(n), reg, roll, name, "F", "M", "Female"] for n, (reg, roll, name) in enumerate(students, 1)]
+
+
+def test_write_task_rows_keeps_last_row_per_key():
+    cells = grid_cells(("R1", "E1", "first"), ("R2", "E2", "other"), ("R1", "E1", "second"))
+    sink = RecordingSink()
+    summary = scraper.write_task_rows(sink, TASK, cells, 7, "S7")
+
+    assert summary["status"] == "done"
+    assert summary["total"] == 2
+    [rows] = sink.writes
+    assert rows == scraper.dedup_student_rows(scraper.build_student_rows(cells, TASK, 7, "S7"))
+    assert {r[0]: r[2] for r in rows} == {"R1": "second", "R2": "other"}
+
+
+def grid_html(cells):
+    rows = "".join("<tr>" + "".join(f"<td>{c}</td>" for c in r) + "</tr>" for r in cells)
+    return f'<table id="grdRptStd"><tr><th>Sl</th></tr>{rows}</table>'
+
+
+def test_replay_task_writes_like_execute_task(tmp_path):
+    cells = grid_cells(("R1", "E1", "first"), ("R2", "E2", "other"), ("R1", "E1", "second"))
+    store = CaptureStore(str(tmp_path))
+    store.record("students", TASK, {"show": grid_html(cells[:1]), "show_all": grid_html(cells)})
+    institutes = scraper.InstituteIndex([(7, "S7", TASK[2])])
+
+    replayed, direct = RecordingSink(), RecordingSink()
+    summary = scraper.replay_task(store, replayed, TASK, institutes, None)
+    scraper.write_task_rows(direct, TASK, cells, 7, "S7")
+    store.close()
+
+    assert summary["status"] == "done"
+    assert replayed.writes == direct.writes
+    assert len(replayed.writes[0]) == 2
+
+
+class FakeCDP:
+    def __init__(self, body):
+        self.body = body
+
+    def send(self, method, params):
+        assert method == "Fetch.getResponseBody"
+        return {"body": base64.b64encode(self.body.encode()).decode(), "base64Encoded": True}
+
+
+GRID_PAGE = (
+    '<html><body><table id="grdRptStd"><tr><th>Sl</th></tr>'
+    "<tr><td>1</td></tr></table><p>tail</p></body></html>"
+)
+HEADERS = [
+    {"name": "Content-Type", "value": "text/html; charset=utf-8"},
+    {"name": "Content-Length", "value": "999"},
+    {"name": "Content-Encoding", "value": "gzip"},
+]
+
+
+def paused(method="POST", post_data="__EVENTTARGET=ctl00%24lbtnAll&__VIEWSTATE=x"):
+    request = {"url": "http://portal/report.aspx", "method": method}
+    if post_data is not None:
+        request["postData"] = post_data
+    return {"requestId": "7", "request": request, "responseStatusCode": 200, "responseHeaders": HEADERS}
+
+
+def test_grid_capture_fulfills_show_all_without_the_grid():
+    capture = scraper.GridCapture()
+    method, params = capture._verdict(FakeCDP(GRID_PAGE), paused())
+
+    assert method == "Fetch.fulfillRequest"
+    assert capture.html == GRID_PAGE
+    body = base64.b64decode(params["body"]).decode()
+    assert body == '<html><body><table id="grdRptStd"></table><p>tail</p></body></html>'
+    assert [h["name"] for h in params["responseHeaders"]] == ["Content-Type"]
+
+
+def test_grid_capture_continues_other_responses():
+    capture = scraper.GridCapture()
+    for event in (paused(method="GET", post_data=None), paused(post_data="__EVENTTARGET=ctl00%24ddlYear")):
+        assert capture._verdict(FakeCDP(GRID_PAGE), event) == ("Fetch.continueRequest", {"requestId": "7"})
+    assert capture.html is None
+
+
+def test_posted_event_target_reads_post_data_entries():
+    body = base64.b64encode(b"__EVENTTARGET=ctl00%24lbtnAll&a=1").decode()
+    request = {"method": "POST", "postDataEntries": [{"bytes": body}]}
+    assert scraper.posted_event_target(request) == "ctl00$lbtnAll"
+
+
+def test_failed_writes_leave_the_task_unfinished():
+    summary = scraper.task_summary("queued", 3)
+    scraper.apply_write(summary, scraper.write_counts(inserted=2, failed=1), 0.5, "x")
+    assert summary["status"] == "error"
+    assert summary["status"] not in scraper.LEDGER_COMPLETE_STATUSES
+    assert summary["error"] == "1 rows failed to write"
+
+    summary = scraper.written_summary(3, scraper.write_counts(inserted=3))
+    assert (summary["status"], summary["error"]) == ("done", None)
+
+
+def test_ledger_pending_skips_only_finished_tasks(tmp_path):
+    ledger = scraper.TaskLedger(str(tmp_path / "ledger.sqlite3"))
+    tasks = [("2024", "Khordha", college, "Arts") for college in ("A", "B", "C", "D", "E")]
+    ledger.save_task_set("key", tasks)
+    ledger.record(tasks[0], scraper.task_summary("done", 5, inserted=5))
+    ledger.record(tasks[1], scraper.task_summary("empty"))
+    ledger.record(tasks[2], scraper.task_summary("error", error="boom"))
+    # The HTTP engine marks tasks running from its session threads
+    worker = threading.Thread(target=ledger.mark_running, args=(tasks[3],))
+    worker.start()
+    worker.join()
+
+    assert ledger.load_task_set("key") == tasks
+    assert ledger.pending(tasks) == tasks[2:]
+    assert ledger.statuses()[tasks[3]] == "running"
+    ledger.close()
+
+
+INSTITUTES = [
+    (1, "S1", "Govt. Higher Secondary School, Puri"),
+    (2, "S2", "Kendrapara Autonomous College"),
+    (3, "S3", "Sri Jagannath College of Science Alpha"),
+    (4, "S4", "Sri Jagannath College of Science Alphb"),
+]
+
+
+@pytest.mark.parametrize("name, match_type, iid", [
+    ("govt. higher secondary school, puri ", "EXACT", 1),
+    ("GOVT HIGHER SECONDARY SCHOOL PURI", "NORMALIZED_MATCH", 1),
+    ("Kendrapara Autonomus College", "FUZZY_MATCH", 2),
+    ("Sri Jagannath College of Science", "AMBIGUOUS", None),
+    ("Unrelated Institute of Music", "NO_MATCH", None),
+    ("!!!", "NO_MATCH", None),
+])
+def test_institute_index_lookup(name, match_type, iid):
+    entry, found, score = scraper.InstituteIndex(INSTITUTES).lookup(name)
+    assert found == match_type
+    assert (entry[0] if entry else None) == iid
+    if match_type in ("EXACT", "NORMALIZED_MATCH"):
+        assert score == 1.0
+
+
+@pytest.mark.parametrize("rowcount, n_rows, expected", [
+    (5, 5, (5, 0)),    # all inserted
+    (10, 5, (0, 5)),   # all updated
+    (7, 5, (3, 2)),    # 3 inserted + 2 updated
+    (2, 5, (2, 0)),    # 2 inserted, 3 unchanged (reported as 0)
+    (0, 5, (0, 0)),    # nothing changed
+    (-1, 5, (0, 0)),   # driver could not tell
+])
+def test_split_upsert_rowcount(rowcount, n_rows, expected):
+    assert scraper.split_upsert_rowcount(rowcount, n_rows) == expected
+
+
+def test_parse_filter_pads_and_unquotes():
+    assert scraper.parse_filter('2024 "Khordha" "Test College"') == {
+        "year": "2024", "district": "Khordha", "college": "Test College", "stream": None,
+    }
+    assert scraper.parse_filter("2024 '' '' Arts") == {
+        "year": "2024", "district": None, "college": None, "stream": "Arts",
+    }
+
+
+@pytest.mark.parametrize("text", ["", "   ", "2024 a b c d"])
+def test_parse_filter_rejects_malformed(text):
+    with pytest.raises(ValueError):
+        scraper.parse_filter(text)
+
+
+def filter_args(*positional, filters=(), job=None):
+    positional += (None,) * (len(scraper.FILTER_FIELDS) - len(positional))
+    return argparse.Namespace(filter=list(filters), job=job, **dict(zip(scraper.FILTER_FIELDS, positional)))
+
+
+def test_batch_filters_merges_arguments_filters_and_job(tmp_path):
+    job = tmp_path / "job.txt"
+    job.write_text("# districts to refresh\n\n2024 Puri\n  2024 Khordha  \n2023\n", encoding="utf-8")
+    filters = scraper.batch_filters(filter_args("2024", "Khordha", filters=["2024 Puri"], job=str(job)))
+    assert [(f["year"], f["district"]) for f in filters] == [("2024", "Khordha"), ("2024", "Puri"), ("2023", None)]
+
+
+def test_batch_filters_positional_only_when_given_or_alone():
+    assert scraper.batch_filters(filter_args()) == [dict.fromkeys(scraper.FILTER_FIELDS)]
+    assert [f["year"] for f in scraper.batch_filters(filter_args(filters=["2023"]))] == ["2023"]
+
+
+def test_batch_filters_reports_the_bad_job_line(tmp_path):
+    job = tmp_path / "job.txt"
+    job.write_text("2024 Puri\n# ok\n2024 a b c d\n", encoding="utf-8")
+    with pytest.raises(ValueError, match=r"job\.txt:3: "):
+        scraper.batch_filters(filter_args(job=str(job)))